@@ -1,7 +1,7 @@
 
 # portfolio/urls.py
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect
@@ -10,6 +10,7 @@ urlpatterns = [
     path('', lambda request: redirect('login', permanent=False)),  # root → login
     path('admin/', admin.site.urls),
     path('trades/', include('trades.urls')),   # our app routes
+    re_path(r'^api/(?P<version>v1)/', include('trades.api_urls')),  # JSON API (trades/api.py)
     path('accounts/', include('django.contrib.auth.urls')),  # login/logout
 ]
 
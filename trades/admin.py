@@ -1,44 +1,64 @@
 # trades/admin.py
 from django.contrib import admin
-from django.http import HttpResponse
+from django.core.exceptions import FieldDoesNotExist
+from django.http import StreamingHttpResponse
 import csv
 from django.utils.html import format_html
+from .exports import Echo
 from .models import ActivityLog
+from .search import search_trade_ids
 from . import models
 
 
 # --- Utility: CSV export action ---
 def export_as_csv_action(description="Export selected objects as CSV",
-                         fields=None, header=True):
+                         fields=None, header=True, chunk_size=2000):
     """
     Return an admin action that exports selected queryset to CSV.
     Usage:
         actions = [export_as_csv_action(fields=['ticker','buy_price'])]
+    Rows are streamed: the queryset is read with iterator(chunk_size), FK fields are
+    loaded with select_related() and, when every name is a model field, only() limits
+    the SELECT to the exported columns.
     """
 
     def export_as_csv(modeladmin, request, queryset):
         opts = modeladmin.model._meta
         field_names = fields or [f.name for f in opts.fields]
 
-        response = HttpResponse(content_type='text/csv')
+        model_fields = {}
+        for name in field_names:
+            try:
+                model_fields[name] = opts.get_field(name)
+            except FieldDoesNotExist:
+                pass  # attribute or method, resolved per object below
+
+        related = [name for name, f in model_fields.items() if f.is_relation and f.concrete and not f.many_to_many]
+        if related:
+            queryset = queryset.select_related(*related)
+        if len(model_fields) == len(field_names):
+            # methods could touch any column, so only narrow the SELECT when there are none
+            queryset = queryset.only(*field_names)
+
+        def rows():
+            writer = csv.writer(Echo())
+            if header:
+                yield writer.writerow(field_names)
+            for obj in queryset.iterator(chunk_size=chunk_size):
+                row = []
+                for field in field_names:
+                    val = getattr(obj, field, '')
+                    # call callable if present
+                    if callable(val):
+                        try:
+                            val = val()
+                        except Exception:
+                            val = ''
+                    row.append(val)
+                yield writer.writerow(row)
+
+        response = StreamingHttpResponse(rows(), content_type='text/csv')
         response['Content-Disposition'] = 'attachment; filename=%s.csv' % opts.verbose_name_plural.replace(' ', '_')
-        writer = csv.writer(response)
-
-        if header:
-            writer.writerow(field_names)
-
-        for obj in queryset:
-            row = []
-            for field in field_names:
-                val = getattr(obj, field, '')
-                # call callable if present
-                if callable(val):
-                    try:
-                        val = val()
-                    except Exception:
-                        val = ''
-                row.append(val)
-            writer.writerow(row)
         return response
 
     export_as_csv.short_description = description
@@ -57,8 +77,9 @@ class TradeChartInline(admin.TabularInline):
         if not obj or not getattr(obj, 'image', None):
             return ""
         try:
-            return format_html('<img src="{}" style="height:80px; object-fit:cover; border-radius:4px;" />',
-                               obj.image.url)
+            return format_html('<a href="{}" target="_blank"><img src="{}" loading="lazy" '
+                               'style="height:80px; object-fit:cover; border-radius:4px;" /></a>',
+                               obj.image.url, obj.thumb_url)
         except Exception:
             return ""
 
@@ -75,15 +96,24 @@ try:
         list_display = ('ticker', 'user', 'quantity', 'buy_price', 'buy_date', 'is_closed', 'sell_price', 'sell_date',
                         'realized_pnl_display')
         list_filter = ('is_closed', 'exit_reason', 'buy_date', 'sell_date')
-        search_fields = ('ticker', 'buy_notes', 'sell_notes', 'user__username')
+        # notes, indicator text and captions are matched through the full-text index
+        search_fields = ('ticker', 'user__username')
         date_hierarchy = 'buy_date'
         inlines = [TradeChartInline]
         actions = [export_as_csv_action(
             fields=['id', 'ticker', 'user', 'quantity', 'buy_price', 'buy_date', 'is_closed', 'sell_price', 'sell_date',
-                    'exit_reason'])]
+                    'exit_reason', 'pnl'])]
 
         readonly_fields = ('created_at',) if hasattr(Trade, 'created_at') else tuple()
 
+        def get_search_results(self, request, queryset, search_term):
+            matches, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+            if search_term:
+                ids = search_trade_ids(search_term)
+                if ids:
+                    matches |= queryset.filter(pk__in=ids)
+            return matches, may_have_duplicates
+
         def realized_pnl_display(self, obj):
             # prefer model method `realized_pnl()` or attribute `realized_pnl`
             try:
@@ -120,8 +150,9 @@ try:
             if not obj or not getattr(obj, 'image', None):
                 return ""
             try:
-                return format_html('<img src="{}" style="height:80px; object-fit:cover; border-radius:4px;" />',
-                                   obj.image.url)
+                return format_html('<a href="{}" target="_blank"><img src="{}" loading="lazy" '
+                                   'style="height:80px; object-fit:cover; border-radius:4px;" /></a>',
+                                   obj.image.url, obj.thumb_url)
             except Exception:
                 return ""
 
@@ -0,0 +1,212 @@
+# trades/analytics.py
+"""
+Closed-trade analytics computed with NumPy.
+
+load_closed(user) reads the user's closed trades in one values_list query into
+column arrays; analyze(columns) derives every metric from those arrays without
+a Python loop over trades:
+
+- equity curve (cumulative realized P&L per sell date) and max drawdown
+- win rate, expectancy, profit factor, payoff ratio
+- R-multiples: return divided by the assumed initial risk ANALYTICS_RISK_PCT
+  (trades carry no stop price, so risk is a fixed percentage of the entry)
+- per-trade Sharpe ratio, annualized by the number of trades per year
+- holding-period distribution
+- breakdown by exit_reason
+
+`manage.py bench_analytics` times analyze() on synthetic data.
+"""
+import numpy as np
+from django.conf import settings
+
+from .models import EXIT_REASONS, Trade
+
+FIELDS = ('buy_date', 'sell_date', 'buy_price', 'sell_price', 'quantity', 'pnl', 'exit_reason')
+# one record per values_list row: NULL dates become NaT and NULL numbers NaN on the way in
+ROW_DTYPE = np.dtype([
+    ('buy_date', 'datetime64[D]'),
+    ('sell_date', 'datetime64[D]'),
+    ('buy_price', 'f8'),
+    ('sell_price', 'f8'),
+    ('quantity', 'f8'),
+    ('pnl', 'f8'),
+    ('exit_reason', 'U8'),
+])
+
+# exit_reason is carried as a small integer code (index into this list): grouping is then a bincount
+REASON_CODES = [''] + [code for code, _ in EXIT_REASONS]
+_CODES = np.array(REASON_CODES)
+_CODE_ORDER = np.argsort(_CODES)
+
+HOLDING_BINS = [0, 5, 10, 20, 40, 60, 120, 250]  # days; last bucket is open-ended
+R_BINS = [-2, -1, 0, 1, 2, 3, 5]  # R; first and last buckets are open-ended
+
+
+def reason_codes(reasons):
+    """Codes (index into REASON_CODES, 0 when unknown or unset) for an array of exit_reason strings."""
+    pos = _CODE_ORDER[np.clip(np.searchsorted(_CODES[_CODE_ORDER], reasons), 0, len(_CODES) - 1)]
+    return np.where(_CODES[pos] == reasons, pos, 0).astype(np.int8)
+
+
+def load_closed(user):
+    """Column arrays of the user's closed trades, oldest sell first (one query, streamed into NumPy)."""
+    rows = (Trade.objects.filter(user=user, is_closed=True, sell_price__isnull=False)
+            .order_by('sell_date', 'id').values_list(*FIELDS))
+    data = np.fromiter(rows.iterator(chunk_size=2000), dtype=ROW_DTYPE)
+    return {
+        'buy_date': data['buy_date'],
+        # a closed trade without sell_date counts as closed on its buy date
+        'sell_date': np.where(np.isnat(data['sell_date']), data['buy_date'], data['sell_date']),
+        'buy_price': data['buy_price'],
+        'sell_price': data['sell_price'],
+        'quantity': data['quantity'],
+        'pnl': data['pnl'],
+        'exit_code': reason_codes(data['exit_reason']),
+    }
+
+
+def _num(value, digits=4):
+    """Plain float for JSON (None for NaN / inf)."""
+    value = float(value)
+    return round(value, digits) if np.isfinite(value) else None
+
+
+def _histogram(values, edges, labels):
+    counts = np.bincount(np.searchsorted(edges, values, side='right'), minlength=len(labels))
+    return [{'bucket': label, 'count': int(c)} for label, c in zip(labels, counts)]
+
+
+def _holding_labels():
+    edges = HOLDING_BINS
+    return [f"{lo}-{hi - 1}d" for lo, hi in zip(edges, edges[1:])] + [f"{edges[-1]}d+"]
+
+
+def _r_labels():
+    edges = R_BINS
+    return ([f"< {edges[0]}R"] + [f"{lo}R to {hi}R" for lo, hi in zip(edges, edges[1:])]
+            + [f">= {edges[-1]}R"])
+
+
+def equity_curve(sell_date, pnl):
+    """(dates, cumulative P&L at the end of each date with a closed trade)."""
+    if not len(pnl):
+        return sell_date[:0], pnl[:0]
+    first = sell_date.min()
+    day = (sell_date - first).astype('int64')
+    # daily sums by bincount over day offsets: O(n), no sort
+    daily = np.bincount(day, weights=pnl)
+    traded = np.bincount(day) > 0
+    dates = first + np.flatnonzero(traded).astype('timedelta64[D]')
+    return dates, np.cumsum(daily[traded])
+
+
+def max_drawdown(dates, equity):
+    """Largest peak-to-trough fall of the equity curve (starting from 0)."""
+    if not len(equity):
+        return {'amount': 0.0, 'pct': None, 'peak_date': None, 'trough_date': None}
+    peaks = np.maximum.accumulate(np.maximum(equity, 0))
+    drawdowns = peaks - equity
+    trough = int(np.argmax(drawdowns))
+    amount = drawdowns[trough]
+    if amount <= 0:
+        return {'amount': 0.0, 'pct': 0.0, 'peak_date': None, 'trough_date': None}
+    peak_value = peaks[trough]
+    peak_idx = np.flatnonzero(equity[:trough + 1] == peak_value)
+    return {
+        'amount': _num(amount, 2),
+        'pct': _num(amount / peak_value * 100, 2) if peak_value > 0 else None,
+        'peak_date': str(dates[peak_idx[-1]]) if len(peak_idx) else None,
+        'trough_date': str(dates[trough]),
+    }
+
+
+def by_exit_reason(exit_code, pnl):
+    if not len(pnl):
+        return []
+    size = len(REASON_CODES)
+    counts = np.bincount(exit_code, minlength=size)
+    wins = np.bincount(exit_code, weights=pnl > 0, minlength=size)
+    totals = np.bincount(exit_code, weights=pnl, minlength=size)
+    labels = dict(EXIT_REASONS)
+    rows = [
+        {
+            'exit_reason': REASON_CODES[i] or None,
+            'label': labels.get(REASON_CODES[i], 'Not set'),
+            'count': int(counts[i]),
+            'win_rate': _num(wins[i] / counts[i] * 100, 2),
+            'total': _num(totals[i], 2),
+            'average': _num(totals[i] / counts[i], 2),
+        }
+        for i in np.flatnonzero(counts)
+    ]
+    return sorted(rows, key=lambda r: -r['count'])
+
+
+def analyze(columns, risk_pct=None):
+    """All report metrics from load_closed() style column arrays (JSON-ready dict)."""
+    risk_pct = risk_pct or getattr(settings, 'ANALYTICS_RISK_PCT', 8.0)
+    buy, sell, qty = columns['buy_price'], columns['sell_price'], columns['quantity']
+    pnl = columns['pnl']
+    pnl = np.where(np.isnan(pnl), (sell - buy) * qty, pnl)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ret_pct = np.where(buy > 0, (sell - buy) / buy * 100, np.nan)
+    n = len(pnl)
+
+    win_mask, loss_mask = pnl > 0, pnl <= 0
+    gross_win, gross_loss = pnl[win_mask].sum(), -pnl[loss_mask].sum()
+    avg_win = pnl[win_mask].mean() if win_mask.any() else np.nan
+    avg_loss = pnl[loss_mask].mean() if loss_mask.any() else np.nan
+
+    dates, equity = equity_curve(columns['sell_date'], pnl)
+    holding = (columns['sell_date'] - columns['buy_date']).astype('int64')
+    r_multiple = ret_pct / risk_pct
+    valid_r = r_multiple[np.isfinite(r_multiple)]
+
+    sharpe = None
+    valid_ret = ret_pct[np.isfinite(ret_pct)]
+    if len(valid_ret) > 1 and valid_ret.std(ddof=1) > 0:
+        span_years = max((dates[-1] - dates[0]).astype('int64') / 365.25, 1.0)
+        sharpe = _num(valid_ret.mean() / valid_ret.std(ddof=1) * np.sqrt(len(valid_ret) / span_years), 2)
+
+    return {
+        'count': n,
+        'wins': int(win_mask.sum()),
+        'losses': int(loss_mask.sum()),
+        'win_rate': _num(win_mask.mean() * 100, 2) if n else None,
+        'total': _num(pnl.sum(), 2),
+        'expectancy': _num(pnl.mean(), 2) if n else None,
+        'expectancy_pct': _num(np.nanmean(ret_pct), 2) if len(valid_ret) else None,
+        'avg_win': _num(avg_win, 2),
+        'avg_loss': _num(avg_loss, 2),
+        'payoff_ratio': _num(avg_win / -avg_loss, 2) if loss_mask.any() and avg_loss < 0 else None,
+        'profit_factor': _num(gross_win / gross_loss, 2) if gross_loss > 0 else None,
+        'sharpe': sharpe,
+        'max_drawdown': max_drawdown(dates, equity),
+        'equity_curve': [[str(d), _num(v, 2)] for d, v in zip(dates, equity)],
+        'r_multiples': {
+            'risk_pct': risk_pct,
+            'mean': _num(valid_r.mean(), 2) if len(valid_r) else None,
+            'distribution': _histogram(valid_r, R_BINS, _r_labels()),
+        },
+        'holding_days': {
+            'mean': _num(holding.mean(), 1) if n else None,
+            'median': _num(np.median(holding), 1) if n else None,
+            'max': int(holding.max()) if n else None,
+            'distribution': _histogram(holding, HOLDING_BINS[1:], _holding_labels()),
+        },
+        'by_exit_reason': by_exit_reason(columns['exit_code'], pnl),
+    }
+
+
+def svg_points(values, width=600, height=120, max_points=300):
+    """'x,y x,y ...' for an SVG polyline of `values`, downsampled to at most max_points."""
+    values = np.asarray([v for v in values if v is not None], dtype=float)
+    if len(values) < 2:
+        return ''
+    if len(values) > max_points:
+        values = values[np.linspace(0, len(values) - 1, max_points).astype(int)]
+    lo, hi = values.min(), values.max()
+    span = hi - lo or 1.0
+    xs = np.linspace(0, width, len(values))
+    ys = height - (values - lo) / span * height
+    return ' '.join(f"{x:.1f},{y:.1f}" for x, y in zip(xs, ys))
@@ -0,0 +1,232 @@
+# trades/api.py
+"""
+Versioned JSON API (mounted at /api/v1/, see trades/api_urls.py).
+
+    GET  trades/                 ?status=open|closed  ?ticker=  ?fields=  ?cursor=  ?page_size=
+    GET  trades/<id>/            ?fields=
+    POST trades/bulk/            [{ticker, quantity, buy_price, buy_date, ...}, ...]
+    POST trades/bulk-close/      [{id, sell_price, sell_date?, exit_reason?, sell_notes?}, ...]
+    GET  positions/              open positions priced from PriceSnapshot
+    GET  stats/                  closed-trade summary (UserTradeStats)
+
+Reads cost a fixed number of queries whatever the page size: authentication,
+one keyset-paginated page query and, only when `charts` is in the fieldset, one
+prefetch for the page's charts. Unrequested columns are deferred.
+
+Bulk writes validate every item first and then apply all of them in one
+transaction (all or nothing): one bulk_create / bulk_update, one stats update,
+one NAV invalidation, one search reindex, one Position update per ticker and one
+cache bump per request.
+
+Responses are gzip-compressed when the client accepts it.
+"""
+import copy
+import datetime
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.decorators import method_decorator
+from django.views.decorators.gzip import gzip_page
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.views import APIView
+from rest_framework.viewsets import ReadOnlyModelViewSet
+
+from .caching import bump_generation, cached_for_user
+from .importers import insert_trades
+from .indicators import indicators_many
+from .models import Trade
+from .nav import affected_from, invalidate_from
+from .pagination import keyset_page
+from .portfolio import load_positions, value_positions
+from .positions import apply_lots, lot
+from .prices import snapshot_quotes
+from .search import index_trades
+from .serializers import (TradeCloseSerializer, TradeCreateSerializer, TradeDetailSerializer, TradeSerializer,
+                          UserTradeStatsSerializer, requested_fields)
+from .stats import contribution, get_user_stats, rebuild_user_stats, record_closes
+from .streams import get_hub
+from .utils import log_activity
+
+# keyset orderings (each served by a (user, ..., id) index) and their cursor names
+ORDERINGS = {
+    'closed': (('-sell_date', '-id'), 'sell_date'),
+    'open': (('-buy_date', '-id'), 'buy_date'),
+    '': (('-id',), 'id'),
+}
+CLOSE_FIELDS = ['is_closed', 'sell_price', 'sell_date', 'exit_reason', 'sell_notes', 'pnl', 'pnl_pct',
+                'indicators_json', 'updated_at']
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on top of trades/pagination.py: page N costs the same as page 1."""
+    page_size = 50
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering, sort = view.keyset_ordering()
+        try:
+            size = int(request.query_params.get('page_size', self.page_size))
+        except ValueError:
+            size = self.page_size
+        self.request = request
+        self.page = keyset_page(queryset, ordering, sort, request.query_params.get('cursor'),
+                                max(1, min(size, self.max_page_size)))
+        return list(self.page)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.request.build_absolute_uri(), 'cursor', cursor)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link(self.page.next_cursor),
+            'previous': self._link(self.page.prev_cursor),
+            'results': data,
+        })
+
+
+def _bulk_items(request):
+    """The request body as a list of items (a bare list or {"trades": [...]}), or an error Response."""
+    items = request.data.get('trades') if isinstance(request.data, dict) else request.data
+    if not isinstance(items, list) or not items:
+        return None, Response({'detail': "Expected a non-empty list of trades."}, status=status.HTTP_400_BAD_REQUEST)
+    limit = getattr(settings, 'API_BULK_MAX_ITEMS', 1000)
+    if len(items) > limit:
+        return None, Response({'detail': f"At most {limit} trades per request."},
+                              status=status.HTTP_400_BAD_REQUEST)
+    return items, None
+
+
+@method_decorator(gzip_page, name='dispatch')
+class TradeViewSet(ReadOnlyModelViewSet):
+    serializer_class = TradeDetailSerializer
+    pagination_class = KeysetPagination
+
+    def _status(self):
+        value = self.request.query_params.get('status', '')
+        return value if value in ORDERINGS else ''
+
+    def keyset_ordering(self):
+        return ORDERINGS[self._status()]
+
+    def get_queryset(self):
+        qs = Trade.objects.filter(user=self.request.user)
+        state = self._status()
+        if state:
+            qs = qs.filter(is_closed=(state == 'closed'))
+        ticker = self.request.query_params.get('ticker')
+        if ticker:
+            qs = qs.filter(ticker__iexact=ticker)
+        wanted = requested_fields(self.request)
+        if wanted is None or 'charts' in wanted:
+            qs = qs.prefetch_related('charts')
+        if wanted is not None:
+            columns = {f.name for f in Trade._meta.concrete_fields} & wanted
+            keys = {f.lstrip('-') for f in self.keyset_ordering()[0]}
+            qs = qs.only(*(columns | keys | {'id'}))
+        return qs
+
+    @action(detail=False, methods=['post'], url_path='bulk')
+    def bulk_create(self, request, version=None):
+        items, error = _bulk_items(request)
+        if error:
+            return error
+        serializer = TradeCreateSerializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        trades = [Trade(user=user, **values) for values in serializer.validated_data]
+        with transaction.atomic():
+            insert_trades(user, trades)
+            rebuild_user_stats(user)
+        bump_generation(user.pk)
+        get_hub().trades_changed(user.pk)
+        log_activity(user, f"Created {len(trades)} trades via API")
+        return Response(TradeSerializer(trades, many=True).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'], url_path='bulk-close')
+    def bulk_close(self, request, version=None):
+        items, error = _bulk_items(request)
+        if error:
+            return error
+        serializer = TradeCloseSerializer(data=items, many=True)
+        if not serializer.is_valid():
+            return Response({'errors': serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        entries = serializer.validated_data
+        today = datetime.date.today()
+        with transaction.atomic():
+            trades = Trade.objects.select_for_update().filter(user=user, pk__in=[e['id'] for e in entries])
+            trades = {t.pk: t for t in trades}
+            errors = [{} if e['id'] in trades else {'id': ["No such trade."]} for e in entries]
+            seen = set()
+            for entry, err in zip(entries, errors):
+                if entry['id'] in seen:
+                    err['id'] = ["Listed more than once."]
+                seen.add(entry['id'])
+            for entry, err in zip(entries, errors):
+                trade = trades.get(entry['id'])
+                if trade and (entry.get('sell_date') or today) < trade.buy_date:
+                    err['sell_date'] = ["Sell date is before buy date."]
+            if any(errors):
+                return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+            changes, stale_from, closed_lots = [], [], []
+            now = timezone.now()
+            for entry in entries:
+                trade = trades[entry['id']]
+                old = copy.copy(trade)
+                previous = contribution(trade)
+                trade.is_closed = True
+                trade.sell_price = entry['sell_price']
+                trade.sell_date = entry.get('sell_date') or today
+                trade.exit_reason = entry.get('exit_reason') or trade.exit_reason
+                trade.sell_notes = entry.get('sell_notes', trade.sell_notes)
+                trade.pnl, trade.pnl_pct = trade.compute_pnl()
+                trade.updated_at = now
+                changes.append((trade, previous))
+                stale_from.append(affected_from(old, trade))
+                closed_lots.append(lot(old))
+
+            # sell-side indicators for every trade in one batched lookup (as close_trade does per trade)
+            values = indicators_many([(t.ticker, t.sell_date) for t, _ in changes])
+            for trade, _ in changes:
+                found = values.get((trade.ticker.upper(), trade.sell_date))
+                if found is not None:
+                    data = dict(trade.indicators_json) if isinstance(trade.indicators_json, dict) else {}
+                    data['sell'] = found
+                    trade.indicators_json = data
+
+            closed = [t for t, _ in changes]
+            Trade.objects.bulk_update(closed, CLOSE_FIELDS)
+            record_closes(changes)
+            invalidate_from(user.pk, min((d for d in stale_from if d), default=None))
+            index_trades(t.pk for t in closed)
+            apply_lots(user.pk, removed=closed_lots)
+        bump_generation(user.pk)
+        get_hub().trades_changed(user.pk)
+        log_activity(user, f"Closed {len(closed)} trades via API")
+        return Response(TradeSerializer(closed, many=True).data)
+
+
+@method_decorator(gzip_page, name='dispatch')
+class PositionsView(APIView):
+    """Open positions priced from PriceSnapshot (same payload as portfolio_value_api)."""
+
+    def get(self, request, version=None):
+        positions = cached_for_user(request.user.pk, 'positions', lambda: load_positions(request.user))
+        return Response(value_positions(positions, snapshot_quotes([p['ticker'] for p in positions])))
+
+
+@method_decorator(gzip_page, name='dispatch')
+class StatsView(APIView):
+    def get(self, request, version=None):
+        return Response(UserTradeStatsSerializer(get_user_stats(request.user)).data)
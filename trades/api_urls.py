@@ -0,0 +1,14 @@
+# trades/api_urls.py
+"""JSON API routes, included under /api/<version>/ (see trades/api.py)."""
+from django.urls import path
+from rest_framework.routers import SimpleRouter
+
+from . import api
+
+router = SimpleRouter()
+router.register('trades', api.TradeViewSet, basename='api-trades')
+
+urlpatterns = [
+    path('positions/', api.PositionsView.as_view(), name='api-positions'),
+    path('stats/', api.StatsView.as_view(), name='api-stats'),
+] + router.urls
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TradesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "trades"
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connect receivers)
@@ -0,0 +1,44 @@
+# trades/backends/sqlite3/base.py
+"""
+SQLite engine tuned for several worker processes on one node
+(ENGINE = 'trades.backends.sqlite3').
+
+Every new connection gets PRAGMAS, with any values in settings.SQLITE_PRAGMAS
+taking precedence:
+
+- busy_timeout: a writer waits this many ms for the lock instead of failing
+  with "database is locked"
+- journal_mode=WAL: readers and the writer no longer block each other
+- synchronous=NORMAL: fsync at checkpoints rather than on every commit (with
+  WAL a power cut can lose the last commits but not corrupt the file)
+- mmap_size: read pages through a memory map instead of read() calls
+
+Transactions start with BEGIN IMMEDIATE. A plain BEGIN takes the write lock
+only at the first write, and a transaction that has already read (as a
+pre_save signal does) and then finds another writer ahead of it fails at once,
+busy_timeout or not. Taking the lock up front makes it wait its turn instead.
+"""
+from django.conf import settings
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    'busy_timeout': 5000,  # ms a writer waits for the lock
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,  # bytes
+}
+
+
+def pragmas():
+    return {**PRAGMAS, **getattr(settings, 'SQLITE_PRAGMAS', {})}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in pragmas().items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute("BEGIN IMMEDIATE")
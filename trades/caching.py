@@ -0,0 +1,87 @@
+# trades/caching.py
+"""
+Per-user, generation-keyed cache for the data behind trade_list, reports and
+portfolio_value_api.
+
+Every user has a generation number, a CacheGeneration row in the database. Any
+write that can change what those views show (Trade / TradeChart / Rules save or
+delete, CSV import, add_trade / close_trade) bumps it, and cached entries are
+keyed on it, so a write makes all of the user's older entries unreachable at
+once: exact invalidation, no TTLs to tune. Unreachable entries simply age out
+(RESPONSE_CACHE_TIMEOUT) or get evicted.
+
+The counter lives in the database, not the cache, so every worker process sees
+a bump even with the per-process LocMemCache. The bump commits together with
+the write it belongs to: a page built from pre-commit data is keyed on the old
+generation and never served afterwards. The cost is one primary-key read per
+cached view.
+
+What is cached is view data (querysets evaluated into lists, computed dicts),
+not rendered HTML: the page around it still carries the request's own CSRF
+token and messages. Prices are never cached here; they are applied per request.
+
+Hits and misses are counted per view name in the cache (cache_stats()).
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import CacheGeneration
+
+PREFIX = 'respcache'
+
+
+def generation(user_id):
+    """The user's current generation (started from the clock so a restored database never reuses old numbers)."""
+    value = CacheGeneration.objects.filter(user_id=user_id).values_list('value', flat=True).first()
+    if value is None:
+        value = CacheGeneration.objects.get_or_create(user_id=user_id, defaults={'value': time.time_ns()})[0].value
+    return value
+
+
+def bump_generation(user_id):
+    """Invalidate everything cached for the user, in the caller's transaction."""
+    if user_id is None:
+        return
+    # no row yet means nothing was cached for the user: generation() creates it
+    CacheGeneration.objects.filter(user_id=user_id).update(value=F('value') + 1)
+
+
+def _count(name, outcome):
+    key = f"{PREFIX}:stats:{name}:{outcome}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key)
+
+
+def cache_stats(names=('trade_list', 'reports', 'positions')):
+    """{name: {'hit': n, 'miss': n}} since the counters were last reset."""
+    keys = {(name, outcome): f"{PREFIX}:stats:{name}:{outcome}" for name in names for outcome in ('hit', 'miss')}
+    values = cache.get_many(list(keys.values()))
+    return {name: {outcome: values.get(keys[(name, outcome)], 0) for outcome in ('hit', 'miss')} for name in names}
+
+
+def reset_stats(names=('trade_list', 'reports', 'positions')):
+    cache.delete_many([f"{PREFIX}:stats:{name}:{outcome}" for name in names for outcome in ('hit', 'miss')])
+
+
+def cached_for_user(user_id, name, build, params=''):
+    """
+    build() for the user's current generation, computed at most once per
+    (generation, name, params). `params` distinguishes variants (e.g. a query string).
+    """
+    digest = hashlib.sha1(str(params).encode()).hexdigest()[:16]
+    key = f"{PREFIX}:{name}:{user_id}:{generation(user_id)}:{digest}"
+    value = cache.get(key)
+    if value is not None:
+        _count(name, 'hit')
+        return value
+    _count(name, 'miss')
+    value = build()
+    cache.set(key, value, timeout=getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 24 * 3600))
+    return value
@@ -0,0 +1,140 @@
+# trades/candles.py
+"""
+Candlestick charts rendered on the server for trade_detail.
+
+The chart covers CHART_RENDER_LEAD_DAYS before buy_date up to sell_date (or today
+for open trades) and marks the entry and exit. Bars come from the local price
+history (trades/history.py); nothing is fetched from the provider here.
+
+Rendering (mplfinance/matplotlib) runs in the shared image process pool and the
+PNG is written to CHART_RENDER_DIR under a name derived from
+(ticker, date range, last stored bar, style, markers), so a repeat view is a file
+read and a render made before the history caught up is redone once it has. Files are
+written to a temp name and renamed, so a concurrent reader never sees half a PNG.
+"""
+import datetime
+import hashlib
+import os
+import threading
+import time
+
+from django.conf import settings
+
+from .history import HistoryStore, get_store
+from .images import get_pool
+
+RENDER_VERSION = 1  # bump to invalidate cached renders after a layout change
+
+
+def render_dir():
+    return getattr(settings, 'CHART_RENDER_DIR', os.path.join(settings.BASE_DIR, 'chart_cache'))
+
+
+def chart_spec(trade, today=None, store=None):
+    """Everything a render depends on; also the cache key."""
+    lead = datetime.timedelta(days=getattr(settings, 'CHART_RENDER_LEAD_DAYS', 60))
+    markers = [('entry', trade.buy_date.isoformat(), float(trade.buy_price))]
+    if trade.is_closed and trade.sell_date and trade.sell_price is not None:
+        markers.append(('exit', trade.sell_date.isoformat(), float(trade.sell_price)))
+    end = trade.sell_date if trade.is_closed and trade.sell_date else (today or datetime.date.today())
+    # the last bar the chart can show: a later sync_history changes the picture, so it is part of the key
+    last = (store or get_store()).last_date(trade.ticker.upper())
+    return {
+        'ticker': trade.ticker.upper(),
+        'start': (trade.buy_date - lead).isoformat(),
+        'end': end.isoformat(),
+        'through': min(last, end).isoformat() if last else None,
+        'style': getattr(settings, 'CHART_RENDER_STYLE', 'yahoo'),
+        'markers': markers,
+    }
+
+
+def cache_path(spec):
+    digest = hashlib.sha1(repr((RENDER_VERSION, sorted(spec.items()))).encode()).hexdigest()[:12]
+    name = f"{spec['ticker']}_{spec['start']}_{spec['end']}_{spec['style']}_{digest}.png"
+    return os.path.join(render_dir(), name.replace('/', '_'))
+
+
+def render_candles(path, history_root, ticker, start, end, style, markers, through=None):
+    """Worker: read bars from the history store (up to `through`) and write the chart PNG to `path`."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import mplfinance as mpf
+    import numpy as np
+    import pandas as pd
+
+    bars = HistoryStore(history_root).read(ticker, start, through or end)
+    if not len(bars):
+        raise LookupError(f"no price history for {ticker} between {start} and {end}")
+    index = pd.DatetimeIndex(bars['date'])
+    frame = pd.DataFrame({'Open': bars['open'], 'High': bars['high'], 'Low': bars['low'],
+                          'Close': bars['close'], 'Volume': bars['volume']}, index=index)
+
+    addplots = []
+    for kind, date, price in markers:
+        # place the marker on the first bar on/after the date (weekends, holidays)
+        pos = min(index.searchsorted(pd.Timestamp(date)), len(index) - 1)
+        series = np.full(len(index), np.nan)
+        series[pos] = price
+        addplots.append(mpf.make_addplot(series, type='scatter', markersize=90,
+                                         marker='^' if kind == 'entry' else 'v',
+                                         color='#2563eb' if kind == 'entry' else '#ea580c'))
+
+    fig, _ = mpf.plot(frame, type='candle', style=style, volume=bool(frame['Volume'].any()),
+                      addplot=addplots, returnfig=True, figsize=(9, 5), tight_layout=True,
+                      title=f"{ticker}  {start} – {end}")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        fig.savefig(tmp, dpi=100, format='png')
+        os.replace(tmp, path)
+    finally:
+        plt.close(fig)
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    return path
+
+
+_inflight = {}  # cache path -> Future, so concurrent views of one chart render it once
+_inflight_lock = threading.Lock()
+
+
+def render_trade_chart(trade, timeout=None):
+    """
+    Path of the trade's candlestick PNG, rendering it if needed.
+    Returns None when there is no local price history for the ticker.
+    """
+    store = get_store()
+    spec = chart_spec(trade, store=store)
+    if spec['through'] is None:
+        return None
+    path = cache_path(spec)
+    if os.path.exists(path):
+        return path
+
+    with _inflight_lock:
+        future = _inflight.get(path)
+        if future is None:
+            future = get_pool().submit(render_candles, path, store.root, **spec)
+            _inflight[path] = future
+            future.add_done_callback(lambda f, p=path: _inflight.pop(p, None))
+    try:
+        return future.result(timeout or getattr(settings, 'CHART_RENDER_TIMEOUT', 15))
+    except LookupError:
+        return None
+
+
+def prune_render_cache(max_age_days=30):
+    """Delete renders older than max_age_days (e.g. superseded 'until today' ranges). Returns files removed."""
+    root = render_dir()
+    if not os.path.isdir(root):
+        return 0
+    cutoff = time.time() - max_age_days * 86400
+    removed = 0
+    for name in os.listdir(root):
+        path = os.path.join(root, name)
+        if os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed += 1
+    return removed
@@ -0,0 +1,56 @@
+# trades/etags.py
+"""
+ETags for conditional GETs (used with django.views.decorators.http.condition).
+
+Each tag is built from one or two aggregate queries, so an unchanged poll is
+answered with 304 Not Modified before any aggregation or serialization:
+
+- portfolio_etag: the user's trade count and latest Trade.updated_at, plus the
+  price snapshots of their open tickers (count, latest fetched_at, and how many
+  are already stale, since `stale` flags flip as time passes)
+- reports_etag: count and latest updated_at of the user's closed trades, plus
+  the session (the page embeds per-session CSRF tokens); none while flash
+  messages are pending
+"""
+import datetime
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+from django.db.models import Count, Max, Q
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from .models import PriceSnapshot, Trade
+
+VERSION = 1  # bump when a payload's shape changes
+
+
+def _tag(*parts):
+    return hashlib.sha1(repr((VERSION,) + parts).encode()).hexdigest()
+
+
+def trade_state(qs):
+    state = qs.aggregate(count=Count('id'), last=Max('updated_at'))
+    return state['count'], state['last'].isoformat() if state['last'] else None
+
+
+def portfolio_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    trades = Trade.objects.filter(user=request.user)
+    count, last = trade_state(trades)
+    open_tickers = trades.filter(is_closed=False).annotate(symbol=Upper('ticker')).values('symbol')
+    cutoff = timezone.now() - datetime.timedelta(seconds=getattr(settings, 'PRICE_SNAPSHOT_MAX_AGE', 120))
+    prices = PriceSnapshot.objects.filter(ticker__in=open_tickers).aggregate(
+        count=Count('id'), last=Max('updated_at'), stale=Count('id', filter=Q(fetched_at__lt=cutoff)))
+    return _tag('portfolio', request.user.pk, count, last, prices['count'],
+                prices['last'].isoformat() if prices['last'] else None, prices['stale'])
+
+
+def reports_etag(request):
+    # pending flash messages (e.g. a failed export redirected here) must be rendered
+    if not request.user.is_authenticated or len(messages.get_messages(request)):
+        return None
+    count, last = trade_state(Trade.objects.filter(user=request.user, is_closed=True))
+    return _tag('reports', request.user.pk, request.session.session_key, count, last)
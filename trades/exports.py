@@ -0,0 +1,126 @@
+# trades/exports.py
+"""
+Closed-trade exports that stream in constant memory.
+
+- closed_trade_rows(user): yields one tuple per closed trade; trades are read with
+  iterator(chunk_size=EXPORT_CHUNK_SIZE) and charts are prefetched per chunk
+  (one extra query per chunk instead of one per trade)
+- stream_csv(rows): CSV text chunks for StreamingHttpResponse
+- write_parquet(rows, fileobj): Parquet file written one row group per chunk
+  (needs the optional pyarrow package)
+"""
+import csv
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import Prefetch
+
+from .models import Trade, TradeChart
+
+# Optional: pyarrow for the Parquet export.
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = pq = None
+
+COLUMNS = ['id', 'ticker', 'quantity', 'buy_price', 'buy_date', 'sell_price', 'sell_date', 'pnl', 'exit_reason',
+           'indicators_text', 'charts']
+
+
+def chunk_size():
+    return getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+
+def closed_trade_rows(user):
+    """Yield (id, ticker, quantity, buy_price, buy_date, sell_price, sell_date, pnl, exit_reason,
+    indicators_text, [chart names]) for the user's closed trades, newest sell first."""
+    closed = (Trade.objects.filter(user=user, is_closed=True)
+              .order_by('-sell_date', '-id')
+              .only('id', 'ticker', 'quantity', 'buy_price', 'buy_date', 'sell_price', 'sell_date', 'pnl',
+                    'exit_reason', 'indicators_text')
+              .prefetch_related(Prefetch('charts', queryset=TradeChart.objects.only('id', 'trade_id', 'image'))))
+    for t in closed.iterator(chunk_size=chunk_size()):
+        yield (
+            t.id,
+            t.ticker,
+            t.quantity,
+            t.buy_price,
+            t.buy_date,
+            t.sell_price,
+            t.sell_date,
+            t.pnl,
+            t.exit_reason,
+            t.indicators_text,
+            [c.image.name for c in t.charts.all()],
+        )
+
+
+class Echo:
+    """File-like object whose write() just returns the value (for csv.writer streaming)."""
+
+    def write(self, value):
+        return value
+
+
+def stream_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(COLUMNS)
+    for (tid, ticker, qty, buy_price, buy_date, sell_price, sell_date, pnl, exit_reason,
+         indicators_text, charts) in rows:
+        yield writer.writerow([
+            tid,
+            ticker,
+            str(qty),
+            str(buy_price),
+            buy_date.isoformat() if buy_date else '',
+            str(sell_price) if sell_price else '',
+            sell_date.isoformat() if sell_date else '',
+            str(pnl or 0),
+            exit_reason or '',
+            (indicators_text or '').replace('\n', ' | '),
+            ";".join(charts),
+        ])
+
+
+def parquet_schema():
+    return pa.schema([
+        ('id', pa.int64()),
+        ('ticker', pa.string()),
+        ('quantity', pa.float64()),
+        ('buy_price', pa.float64()),
+        ('buy_date', pa.date32()),
+        ('sell_price', pa.float64()),
+        ('sell_date', pa.date32()),
+        ('pnl', pa.float64()),
+        ('exit_reason', pa.string()),
+        ('indicators_text', pa.string()),
+        ('charts', pa.list_(pa.string())),
+    ])
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def write_parquet(rows, fileobj):
+    """Write rows to fileobj as Parquet, one row group per chunk. Returns the row count."""
+    if pa is None:
+        raise RuntimeError("pyarrow is required for the Parquet export")
+    schema = parquet_schema()
+    total = 0
+    rows = iter(rows)
+    with pq.ParquetWriter(fileobj, schema, compression='snappy') as writer:
+        while True:
+            batch = list(islice(rows, chunk_size()))
+            if not batch:
+                break
+            columns = list(zip(*batch))
+            for i in (2, 3, 5, 7):  # decimal columns
+                columns[i] = [_float(v) for v in columns[i]]
+            writer.write_table(pa.Table.from_arrays([pa.array(col, type=field.type)
+                                                     for col, field in zip(columns, schema)], schema=schema))
+            total += len(batch)
+        if not total:
+            writer.write_table(schema.empty_table())
+    return total
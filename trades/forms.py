@@ -1,4 +1,6 @@
 from django import forms
+from django.conf import settings
+from django.template.defaultfilters import filesizeformat
 from .models import Trade, TradeChart
 
 
@@ -47,4 +49,24 @@ class CloseTradeForm(forms.ModelForm):
             'sell_date': forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
             'exit_reason': forms.Select(attrs={'class': 'form-select'}),
             'sell_notes': forms.Textarea(attrs={'class': 'form-control', 'rows': 4}),
-        }
\ No newline at end of file
+        }
+
+
+class ImportTradesForm(forms.Form):
+    file = forms.FileField(
+        help_text="Broker CSV with ticker, quantity, buy_price, buy_date and optional sell_price, sell_date, exit_reason.",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,text/csv'}),
+    )
+    dry_run = forms.BooleanField(required=False, label="Validate only (don't save)",
+                                 widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}))
+
+    def clean_file(self):
+        upload = self.cleaned_data['file']
+        limit = getattr(settings, 'IMPORT_MAX_UPLOAD_BYTES', 2 * 1024 * 1024)
+        if upload.size > limit:
+            # the import runs inside the request: large files belong to the management command
+            raise forms.ValidationError(
+                f"File is larger than {filesizeformat(limit)}. Import it with "
+                f"`python manage.py import_trades <file> --user <username>` instead."
+            )
+        return upload
@@ -0,0 +1,158 @@
+# trades/history.py
+"""
+Local daily OHLCV history, one file per ticker.
+
+Bars are fixed-size records (BAR_DTYPE) appended to PRICE_HISTORY_DIR/<TICKER>.bin
+in date order and read back through np.memmap, so a range read is two binary
+searches on the date column plus a slice of the mapped file, with no parsing and
+no provider call.
+
+- HistoryStore.read(ticker, start, end): structured array of bars in the range
+- HistoryStore.append(ticker, bars): adds only bars newer than the last stored one
+- sync_history(tickers): fetch just the missing bars of completed sessions from
+  the quote provider
+- load_fixture(path): import bars from a CSV (ticker,date,open,high,low,close,volume)
+  for offline development and tests
+
+`manage.py sync_price_history` keeps the store current for all traded tickers.
+"""
+import csv
+import datetime
+import os
+import re
+import threading
+from collections import defaultdict
+
+import numpy as np
+from django.conf import settings
+
+from .quotes import get_provider
+
+BAR_DTYPE = np.dtype([
+    ('date', 'datetime64[D]'),
+    ('open', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('close', '<f8'),
+    ('volume', '<f8'),
+])
+
+_SAFE_TICKER = re.compile(r'[^A-Z0-9._^=-]')
+
+
+def to_bars(rows):
+    """Structured BAR_DTYPE array from (date, open, high, low, close, volume) tuples."""
+    bars = np.array([tuple(r) for r in rows], dtype=BAR_DTYPE)
+    return np.sort(bars, order='date')
+
+
+def history_dir():
+    return getattr(settings, 'PRICE_HISTORY_DIR', os.path.join(settings.BASE_DIR, 'price_history'))
+
+
+class HistoryStore:
+    def __init__(self, root=None):
+        self.root = root or history_dir()
+        self._lock = threading.Lock()
+
+    def path(self, ticker):
+        return os.path.join(self.root, _SAFE_TICKER.sub('_', ticker.upper()) + '.bin')
+
+    def tickers(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name[:-4] for name in os.listdir(self.root) if name.endswith('.bin'))
+
+    def bars(self, ticker):
+        """All stored bars as a read-only memory map (empty array if none)."""
+        path = self.path(ticker)
+        try:
+            # a torn record at the end (interrupted append) is ignored
+            count = os.path.getsize(path) // BAR_DTYPE.itemsize
+        except FileNotFoundError:
+            count = 0
+        if count:
+            return np.memmap(path, dtype=BAR_DTYPE, mode='r', shape=(count,))
+        return np.empty(0, dtype=BAR_DTYPE)
+
+    def read(self, ticker, start=None, end=None):
+        """Bars with start <= date <= end (either bound optional), oldest first."""
+        bars = self.bars(ticker)
+        lo = np.searchsorted(bars['date'], np.datetime64(start, 'D')) if start else 0
+        hi = np.searchsorted(bars['date'], np.datetime64(end, 'D'), side='right') if end else len(bars)
+        return np.array(bars[lo:hi])
+
+    def last_date(self, ticker):
+        bars = self.bars(ticker)
+        return bars['date'][-1].item() if len(bars) else None
+
+    def append(self, ticker, bars):
+        """Append bars newer than the last stored date; returns how many were written."""
+        if not isinstance(bars, np.ndarray):
+            bars = to_bars(bars)
+        if not len(bars):
+            return 0
+        with self._lock:
+            last = self.last_date(ticker)
+            if last is not None:
+                bars = bars[bars['date'] > np.datetime64(last, 'D')]
+            _, first = np.unique(bars['date'], return_index=True)
+            bars = bars[first]
+            if not len(bars):
+                return 0
+            os.makedirs(self.root, exist_ok=True)
+            with open(self.path(ticker), 'ab') as fh:
+                # drop a torn record left by an interrupted append so new bars stay aligned
+                fh.truncate(fh.tell() - fh.tell() % BAR_DTYPE.itemsize)
+                fh.write(bars.astype(BAR_DTYPE).tobytes())
+        return len(bars)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None or _store.root != history_dir():
+        _store = HistoryStore()
+    return _store
+
+
+def history_start():
+    """First date fetched for a ticker that has no local history yet."""
+    value = getattr(settings, 'PRICE_HISTORY_START', '2015-01-01')
+    return datetime.date.fromisoformat(value) if isinstance(value, str) else value
+
+
+def sync_history(tickers, store=None, provider=None, until=None):
+    """
+    Fetch only the bars each ticker is missing, up to `until` (default yesterday:
+    today's bar is still forming and appended bars are never rewritten).
+    Returns {ticker: bars added}.
+    """
+    store = store or get_store()
+    provider = provider or get_provider()
+    until = until or datetime.date.today() - datetime.timedelta(days=1)
+    added = {}
+    for ticker in tickers:
+        last = store.last_date(ticker)
+        start = last + datetime.timedelta(days=1) if last else history_start()
+        if start > until:
+            added[ticker] = 0
+            continue
+        added[ticker] = store.append(ticker, provider.get_history(ticker, start, until))
+    return added
+
+
+def load_fixture(path, store=None):
+    """Import bars from a CSV with columns ticker,date,open,high,low,close,volume. Returns {ticker: bars added}."""
+    store = store or get_store()
+    rows = defaultdict(list)
+    with open(path, newline='') as fh:
+        for row in csv.DictReader(fh):
+            rows[row['ticker'].strip().upper()].append((
+                datetime.date.fromisoformat(row['date'].strip()),
+                float(row['open']), float(row['high']), float(row['low']), float(row['close']),
+                float(row.get('volume') or 0),
+            ))
+    return {ticker: store.append(ticker, bars) for ticker, bars in rows.items()}
@@ -0,0 +1,151 @@
+# trades/images.py
+"""
+Resized derivatives for TradeChart uploads.
+
+For every chart image we store, next to the original:
+    <name>.thumb.webp / <name>.thumb.jpg     (CHART_DERIVATIVE_SIZES['thumb'] px wide max)
+    <name>.medium.webp / <name>.medium.jpg   (CHART_DERIVATIVE_SIZES['medium'] px wide max)
+
+Generation runs in a process pool (Pillow work is CPU-bound) after the upload's
+transaction commits; the worker only touches storage, and the parent marks
+TradeChart.derivatives_ready once all files exist. Templates and the admin use
+the derivatives via srcset and link the original for full-size viewing.
+"""
+import io
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connection, transaction
+
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+
+def sizes():
+    return getattr(settings, 'CHART_DERIVATIVE_SIZES', {'thumb': 320, 'medium': 1024})
+
+
+def derivative_name(name, size, fmt):
+    return f"{os.path.splitext(name)[0]}.{size}.{fmt}"
+
+
+def srcset(storage, name, fmt):
+    """'url 320w, url 1024w' for a stored original."""
+    return ", ".join(f"{storage.url(derivative_name(name, size, fmt))} {width}w"
+                     for size, width in sizes().items())
+
+
+def chart_storage():
+    from .models import TradeChart
+    return TradeChart._meta.get_field('image').storage
+
+
+def generate_derivatives(name, storage=None, size_map=None):
+    """
+    Create all derivatives of the stored image `name`. Safe to re-run (files are replaced).
+    Returns the list of derivative names written.
+    """
+    from PIL import Image, ImageOps
+
+    storage = storage or chart_storage()
+    size_map = size_map or sizes()
+    with storage.open(name, 'rb') as fh:
+        img = Image.open(fh)
+        img = ImageOps.exif_transpose(img)
+        img.load()
+    if img.mode not in ('RGB', 'RGBA'):
+        img = img.convert('RGBA' if 'A' in img.getbands() else 'RGB')
+
+    # derivatives are named after their blob, not hashed themselves
+    save = getattr(storage, 'save_exact', storage.save)
+    written = []
+    for size, width in size_map.items():
+        resized = img.copy()
+        resized.thumbnail((width, width * 4), Image.LANCZOS)
+        for fmt, (pil_format, options) in FORMATS.items():
+            out = resized.convert('RGB') if pil_format == 'JPEG' else resized
+            buf = io.BytesIO()
+            out.save(buf, pil_format, **options)
+            target = derivative_name(name, size, fmt)
+            if storage.exists(target):
+                storage.delete(target)
+            written.append(save(target, ContentFile(buf.getvalue())))
+    return written
+
+
+def delete_derivatives(name, storage=None):
+    storage = storage or chart_storage()
+    for size in sizes():
+        for fmt in FORMATS:
+            target = derivative_name(name, size, fmt)
+            if storage.exists(target):
+                storage.delete(target)
+
+
+def _init_worker():
+    """Process-pool initializer: workers are spawned, so they need their own Django setup."""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'portfolio.settings')
+    import django
+    django.setup()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Process pool shared by the app's CPU-bound image work (derivatives, candlestick renders)."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                # spawn, not fork: the web process is multi-threaded and holds DB connections
+                _pool = ProcessPoolExecutor(
+                    max_workers=getattr(settings, 'CHART_DERIVATIVE_WORKERS', 2),
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+    return _pool
+
+
+def _mark_ready(chart_id, future):
+    from .models import TradeChart
+
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        TradeChart.objects.filter(pk=chart_id).update(derivatives_ready=True)
+    finally:
+        connection.close()  # callbacks run on the pool's management thread
+
+
+def build_derivatives(chart, wait=False):
+    """Generate a chart's derivatives in the process pool; `wait` blocks until done."""
+    future = get_pool().submit(generate_derivatives, chart.image.name)
+    if wait:
+        future.result()
+        type(chart).objects.filter(pk=chart.pk).update(derivatives_ready=True)
+        chart.derivatives_ready = True
+    else:
+        future.add_done_callback(lambda f, pk=chart.pk: _mark_ready(pk, f))
+    return future
+
+
+def schedule_derivatives(chart):
+    """Queue derivative generation once the chart row is committed (off the request path)."""
+    # blobs are shared between charts: reuse derivatives another chart already built
+    if type(chart).objects.filter(image=chart.image.name, derivatives_ready=True).exclude(pk=chart.pk).exists():
+        type(chart).objects.filter(pk=chart.pk).update(derivatives_ready=True)
+        chart.derivatives_ready = True
+        return
+    if not getattr(settings, 'CHART_DERIVATIVES_ASYNC', True):
+        generate_derivatives(chart.image.name, storage=chart.image.storage)
+        type(chart).objects.filter(pk=chart.pk).update(derivatives_ready=True)
+        return
+    transaction.on_commit(lambda: build_derivatives(chart))
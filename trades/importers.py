@@ -0,0 +1,178 @@
+# trades/importers.py
+"""
+Bulk trade import from broker CSV files.
+
+Rows are streamed from the file, validated in batches with the same form fields
+(and therefore the same rules) as TradeForm / CloseTradeForm, and inserted with
+one bulk_create per batch inside a transaction. A row with sell_price is imported
+as a closed trade (sold today if it has no sell_date); sell_date or exit_reason
+without sell_price is an error. Per-row errors are collected and returned; one ActivityLog
+entry summarises the import.
+
+Expected columns (header names are case-insensitive; common broker aliases work):
+    ticker, quantity, buy_price, buy_date,
+    sell_price, sell_date, exit_reason,            # optional: closed trades
+    indicators_text, buy_notes, sell_notes          # optional
+"""
+import csv
+import datetime
+import io
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .caching import bump_generation
+from .forms import CloseTradeForm, TradeForm
+from .models import Trade
+from .nav import invalidate_from
+from .positions import apply_lots, lot
+from .search import index_trades
+from .stats import rebuild_user_stats
+from .utils import log_activity
+
+HEADER_ALIASES = {
+    'symbol': 'ticker',
+    'instrument': 'ticker',
+    'qty': 'quantity',
+    'shares': 'quantity',
+    'buy price': 'buy_price',
+    'entry price': 'buy_price',
+    'avg price': 'buy_price',
+    'buy date': 'buy_date',
+    'entry date': 'buy_date',
+    'sell price': 'sell_price',
+    'exit price': 'sell_price',
+    'sell date': 'sell_date',
+    'exit date': 'sell_date',
+    'exit reason': 'exit_reason',
+    'indicators': 'indicators_text',
+    'notes': 'buy_notes',
+}
+
+# form fields, built once: per-row validation reuses them instead of instantiating forms
+BUY_FIELDS = TradeForm.base_fields
+SELL_FIELDS = CloseTradeForm.base_fields
+
+MAX_REPORTED_ERRORS = 1000
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.open_created = 0
+        self.closed_created = 0
+        self.error_count = 0
+        self.errors = []  # (line number, {field: [messages]}), first MAX_REPORTED_ERRORS only
+
+    @property
+    def created(self):
+        return self.open_created + self.closed_created
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, errors))
+
+    def summary(self):
+        return (f"rows={self.rows} created={self.created} (open={self.open_created} "
+                f"closed={self.closed_created}) errors={self.error_count}")
+
+
+def normalize_header(name):
+    key = (name or '').strip().lower().replace('-', ' ')
+    key = HEADER_ALIASES.get(key, key)
+    return key.replace(' ', '_')
+
+
+def _clean(fields, row, errors):
+    cleaned = {}
+    for name, field in fields.items():
+        try:
+            cleaned[name] = field.clean(row.get(name, '').strip() or None)
+        except ValidationError as exc:
+            errors[name] = exc.messages
+    return cleaned
+
+
+def validate_row(row):
+    """Return (cleaned values, errors) for one CSV row, using the TradeForm / CloseTradeForm fields."""
+    errors = {}
+    values = _clean(BUY_FIELDS, row, errors)
+    if (row.get('sell_price') or '').strip():
+        sell = _clean(SELL_FIELDS, row, errors)
+        if not sell.get('sell_date') and 'sell_date' not in errors:
+            # like close_trade: a closed trade without a sell date was closed today
+            sell['sell_date'] = datetime.date.today()
+        if not errors and sell.get('sell_date') and values.get('buy_date') and sell['sell_date'] < values['buy_date']:
+            errors['sell_date'] = ["Sell date is before buy date."]
+        values.update(sell)
+        values['is_closed'] = True
+    elif (row.get('sell_date') or '').strip() or (row.get('exit_reason') or '').strip():
+        errors['sell_price'] = ["Required to import a closed trade."]
+    for key in ('indicators_text', 'buy_notes', 'sell_notes'):
+        if values.get(key) is None:
+            values[key] = ''
+    return values, errors
+
+
+def read_rows(fileobj, encoding='utf-8-sig'):
+    """Yield (line number, row dict with normalized keys) from a binary or text file object."""
+    if isinstance(fileobj.read(0), bytes):
+        fileobj = io.TextIOWrapper(fileobj, encoding=encoding, newline='')
+    reader = csv.reader(fileobj)
+    header = [normalize_header(h) for h in next(reader, [])]
+    for row in reader:
+        if not any(cell.strip() for cell in row):
+            continue
+        yield reader.line_num, dict(zip(header, row))
+
+
+def insert_trades(user, trades, batch_size=None):
+    """
+    bulk_create unsaved `trades` of `user` and do what their save() and signals
+    would have done per row (stored P&L, NAV invalidation, search index, positions).
+    UserTradeStats and the view cache are left to the caller, once per import.
+    """
+    for trade in trades:
+        # bulk_create skips save(): fill the stored P&L columns here
+        trade.pnl, trade.pnl_pct = trade.compute_pnl()
+    with transaction.atomic():
+        Trade.objects.bulk_create(trades, batch_size=batch_size)
+        # bulk_create sends no signals: add the open rows to their positions,
+        apply_lots(user.pk, added=[lot(t) for t in trades])
+    # ... drop NAV snapshots the backdated rows change and index them for full-text search
+    invalidate_from(user.pk, min(t.buy_date for t in trades))
+    index_trades(t.pk for t in trades if t.pk is not None)
+    return trades
+
+
+def import_trades(user, fileobj, batch_size=None, dry_run=False, source='CSV'):
+    """Import trades for `user` from a broker CSV file object. Returns an ImportResult."""
+    batch_size = batch_size or getattr(settings, 'IMPORT_BATCH_SIZE', 2000)
+    result = ImportResult()
+    rows = read_rows(fileobj)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        trades = []
+        for line, row in batch:
+            result.rows += 1
+            values, errors = validate_row(row)
+            if errors:
+                result.add_error(line, errors)
+                continue
+            trades.append(Trade(user=user, **values))
+        if trades and not dry_run:
+            insert_trades(user, trades, batch_size=batch_size)
+        closed = sum(1 for t in trades if t.is_closed)
+        result.closed_created += closed
+        result.open_created += len(trades) - closed
+
+    if result.created and not dry_run:
+        rebuild_user_stats(user)
+        bump_generation(user.pk)
+        log_activity(user, f"Imported {result.created} trades", details=f"{source}: {result.summary()}")
+    return result
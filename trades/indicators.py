@@ -0,0 +1,218 @@
+# trades/indicators.py
+"""
+Stage-analysis indicators from the local price history.
+
+For a ticker the daily bars are folded into weekly bars (Monday-Friday, close =
+last close of the week, volume = sum), and over the whole weekly series at once:
+
+- ema30: 30-week EMA of the close, and its slope over INDICATOR_SLOPE_WEEKS
+  (percent change; 'rising' / 'flat' / 'falling' around INDICATOR_FLAT_PCT)
+- mansfield_rs: Mansfield relative strength against INDICATOR_BENCHMARK,
+  (RS / 52-week SMA of RS - 1) * 100 with RS = close / benchmark close
+- volume_ratio: the week's volume / average of the previous INDICATOR_VOLUME_WEEKS
+
+indicators_at(ticker, date) returns the values of the last complete week ending
+on or before `date` (no look-ahead; a Friday that is today is still trading),
+so every trade in the same ticker and week shares one result. Results are cached
+per (ticker, week) in the Django cache: for good once the stored history covers
+the week's Friday, for INDICATOR_PARTIAL_CACHE_TTL seconds before that. The
+weekly table behind them is computed once per ticker per history update.
+
+snapshot_indicators(trade, side) stores them in trade.indicators_json['buy' | 'sell'].
+"""
+import datetime
+import threading
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.core.cache import cache
+
+from .history import get_store
+
+VERSION = 1  # bump when the definitions change (cache keys include it)
+MONDAY = np.datetime64('1970-01-05', 'D')  # weeks are counted from a Monday
+
+
+def params():
+    return {
+        'benchmark': getattr(settings, 'INDICATOR_BENCHMARK', 'SPY').upper(),
+        'ema_weeks': getattr(settings, 'INDICATOR_EMA_WEEKS', 30),
+        'slope_weeks': getattr(settings, 'INDICATOR_SLOPE_WEEKS', 4),
+        'flat_pct': getattr(settings, 'INDICATOR_FLAT_PCT', 0.5),
+        'rs_weeks': getattr(settings, 'INDICATOR_RS_WEEKS', 52),
+        'volume_weeks': getattr(settings, 'INDICATOR_VOLUME_WEEKS', 10),
+    }
+
+
+def weekly_bars(bars):
+    """(week_end dates (Fridays), closes, volumes) from daily BAR_DTYPE bars."""
+    if not len(bars):
+        empty = np.array([], dtype=float)
+        return np.array([], dtype='datetime64[D]'), empty, empty
+    week = (bars['date'] - MONDAY).astype('int64') // 7
+    starts = np.flatnonzero(np.r_[True, week[1:] != week[:-1]])
+    ends = np.r_[starts[1:] - 1, len(week) - 1]
+    week_end = MONDAY + (week[starts] * 7 + 4).astype('timedelta64[D]')
+    return week_end, np.asarray(bars['close'])[ends], np.add.reduceat(np.asarray(bars['volume']), starts)
+
+
+def _rolling_mean(values, window):
+    """Mean of the previous `window` values (excluding the current one); NaN until enough history."""
+    out = np.full(len(values), np.nan)
+    if len(values) > window:
+        csum = np.cumsum(np.r_[0.0, values])
+        out[window:] = (csum[window:-1] - csum[:-window - 1]) / window
+    return out
+
+
+def _trailing_mean(values, window):
+    """Mean of the last `window` values including the current one."""
+    out = np.full(len(values), np.nan)
+    if len(values) >= window:
+        csum = np.cumsum(np.r_[0.0, values])
+        out[window - 1:] = (csum[window:] - csum[:-window]) / window
+    return out
+
+
+def indicator_table(ticker, store=None, p=None):
+    """Every indicator for every week of `ticker` (dict of aligned arrays, keyed by week_end)."""
+    store = store or get_store()
+    p = p or params()
+    week_end, close, volume = weekly_bars(store.bars(ticker))
+    ema = pd.Series(close).ewm(span=p['ema_weeks'], adjust=False).mean().to_numpy()
+    # EMA needs its span of history before it means anything
+    ema[:p['ema_weeks'] - 1] = np.nan
+
+    n = p['slope_weeks']
+    slope = np.full(len(ema), np.nan)
+    if len(ema) > n:
+        slope[n:] = (ema[n:] / ema[:-n] - 1) * 100
+
+    mansfield = np.full(len(close), np.nan)
+    b_end, b_close, _ = weekly_bars(store.bars(p['benchmark']))
+    if len(b_end) and len(close):
+        pos = np.searchsorted(b_end, week_end, side='right') - 1
+        bench = np.where(pos >= 0, b_close[np.clip(pos, 0, None)], np.nan)
+        rs = close / bench
+        mansfield = (rs / _trailing_mean(rs, p['rs_weeks']) - 1) * 100
+
+    avg_volume = _rolling_mean(volume, p['volume_weeks'])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        volume_ratio = np.where(avg_volume > 0, volume / avg_volume, np.nan)
+
+    return {
+        'week_end': week_end,
+        'close': close,
+        'ema30': ema,
+        'ema30_slope_pct': slope,
+        'mansfield_rs': mansfield,
+        'volume_ratio': volume_ratio,
+    }
+
+
+def _num(value, digits=4):
+    return round(float(value), digits) if np.isfinite(value) else None
+
+
+def table_row(table, i, p):
+    """JSON-ready indicators for week i of an indicator_table()."""
+    close, ema, slope = table['close'][i], table['ema30'][i], table['ema30_slope_pct'][i]
+    trend = None
+    if np.isfinite(slope):
+        trend = 'flat' if abs(slope) <= p['flat_pct'] else ('rising' if slope > 0 else 'falling')
+    return {
+        'week_end': str(table['week_end'][i]),
+        'close': _num(close),
+        'ema30': _num(ema),
+        'ema30_slope_pct': _num(slope, 2),
+        'ema30_trend': trend,
+        'above_ema30': bool(close > ema) if np.isfinite(ema) else None,
+        'price_vs_ema30_pct': _num((close / ema - 1) * 100, 2) if np.isfinite(ema) else None,
+        'mansfield_rs': _num(table['mansfield_rs'][i], 2),
+        'benchmark': p['benchmark'],
+        'volume_ratio': _num(table['volume_ratio'][i], 2),
+        'version': VERSION,
+    }
+
+
+# per-process memo of weekly tables: ticker -> (history stamp, table)
+_tables = {}
+_tables_lock = threading.Lock()
+
+
+def _table(ticker, store, p):
+    stamp = (store.root, store.last_date(ticker), store.last_date(p['benchmark']), tuple(sorted(p.items())))
+    with _tables_lock:
+        hit = _tables.get(ticker)
+    if hit and hit[0] == stamp:
+        return hit[1]
+    table = indicator_table(ticker, store=store, p=p)
+    with _tables_lock:
+        _tables[ticker] = (stamp, table)
+    return table
+
+
+def week_of(date, today=None):
+    """
+    Friday ending the last complete week on or before `date`. A week ending today
+    (or later) is not complete yet: its session is still trading.
+    """
+    date = np.datetime64(date, 'D')
+    today = np.datetime64(today or datetime.date.today(), 'D')
+    friday = MONDAY + (((date - MONDAY).astype('int64') // 7) * 7 + 4).astype('timedelta64[D]')
+    return friday if friday <= date and friday < today else friday - np.timedelta64(7, 'D')
+
+
+def _cache_key(ticker, week, p):
+    return f"indicators:v{VERSION}:{p['benchmark']}:{ticker}:{week}"
+
+
+def indicators_many(requests, store=None):
+    """
+    {(ticker, date): indicators dict or None} for many (ticker, date) pairs.
+    Pairs falling in the same (ticker, week) share one lookup; each ticker's weekly
+    table is built at most once.
+    """
+    store = store or get_store()
+    p = params()
+    weeks = {(t.upper(), d): (t.upper(), str(week_of(d))) for t, d in requests}
+    keys = {w: _cache_key(*w, p) for w in set(weeks.values())}
+    cached = cache.get_many(list(keys.values()))
+    results = {w: cached[k] for w, k in keys.items() if k in cached}
+
+    final, partial = {}, {}
+    for ticker, week in sorted(set(keys) - set(results)):
+        table = _table(ticker, store, p)
+        i = np.searchsorted(table['week_end'], np.datetime64(week, 'D'), side='right') - 1
+        row = table_row(table, i, p) if i >= 0 else None
+        # a week that is not in the history yet may still arrive: don't cache a miss
+        if row is not None and row['week_end'] == week:
+            # until the history reaches the week's Friday, its bar may still change
+            last = store.last_date(ticker)
+            complete = last is not None and last >= datetime.date.fromisoformat(week)
+            (final if complete else partial)[keys[(ticker, week)]] = row
+        results[(ticker, week)] = row
+    if final:
+        cache.set_many(final, timeout=None)
+    if partial:
+        cache.set_many(partial, timeout=getattr(settings, 'INDICATOR_PARTIAL_CACHE_TTL', 900))
+    return {req: results[week] for req, week in weeks.items()}
+
+
+def indicators_at(ticker, date, store=None):
+    return indicators_many([(ticker, date)], store=store)[(ticker.upper(), date)]
+
+
+def snapshot_indicators(trade, side='buy', save=True):
+    """Store indicators for the trade's buy (or sell) date in indicators_json[side]. Returns them (or None)."""
+    date = trade.buy_date if side == 'buy' else (trade.sell_date or datetime.date.today())
+    values = indicators_at(trade.ticker, date)
+    if values is None:
+        return None
+    data = dict(trade.indicators_json) if isinstance(trade.indicators_json, dict) else {}
+    data[side] = values
+    trade.indicators_json = data
+    if save:
+        trade.save(update_fields=['indicators_json'])
+    return values
@@ -0,0 +1,44 @@
+# trades/management/commands/bench_analytics.py
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from trades.analytics import REASON_CODES, analyze
+
+
+def synthetic_trades(n, seed=0):
+    """load_closed()-shaped columns for n random trades over ~10 years."""
+    rng = np.random.default_rng(seed)
+    buy_date = np.datetime64('2015-01-01') + rng.integers(0, 3650, n).astype('timedelta64[D]')
+    buy_price = rng.uniform(5, 500, n).round(2)
+    return {
+        'buy_date': buy_date,
+        'sell_date': buy_date + rng.integers(1, 250, n).astype('timedelta64[D]'),
+        'buy_price': buy_price,
+        'sell_price': (buy_price * rng.normal(1.02, 0.12, n)).round(2),
+        'quantity': rng.integers(1, 500, n).astype(float),
+        'pnl': np.full(n, np.nan),
+        'exit_code': rng.integers(0, len(REASON_CODES), n).astype(np.int8),
+    }
+
+
+class Command(BaseCommand):
+    help = "Time trades.analytics.analyze() on synthetic closed trades (default 1,000,000)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trades', type=int, default=1_000_000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        columns = synthetic_trades(options['trades'])
+        timings = []
+        for _ in range(options['repeat']):
+            started = time.perf_counter()
+            result = analyze(columns)
+            timings.append(time.perf_counter() - started)
+        self.stdout.write(
+            f"analyze(): {options['trades']:,} trades, best {min(timings) * 1000:.0f} ms "
+            f"of {options['repeat']} (equity points {len(result['equity_curve']):,}, "
+            f"expectancy {result['expectancy']}, profit factor {result['profit_factor']})"
+        )
@@ -0,0 +1,124 @@
+# trades/management/commands/bench_db_concurrency.py
+import copy
+import datetime
+import random
+import threading
+import time
+import uuid
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections, transaction
+from django.utils import timezone
+
+from trades.importers import insert_trades
+from trades.models import ActivityLog, Trade
+
+STOCK_ALIAS = 'bench_stock'
+
+
+def stock_settings(tuned):
+    """Django's defaults for the same database: stock engine, a new connection per request."""
+    stock = copy.deepcopy(tuned)
+    if tuned['ENGINE'] == 'trades.backends.sqlite3':
+        stock['ENGINE'] = 'django.db.backends.sqlite3'
+    stock.update(CONN_MAX_AGE=0, CONN_HEALTH_CHECKS=False)
+    return stock
+
+
+def close_request(alias, trade_id, user_id):
+    """What close_trade + log_activity write: read the row, update it, log it (one transaction), log again."""
+    with transaction.atomic(using=alias):
+        trade = Trade.objects.using(alias).only('id', 'sell_notes').get(pk=trade_id)
+        Trade.objects.using(alias).filter(pk=trade.pk).update(sell_notes=f"bench {time.time_ns()}",
+                                                              updated_at=timezone.now())
+        ActivityLog.objects.using(alias).create(user_id=user_id, action="Closed trade BENCH",
+                                                target_type='Trade', target_id=str(trade.pk))
+    ActivityLog.objects.using(alias).create(user_id=user_id, action="Viewed trade BENCH")
+
+
+def worker(alias, persistent, trade_ids, user_id, requests, barrier, out):
+    rng = random.Random(trade_ids[0])
+    timings, errors = [], 0
+    barrier.wait()
+    for _ in range(requests):
+        started = time.perf_counter()
+        try:
+            close_request(alias, rng.choice(trade_ids), user_id)
+        except OperationalError:
+            errors += 1
+        timings.append(time.perf_counter() - started)
+        if not persistent:
+            connections[alias].close()
+    connections[alias].close()
+    out.append((timings, errors))
+
+
+def run(alias, persistent, workers, requests, trade_ids, user_id):
+    barrier = threading.Barrier(workers + 1)
+    out = []
+    per_worker = max(1, len(trade_ids) // workers)
+    threads = [threading.Thread(target=worker, args=(alias, persistent, trade_ids[i * per_worker:(i + 1) * per_worker],
+                                                     user_id, requests, barrier, out))
+               for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    timings = sorted(t for worker_timings, _ in out for t in worker_timings)
+    return elapsed, timings, sum(errors for _, errors in out)
+
+
+class Command(BaseCommand):
+    help = ("Concurrent close_trade / log_activity writes against the configured database, "
+            "with Django's stock connection settings and then with this project's tuned ones. "
+            "Run once with SQLite and once with DATABASE_URL set to compare the two.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help="Concurrent threads (default 8).")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per worker (default 200).")
+        parser.add_argument('--tuned-only', action='store_true', help="Skip the stock-settings run.")
+
+    def handle(self, *args, **options):
+        tuned = connections.settings['default']
+        if str(tuned['NAME']).startswith(':memory:') or 'mode=memory' in str(tuned['NAME']):
+            raise CommandError("Needs an on-disk database.")
+        workers, requests = max(1, options['workers']), max(1, options['requests'])
+
+        user = get_user_model().objects.create_user(f"bench-{uuid.uuid4().hex[:12]}")
+        trades = insert_trades(user, [Trade(user=user, ticker='BENCH', quantity=1, buy_price=10,
+                                            buy_date=datetime.date(2024, 1, 2)) for _ in range(workers * 4)])
+        trade_ids = [t.pk for t in trades]
+        connections.settings[STOCK_ALIAS] = stock_settings(tuned)
+        profiles = [] if options['tuned_only'] else [('stock', STOCK_ALIAS, False)]
+        profiles.append(('tuned', 'default', bool(tuned['CONN_MAX_AGE'])))
+        vendor = connections['default'].vendor
+        try:
+            for name, alias, persistent in profiles:
+                if vendor == 'sqlite':
+                    # the journal mode is stored in the file: put back the stock rollback journal first
+                    connections['default'].close()
+                    mode = 'DELETE' if name == 'stock' else 'WAL'
+                    with connections[alias].cursor() as cursor:
+                        cursor.execute(f"PRAGMA journal_mode = {mode}")
+                    connections[alias].close()
+                elapsed, timings, errors = run(alias, persistent, workers, requests, trade_ids, user.pk)
+                total = len(timings)
+
+                def pct(p):
+                    return timings[min(total - 1, int(total * p))] * 1000
+
+                self.stdout.write(
+                    f"{vendor} {name:<5}: {workers} workers x {requests} requests in {elapsed:.2f} s "
+                    f"({total / elapsed:,.0f} req/s), p50 {pct(0.5):.1f} ms, p95 {pct(0.95):.1f} ms, "
+                    f"max {timings[-1] * 1000:.1f} ms, errors {errors} ({errors / total * 100:.1f}%)"
+                )
+        finally:
+            connections[STOCK_ALIAS].close()
+            del connections.settings[STOCK_ALIAS]
+            connections['default'].close()
+            ActivityLog.objects.filter(user=user).delete()
+            user.delete()
@@ -0,0 +1,28 @@
+# trades/management/commands/build_chart_derivatives.py
+from django.core.management.base import BaseCommand
+
+from trades.images import build_derivatives
+from trades.models import TradeChart
+
+
+class Command(BaseCommand):
+    help = "Generate thumbnail / medium copies for chart uploads (only missing ones unless --all)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Rebuild derivatives for every chart.")
+
+    def handle(self, *args, **options):
+        charts = TradeChart.objects.exclude(image='')
+        if not options['all']:
+            charts = charts.filter(derivatives_ready=False)
+        futures = [(chart, build_derivatives(chart)) for chart in charts.only('id', 'image').iterator()]
+        failed = 0
+        for chart, future in futures:
+            try:
+                future.result()
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f"chart {chart.pk} ({chart.image.name}): {exc}")
+                continue
+            TradeChart.objects.filter(pk=chart.pk).update(derivatives_ready=True)
+        self.stdout.write(f"Built derivatives for {len(futures) - failed} chart(s), {failed} failed.")
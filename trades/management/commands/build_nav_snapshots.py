@@ -0,0 +1,29 @@
+# trades/management/commands/build_nav_snapshots.py
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from trades.models import DailyPortfolioSnapshot, Trade
+from trades.nav import update_snapshots
+
+
+class Command(BaseCommand):
+    help = ("Compute daily portfolio value snapshots for the days since each user's last one "
+            "(all users, or --user USERNAME). Run after sync_price_history.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only this username.")
+        parser.add_argument('--rebuild', action='store_true', help="Drop existing snapshots and recompute from scratch.")
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.filter(pk__in=Trade.objects.values('user_id'))
+        if options['user']:
+            users = users.filter(username=options['user'])
+        started = time.monotonic()
+        total = 0
+        for user in users.iterator():
+            if options['rebuild']:
+                DailyPortfolioSnapshot.objects.filter(user=user).delete()
+            total += update_snapshots(user)
+        self.stdout.write(f"Stored {total} snapshot(s) in {time.monotonic() - started:.2f}s")
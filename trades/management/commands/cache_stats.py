@@ -0,0 +1,19 @@
+# trades/management/commands/cache_stats.py
+from django.core.management.base import BaseCommand
+
+from trades.caching import cache_stats, reset_stats
+
+
+class Command(BaseCommand):
+    help = "Show hit / miss counters of the per-user view cache (trade_list, reports, positions)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help="Zero the counters after printing them.")
+
+    def handle(self, *args, **options):
+        for name, counts in cache_stats().items():
+            total = counts['hit'] + counts['miss']
+            rate = f"{counts['hit'] / total * 100:.1f}%" if total else "-"
+            self.stdout.write(f"{name:<12} hits {counts['hit']:>8}  misses {counts['miss']:>8}  hit rate {rate}")
+        if options['reset']:
+            reset_stats()
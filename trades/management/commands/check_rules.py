@@ -0,0 +1,45 @@
+# trades/management/commands/check_rules.py
+import datetime
+import time
+
+from django.core.management.base import BaseCommand
+
+from trades.indicators import indicators_many
+from trades.models import Trade
+from trades.rules import violations_by_user
+
+
+class Command(BaseCommand):
+    help = ("Refresh indicators_json['current'] for all open trades from local price history, "
+            "then check every user's Rules against their open trades in one pass.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-refresh', action='store_true', help="Only evaluate; keep stored indicators.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if not options['skip_refresh']:
+            today = datetime.date.today()
+            trades = list(Trade.objects.filter(is_closed=False).only('id', 'ticker', 'indicators_json'))
+            values = indicators_many([(t.ticker, today) for t in trades])
+            updated = []
+            for t in trades:
+                current = values[(t.ticker.upper(), today)]
+                if current is None:
+                    continue
+                data = dict(t.indicators_json) if isinstance(t.indicators_json, dict) else {}
+                data['current'] = current
+                t.indicators_json = data
+                updated.append(t)
+            Trade.objects.bulk_update(updated, ['indicators_json'], batch_size=options['batch_size'])
+            self.stdout.write(f"Refreshed current indicators for {len(updated)}/{len(trades)} open trade(s).")
+
+        results = violations_by_user()
+        flagged = sum(len(rows) for rows in results.values())
+        for uid, rows in results.items():
+            for row in rows:
+                rules = "; ".join(v['rule'] for v in row['violations'])
+                self.stdout.write(f"user {uid} {row['ticker']} (#{row['trade_id']}): {rules}")
+        self.stdout.write(f"Checked {len(results)} user(s): {flagged} open trade(s) break a rule "
+                          f"({time.monotonic() - started:.2f}s)")
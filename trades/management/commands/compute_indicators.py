@@ -0,0 +1,41 @@
+# trades/management/commands/compute_indicators.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from trades.indicators import indicators_many
+from trades.models import Trade
+
+
+class Command(BaseCommand):
+    help = ("Fill Trade.indicators_json (buy and, for closed trades, sell) from local price history. "
+            "Only trades without a snapshot unless --all.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Recompute every trade.")
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        trades = Trade.objects.only('id', 'ticker', 'buy_date', 'sell_date', 'is_closed', 'indicators_json')
+        if not options['all']:
+            trades = trades.filter(indicators_json__isnull=True)
+        trades = list(trades)
+
+        wanted = [(t.ticker, t.buy_date) for t in trades]
+        wanted += [(t.ticker, t.sell_date) for t in trades if t.is_closed and t.sell_date]
+        values = indicators_many(wanted)
+
+        updated = []
+        for t in trades:
+            data = dict(t.indicators_json) if isinstance(t.indicators_json, dict) else {}
+            data['buy'] = values[(t.ticker.upper(), t.buy_date)]
+            if t.is_closed and t.sell_date:
+                data['sell'] = values[(t.ticker.upper(), t.sell_date)]
+            if data.get('buy') or data.get('sell'):
+                t.indicators_json = data
+                updated.append(t)
+        Trade.objects.bulk_update(updated, ['indicators_json'], batch_size=options['batch_size'])
+        weeks = len({(ticker.upper(), date) for ticker, date in wanted})
+        self.stdout.write(f"Updated {len(updated)}/{len(trades)} trade(s) from {weeks} (ticker, date) lookups "
+                          f"in {time.monotonic() - started:.2f}s")
@@ -0,0 +1,35 @@
+# trades/management/commands/gc_chart_blobs.py
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from trades.candles import prune_render_cache
+from trades.storage import collect_garbage, rehash_legacy
+
+
+class Command(BaseCommand):
+    help = "Delete chart files no TradeChart references (optionally moving legacy uploads to hashed blobs first)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=float, default=24,
+                            help="Only delete files older than this many hours (default 24).")
+        parser.add_argument('--rehash', action='store_true',
+                            help="First move date-path uploads into content-addressed blobs (dedupes them).")
+        parser.add_argument('--render-cache-days', type=int, default=30,
+                            help="Also delete cached candlestick renders older than this many days (0: skip).")
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be done; change nothing.")
+
+    def handle(self, *args, **options):
+        prefix = "[dry run] " if options['dry_run'] else ""
+        if options['rehash']:
+            moved = rehash_legacy(dry_run=options['dry_run'])
+            self.stdout.write(f"{prefix}Rehashed {moved} legacy upload(s).")
+        stats = collect_garbage(min_age=datetime.timedelta(hours=options['min_age']), dry_run=options['dry_run'])
+        self.stdout.write(
+            f"{prefix}{stats['files']} file(s), {stats['referenced']} referenced blob(s) "
+            f"({stats['shared']} shared), deleted {stats['deleted']} ({stats['deleted_bytes'] / 1e6:.1f} MB), "
+            f"kept {stats['kept_young']} recent unreferenced."
+        )
+        if options['render_cache_days'] and not options['dry_run']:
+            removed = prune_render_cache(options['render_cache_days'])
+            self.stdout.write(f"Pruned {removed} cached chart render(s).")
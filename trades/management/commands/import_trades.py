@@ -0,0 +1,35 @@
+# trades/management/commands/import_trades.py
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from trades.importers import import_trades
+
+
+class Command(BaseCommand):
+    help = "Bulk import trades for a user from a broker CSV file (see trades/importers.py for columns)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV file to import.")
+        parser.add_argument('--user', required=True, help="Username that will own the trades.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Rows per validation/insert batch.")
+        parser.add_argument('--dry-run', action='store_true', help="Validate only; do not write anything.")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"User {options['user']!r} does not exist.")
+
+        started = time.monotonic()
+        with open(options['path'], 'rb') as fh:
+            result = import_trades(user, fh, batch_size=options['batch_size'], dry_run=options['dry_run'],
+                                   source=options['path'])
+        for line, errors in result.errors:
+            msg = "; ".join(f"{field}: {' '.join(msgs)}" for field, msgs in errors.items())
+            self.stderr.write(f"line {line}: {msg}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f"... {result.error_count - len(result.errors)} more errors not shown")
+        prefix = "[dry run] " if options['dry_run'] else ""
+        self.stdout.write(f"{prefix}{result.summary()} in {time.monotonic() - started:.2f}s")
@@ -0,0 +1,36 @@
+# trades/management/commands/rebuild_positions.py
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from trades.positions import rebuild_positions, verify_positions
+
+
+class Command(BaseCommand):
+    help = ("Check Position rows against the open trades (--verify), or rebuild them from scratch "
+            "(all users, or --user USERNAME).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only this username.")
+        parser.add_argument('--verify', action='store_true',
+                            help="Report differences only; exits non-zero when any are found.")
+
+    def handle(self, *args, **options):
+        user_id = None
+        if options['user']:
+            user = get_user_model().objects.filter(username=options['user']).first()
+            if user is None:
+                raise CommandError(f"No user named {options['user']!r}.")
+            user_id = user.pk
+
+        if options['verify']:
+            problems = verify_positions(user_id)
+            for uid, ticker, diff in problems:
+                details = ", ".join(f"{field}: stored {have} expected {want}" for field, (have, want) in diff.items())
+                self.stdout.write(f"user {uid} {ticker}: {details}")
+            if problems:
+                raise CommandError(f"{len(problems)} position(s) out of step; run rebuild_positions to fix.")
+            self.stdout.write("All positions match the open trades.")
+            return
+
+        count = rebuild_positions(user_id)
+        self.stdout.write(f"Rebuilt {count} position(s).")
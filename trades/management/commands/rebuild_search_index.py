@@ -0,0 +1,28 @@
+# trades/management/commands/rebuild_search_index.py
+import time
+
+from django.core.management.base import BaseCommand
+
+from trades.models import Trade
+from trades.search import index_trades
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the full-text search index over trade notes, indicator text and chart captions "
+            "(e.g. after restoring a database dump).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        batch, total = [], 0
+        for pk in Trade.objects.order_by('id').values_list('id', flat=True).iterator():
+            batch.append(pk)
+            if len(batch) >= options['batch_size']:
+                index_trades(batch)
+                total += len(batch)
+                batch = []
+        index_trades(batch)
+        total += len(batch)
+        self.stdout.write(f"Indexed {total} trade(s) in {time.monotonic() - started:.2f}s")
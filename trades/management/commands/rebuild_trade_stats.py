@@ -0,0 +1,26 @@
+# trades/management/commands/rebuild_trade_stats.py
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from trades.models import Trade
+from trades.stats import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute UserTradeStats rows from closed trades (all users, or --user USERNAME)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Only rebuild this username.")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.all()
+        if options['user']:
+            users = users.filter(username=options['user'])
+        else:
+            users = users.filter(pk__in=Trade.objects.values('user_id'))
+        count = 0
+        for user in users.iterator():
+            rebuild_user_stats(user)
+            count += 1
+        self.stdout.write(f"Rebuilt stats for {count} user(s).")
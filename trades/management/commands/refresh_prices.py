@@ -0,0 +1,38 @@
+# trades/management/commands/refresh_prices.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from trades.prices import refresh_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Refresh PriceSnapshot rows for the distinct tickers of all open trades. "
+        "Runs forever (every --interval seconds) unless --once is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float,
+                            default=getattr(settings, 'PRICE_REFRESH_INTERVAL', 30),
+                            help="Seconds between refreshes (default: PRICE_REFRESH_INTERVAL).")
+        parser.add_argument('--once', action='store_true', help="Run a single refresh and exit.")
+
+    def handle(self, *args, **options):
+        interval = options['interval']
+        while True:
+            started = time.monotonic()
+            close_old_connections()
+            try:
+                # allow a fetch to use most of the interval; partial results are still saved
+                requested, written = refresh_snapshots(timeout=max(1.0, interval * 0.8))
+                self.stdout.write(f"Refreshed {written}/{requested} tickers in {time.monotonic() - started:.2f}s")
+            except Exception as exc:
+                if options['once']:
+                    raise
+                self.stderr.write(f"Price refresh failed: {exc}")
+            if options['once']:
+                return
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
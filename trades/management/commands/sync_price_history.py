@@ -0,0 +1,35 @@
+# trades/management/commands/sync_price_history.py
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models.functions import Upper
+
+from trades.history import get_store, load_fixture, sync_history
+from trades.indicators import params
+from trades.models import Trade
+
+
+class Command(BaseCommand):
+    help = (
+        "Append missing daily bars to the local price history for every traded ticker "
+        "(or --tickers). --fixture loads bars from a CSV instead of the quote provider."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tickers', nargs='+', help="Only these tickers.")
+        parser.add_argument('--fixture', help="CSV with ticker,date,open,high,low,close,volume (no network).")
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['fixture']:
+            added = load_fixture(options['fixture'])
+        else:
+            tickers = options['tickers'] or sorted(
+                set(Trade.objects.annotate(symbol=Upper('ticker')).values_list('symbol', flat=True).distinct())
+                | {params()['benchmark']})  # relative strength needs the benchmark's history too
+            added = sync_history([t.upper() for t in tickers])
+        for ticker, count in sorted(added.items()):
+            if count:
+                self.stdout.write(f"{ticker}: +{count} bars (last {get_store().last_date(ticker)})")
+        self.stdout.write(f"Added {sum(added.values())} bars for {len(added)} ticker(s) "
+                          f"in {time.monotonic() - started:.2f}s")
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.24 on 2026-10-18 19:23
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Trade',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=20)),
+                ('quantity', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('buy_price', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('buy_date', models.DateField()),
+                ('indicators_text', models.TextField(blank=True, help_text="Write manual indicators and checklist (e.g. 'Above 30w EMA: Yes; Mansfield: Positive; Volume OK: Yes')")),
+                ('indicators_json', models.JSONField(blank=True, null=True)),
+                ('buy_notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_closed', models.BooleanField(default=False)),
+                ('sell_price', models.DecimalField(blank=True, decimal_places=4, max_digits=12, null=True)),
+                ('sell_date', models.DateField(blank=True, null=True)),
+                ('exit_reason', models.CharField(blank=True, choices=[('SL', 'Stop Loss hit'), ('RES', 'Resistance above'), ('EMA', 'EMA slope decreasing'), ('SECT', 'Sector weak'), ('MAN', 'Manual')], max_length=8, null=True)),
+                ('sell_notes', models.TextField(blank=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TradeChart',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('image', models.ImageField(upload_to='trade_charts/%Y/%m/%d/')),
+                ('caption', models.CharField(blank=True, max_length=200)),
+                ('uploaded_at', models.DateTimeField(auto_now_add=True)),
+                ('trade', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='charts', to='trades.trade')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Rules',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(default='Stage Analysis Rules', max_length=120)),
+                ('content', models.TextField(blank=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ActivityLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('action', models.CharField(max_length=200)),
+                ('target_type', models.CharField(blank=True, max_length=100, null=True)),
+                ('target_id', models.CharField(blank=True, max_length=100, null=True)),
+                ('details', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Activity Log',
+                'verbose_name_plural': 'Activity Logs',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
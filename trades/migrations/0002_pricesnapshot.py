@@ -0,0 +1,23 @@
+# Generated by Django 4.2.24 on 2026-10-18 19:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=20, unique=True)),
+                ('price', models.DecimalField(decimal_places=4, max_digits=12)),
+                ('source', models.CharField(blank=True, max_length=40)),
+                ('fetched_at', models.DateTimeField()),
+            ],
+        ),
+    ]
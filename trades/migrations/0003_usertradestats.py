@@ -0,0 +1,34 @@
+# Generated by Django 4.2.24 on 2026-10-18 19:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trades', '0002_pricesnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserTradeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_closed', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('total_realized', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('win_total', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('loss_total', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='trade_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'User Trade Stats',
+                'verbose_name_plural': 'User Trade Stats',
+            },
+        ),
+    ]
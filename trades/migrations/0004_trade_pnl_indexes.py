@@ -0,0 +1,67 @@
+# Generated by Django 4.2.24 on 2026-10-18 19:31
+
+from decimal import Decimal
+
+from django.db import migrations, models
+
+BATCH_SIZE = 2000
+
+
+def backfill_pnl(apps, schema_editor):
+    """
+    Fill the stored P&L columns for existing closed trades, computed in Python
+    exactly as Trade.compute_pnl() does (SQL arithmetic on SQLite divides
+    whole-valued decimals as integers), in id-ordered batches.
+    """
+    Trade = apps.get_model('trades', 'Trade')
+    step = Decimal('0.0001')
+    priced = (Trade.objects.filter(is_closed=True, sell_price__isnull=False)
+              .only('id', 'quantity', 'buy_price', 'sell_price').order_by('id'))
+    last = 0
+    while True:
+        batch = list(priced.filter(id__gt=last)[:BATCH_SIZE])
+        if not batch:
+            break
+        for trade in batch:
+            sell, buy = Decimal(trade.sell_price), Decimal(trade.buy_price)
+            trade.pnl = ((sell - buy) * Decimal(trade.quantity)).quantize(step)
+            trade.pnl_pct = ((sell - buy) / buy * 100).quantize(step) if buy else None
+        Trade.objects.bulk_update(batch, ['pnl', 'pnl_pct'])
+        last = batch[-1].id
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0003_usertradestats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='trade',
+            name='pnl',
+            field=models.DecimalField(blank=True, decimal_places=4, editable=False, max_digits=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='trade',
+            name='pnl_pct',
+            field=models.DecimalField(blank=True, decimal_places=4, editable=False, max_digits=12, null=True),
+        ),
+        migrations.RunPython(backfill_pnl, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(condition=models.Q(('is_closed', False)), fields=['user', '-buy_date'], name='trade_open_buy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(condition=models.Q(('is_closed', True)), fields=['user', '-sell_date'], name='trade_closed_sell_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(condition=models.Q(('is_closed', True)), fields=['user', 'exit_reason', '-sell_date'], name='trade_closed_exit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(condition=models.Q(('is_closed', True)), fields=['user', 'pnl'], name='trade_closed_pnl_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.24 on 2026-10-18 19:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0004_trade_pnl_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tradechart',
+            name='derivatives_ready',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+    ]
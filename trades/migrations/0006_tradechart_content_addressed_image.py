@@ -0,0 +1,19 @@
+# Generated by Django 4.2.24 on 2026-10-18 19:39
+
+from django.db import migrations, models
+import trades.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0005_tradechart_derivatives_ready'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='tradechart',
+            name='image',
+            field=models.ImageField(db_index=True, storage=trades.storage.ContentAddressedStorage(), upload_to='trade_charts/'),
+        ),
+    ]
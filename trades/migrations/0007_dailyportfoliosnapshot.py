@@ -0,0 +1,36 @@
+# Generated by Django 4.2.24 on 2026-10-18 19:46
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trades', '0006_tradechart_content_addressed_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyPortfolioSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('market_value', models.DecimalField(decimal_places=4, max_digits=20)),
+                ('cost_basis', models.DecimalField(decimal_places=4, max_digits=20)),
+                ('realized_pnl', models.DecimalField(decimal_places=4, max_digits=20)),
+                ('positions', models.PositiveIntegerField(default=0)),
+                ('partial', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nav_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyportfoliosnapshot',
+            constraint=models.UniqueConstraint(fields=('user', 'date'), name='nav_user_date_uniq'),
+        ),
+    ]
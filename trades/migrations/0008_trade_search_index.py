@@ -0,0 +1,54 @@
+from django.db import migrations
+
+# The DDL is frozen here rather than imported from trades.search, so later
+# changes to that module never change what this migration did.
+SQLITE_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS trades_trade_fts USING fts5("
+    "ticker, indicators_text, notes, captions, user_id UNINDEXED, tokenize='porter unicode61')",
+    "INSERT INTO trades_trade_fts (rowid, user_id, ticker, indicators_text, notes, captions) "
+    "SELECT t.id, t.user_id, t.ticker, COALESCE(t.indicators_text, ''), "
+    "COALESCE(t.buy_notes, '') || char(10) || COALESCE(t.sell_notes, ''), "
+    "COALESCE((SELECT group_concat(c.caption, char(10)) FROM trades_tradechart c "
+    "WHERE c.trade_id = t.id AND c.caption <> ''), '') "
+    "FROM trades_trade t",
+]
+PG_DDL = [
+    "CREATE TABLE IF NOT EXISTS trades_trade_search ("
+    "trade_id bigint PRIMARY KEY REFERENCES trades_trade(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+    "user_id bigint NOT NULL, document tsvector NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS trades_trade_search_document_idx ON trades_trade_search USING GIN (document)",
+    "CREATE INDEX IF NOT EXISTS trades_trade_search_user_idx ON trades_trade_search (user_id)",
+    "INSERT INTO trades_trade_search (trade_id, user_id, document) "
+    "SELECT t.id, t.user_id, "
+    "setweight(to_tsvector('english', t.ticker), 'A') || "
+    "setweight(to_tsvector('english', COALESCE(t.indicators_text, '')), 'B') || "
+    "setweight(to_tsvector('english', COALESCE(t.buy_notes, '') || E'\\n' || COALESCE(t.sell_notes, '')), 'B') || "
+    "setweight(to_tsvector('english', COALESCE((SELECT string_agg(c.caption, E'\\n') FROM trades_tradechart c "
+    "WHERE c.trade_id = t.id AND c.caption <> ''), '')), 'C') "
+    "FROM trades_trade t ON CONFLICT (trade_id) DO NOTHING",
+]
+DROP_DDL = {
+    'sqlite': ["DROP TABLE IF EXISTS trades_trade_fts"],
+    'postgresql': ["DROP TABLE IF EXISTS trades_trade_search"],
+}
+
+
+def create_search_index(apps, schema_editor):
+    for sql in {'sqlite': SQLITE_DDL, 'postgresql': PG_DDL}.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in DROP_DDL.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0007_dailyportfoliosnapshot'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
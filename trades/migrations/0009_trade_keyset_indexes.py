@@ -0,0 +1,45 @@
+# Generated by Django 4.2.24 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0008_trade_search_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='trade',
+            name='trade_open_buy_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='trade',
+            name='trade_closed_sell_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='trade',
+            name='trade_closed_exit_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='trade',
+            name='trade_closed_pnl_idx',
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(condition=models.Q(('is_closed', False)), fields=['user', '-buy_date', '-id'], name='trade_open_buy_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(condition=models.Q(('is_closed', True)), fields=['user', '-sell_date', '-id'], name='trade_closed_sell_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(condition=models.Q(('is_closed', True)), fields=['user', 'exit_reason', '-sell_date', '-id'], name='trade_closed_exit_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='trade',
+            index=models.Index(condition=models.Q(('is_closed', True)), fields=['user', 'pnl', 'id'], name='trade_closed_pnl_idx'),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.24 on 2026-10-18 20:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def build_positions(apps, schema_editor):
+    from trades.positions import rebuild_positions
+    rebuild_positions(trade_model=apps.get_model('trades', 'Trade'),
+                      position_model=apps.get_model('trades', 'Position'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trades', '0009_trade_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ticker', models.CharField(max_length=20)),
+                ('total_qty', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('total_cost', models.DecimalField(decimal_places=8, default=0, max_digits=24)),
+                ('avg_price', models.DecimalField(decimal_places=8, default=0, max_digits=20)),
+                ('oldest_buy_date', models.DateField(blank=True, null=True)),
+                ('lots', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('first_trade', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='trades.trade')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['ticker'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='position',
+            constraint=models.UniqueConstraint(fields=('user', 'ticker'), name='position_user_ticker_uniq'),
+        ),
+        migrations.RunPython(build_positions, migrations.RunPython.noop),
+    ]
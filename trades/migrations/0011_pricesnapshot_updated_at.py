@@ -0,0 +1,20 @@
+# Generated by Django 4.2.24 on 2026-10-18 21:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('trades', '0010_position'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pricesnapshot',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.24 on 2026-10-18 20:49
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('trades', '0011_pricesnapshot_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeneration',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='cache_generation', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('value', models.BigIntegerField()),
+            ],
+        ),
+    ]
@@ -1,8 +1,12 @@
+from decimal import Decimal
+
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from django.conf import settings
-from django.db import models
+
+from .storage import chart_storage
 
 User = get_user_model()
 
@@ -44,6 +48,45 @@ class Trade(models.Model):
     exit_reason = models.CharField(max_length=8, choices=EXIT_REASONS, null=True, blank=True)
     sell_notes = models.TextField(blank=True)
 
+    # stored copies of realized P&L (kept in sync by save()) so SQL can sort/filter on them
+    pnl = models.DecimalField(max_digits=20, decimal_places=4, null=True, blank=True, editable=False)
+    pnl_pct = models.DecimalField(max_digits=12, decimal_places=4, null=True, blank=True, editable=False)
+
+    class Meta:
+        # partial indexes: boolean filters compile to `is_closed` / `NOT is_closed`, which
+        # planners match against the index condition rather than a key column.
+        # id ends every key: it is the tie-breaker of trade_list's keyset pagination
+        indexes = [
+            # trade_list open positions, newest buy first
+            models.Index(fields=['user', '-buy_date', '-id'], condition=Q(is_closed=False), name='trade_open_buy_idx'),
+            # trade_list / reports / export_closed_csv: closed trades, newest sell first
+            models.Index(fields=['user', '-sell_date', '-id'], condition=Q(is_closed=True), name='trade_closed_sell_idx'),
+            # trade_list exit_reason filter
+            models.Index(fields=['user', 'exit_reason', '-sell_date', '-id'], condition=Q(is_closed=True),
+                         name='trade_closed_exit_idx'),
+            # closed trades sorted by P&L
+            models.Index(fields=['user', 'pnl', 'id'], condition=Q(is_closed=True), name='trade_closed_pnl_idx'),
+        ]
+
+    # fields that feed the stored P&L columns
+    PNL_SOURCE_FIELDS = {'is_closed', 'sell_price', 'buy_price', 'quantity'}
+
+    def compute_pnl(self):
+        """Return (pnl, pnl_pct) as Decimals, or (None, None) for open / unpriced trades."""
+        if not self.is_closed or self.sell_price is None:
+            return None, None
+        sell, buy, qty = Decimal(self.sell_price), Decimal(self.buy_price), Decimal(self.quantity)
+        pnl = ((sell - buy) * qty).quantize(Decimal('0.0001'))
+        pct = ((sell - buy) / buy * 100).quantize(Decimal('0.0001')) if buy else None
+        return pnl, pct
+
+    def save(self, *args, **kwargs):
+        self.pnl, self.pnl_pct = self.compute_pnl()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and self.PNL_SOURCE_FIELDS.intersection(update_fields):
+            kwargs['update_fields'] = set(update_fields) | {'pnl', 'pnl_pct'}
+        super().save(*args, **kwargs)
+
     def realized_pnl(self):
         if not self.is_closed or self.sell_price is None:
             return None
@@ -56,9 +99,30 @@ class Trade(models.Model):
 
 class TradeChart(models.Model):
     trade = models.ForeignKey(Trade, on_delete=models.CASCADE, related_name='charts')
-    image = models.ImageField(upload_to='trade_charts/%Y/%m/%d/')
+    # stored by content hash: identical uploads share one file (see trades/storage.py)
+    image = models.ImageField(upload_to='trade_charts/', storage=chart_storage, db_index=True)
     caption = models.CharField(max_length=200, blank=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
+    # set once the resized thumb/medium copies exist (see trades/images.py)
+    derivatives_ready = models.BooleanField(default=False, editable=False)
+
+    def derivative_url(self, size, fmt='jpg'):
+        from .images import derivative_name
+        return self.image.storage.url(derivative_name(self.image.name, size, fmt))
+
+    @property
+    def thumb_url(self):
+        return self.derivative_url('thumb') if self.derivatives_ready else self.image.url
+
+    @property
+    def webp_srcset(self):
+        from .images import srcset
+        return srcset(self.image.storage, self.image.name, 'webp')
+
+    @property
+    def jpeg_srcset(self):
+        from .images import srcset
+        return srcset(self.image.storage, self.image.name, 'jpg')
 
 
 class Rules(models.Model):
@@ -68,6 +132,96 @@ class Rules(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
 
+class UserTradeStats(models.Model):
+    """Running closed-trade totals per user, kept in step with close_trade (see trades/stats.py)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='trade_stats')
+    total_closed = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+    total_realized = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    win_total = models.DecimalField(max_digits=20, decimal_places=4, default=0)  # sum of winning P&L
+    loss_total = models.DecimalField(max_digits=20, decimal_places=4, default=0)  # sum of losing P&L (<= 0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = 'User Trade Stats'
+        verbose_name_plural = 'User Trade Stats'
+
+    def win_rate(self):
+        return (self.wins / self.total_closed * 100) if self.total_closed else None
+
+    def avg_win(self):
+        return float(self.win_total) / self.wins if self.wins else None
+
+    def avg_loss(self):
+        return float(self.loss_total) / self.losses if self.losses else None
+
+
+class CacheGeneration(models.Model):
+    """Per-user write counter keying the view data cache (see trades/caching.py)."""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='cache_generation')
+    value = models.BigIntegerField()
+
+
+class PriceSnapshot(models.Model):
+    """Latest known price per ticker, refreshed by `manage.py refresh_prices`."""
+    ticker = models.CharField(max_length=20, unique=True)  # upper-cased symbol
+    price = models.DecimalField(max_digits=12, decimal_places=4)
+    source = models.CharField(max_length=40, blank=True)  # quote provider name, e.g. 'yfinance'
+    fetched_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)  # row write time: PriceHub polls on this, not fetched_at
+
+    def __str__(self):
+        return f"{self.ticker} {self.price} @ {self.fetched_at:%Y-%m-%d %H:%M:%S}"
+
+
+class DailyPortfolioSnapshot(models.Model):
+    """End-of-day value of a user's holdings, computed incrementally (see trades/nav.py)."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='nav_snapshots')
+    date = models.DateField()
+    market_value = models.DecimalField(max_digits=20, decimal_places=4)  # open positions at that day's close
+    cost_basis = models.DecimalField(max_digits=20, decimal_places=4)  # what those positions cost
+    realized_pnl = models.DecimalField(max_digits=20, decimal_places=4)  # cumulative, up to and including date
+    positions = models.PositiveIntegerField(default=0)  # tickers held
+    partial = models.BooleanField(default=False)  # some holding had no close for the day yet (recomputed)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'date'], name='nav_user_date_uniq')]
+        ordering = ['date']
+
+    @property
+    def unrealized_pnl(self):
+        return self.market_value - self.cost_basis
+
+    @property
+    def total_pnl(self):
+        return self.unrealized_pnl + self.realized_pnl
+
+
+class Position(models.Model):
+    """
+    Open lots of one ticker for one user, aggregated. Kept in step with every
+    trade write by F() updates (see trades/positions.py) so the dashboard reads
+    one row per ticker instead of grouping all open lots.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='positions')
+    ticker = models.CharField(max_length=20)  # upper-cased symbol
+    total_qty = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    total_cost = models.DecimalField(max_digits=24, decimal_places=8, default=0)  # sum of quantity * buy_price
+    avg_price = models.DecimalField(max_digits=20, decimal_places=8, default=0)  # total_cost / total_qty
+    oldest_buy_date = models.DateField(null=True, blank=True)
+    lots = models.IntegerField(default=0)  # open trades in this ticker
+    first_trade = models.ForeignKey(Trade, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [models.UniqueConstraint(fields=['user', 'ticker'], name='position_user_ticker_uniq')]
+        ordering = ['ticker']
+
+    def __str__(self):
+        return f"{self.user} {self.ticker} {self.total_qty} @ {self.avg_price}"
+
+
 class ActivityLog(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL)
     action = models.CharField(max_length=200)
@@ -0,0 +1,185 @@
+# trades/nav.py
+"""
+Daily portfolio value (NAV) series.
+
+For every weekday a user held positions we store a DailyPortfolioSnapshot:
+market value of the open positions at that day's close, their cost basis, and
+cumulative realized P&L. Only days after the latest stored snapshot are computed
+(completed days only, i.e. up to yesterday), so a run is proportional to the
+new days, not to the whole history.
+
+compute_nav() is vectorized over (ticker x day): holdings come from +qty / -qty
+deltas at each trade's buy / sell day and a cumulative sum; closes come from the
+local price history (trades/history.py), carried forward over holidays. A day
+is flagged partial when a holding has no close for it yet: no close at all
+(valued at cost) or a day past the end of the ticker's stored history (valued at
+the last close). The next update recomputes from the earliest partial day, so
+those days are corrected once the history arrives.
+
+Adding, editing or deleting a trade drops the snapshots from the first day the
+change affects (signals -> invalidate_from), and the next update recomputes just
+that tail.
+"""
+import datetime
+from decimal import Decimal
+
+import numpy as np
+from django.db.models import Min, Q
+
+from .history import get_store
+from .models import DailyPortfolioSnapshot, Trade
+
+FIELDS = ('ticker', 'quantity', 'buy_price', 'buy_date', 'sell_date', 'is_closed', 'pnl')
+
+
+def trading_days(start, end):
+    days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+    return days[np.is_busday(days)]
+
+
+def close_matrix(tickers, days, store=None):
+    """
+    (tickers x days) arrays: the last close on or before each day (NaN when
+    unknown), and whether the day is past the end of the ticker's stored history.
+    """
+    store = store or get_store()
+    closes = np.full((len(tickers), len(days)), np.nan)
+    beyond = np.ones((len(tickers), len(days)), dtype=bool)
+    for i, ticker in enumerate(tickers):
+        bars = store.bars(ticker)
+        if not len(bars):
+            continue
+        pos = np.searchsorted(bars['date'], days, side='right') - 1
+        closes[i] = np.where(pos >= 0, np.asarray(bars['close'])[np.clip(pos, 0, None)], np.nan)
+        beyond[i] = days > bars['date'][-1]
+    return closes, beyond
+
+
+def compute_nav(user, start, end, realized_before=0.0, store=None):
+    """
+    Snapshot values for each weekday in [start, end] as a list of dicts
+    (date, market_value, cost_basis, realized_pnl, positions, partial).
+    realized_before: cumulative realized P&L of trades sold before `start`.
+    """
+    days = trading_days(start, end)
+    if not len(days):
+        return []
+    rows = list(Trade.objects.filter(user=user, buy_date__lte=end)
+                .filter(Q(is_closed=False) | Q(sell_date__gte=start))
+                .values_list(*FIELDS))
+    n_days = len(days)
+    if rows:
+        ticker, qty, price, buy_date, sell_date, closed, pnl = zip(*rows)
+        tickers, code = np.unique([t.upper() for t in ticker], return_inverse=True)
+        qty = np.array(qty, dtype=float)
+        cost = qty * np.array(price, dtype=float)
+        closed = np.array(closed, dtype=bool)
+        buy_idx = np.searchsorted(days, np.array(buy_date, dtype='datetime64[D]'))
+        # a closed trade is held up to (not including) its sell day; no sell_date: never held
+        sells = np.array([s or b for s, b in zip(sell_date, buy_date)], dtype='datetime64[D]')
+        sell_idx = np.where(closed, np.searchsorted(days, sells), n_days)
+        pnl = np.array([0 if p is None else p for p in pnl], dtype=float)
+    else:
+        tickers = np.array([], dtype=str)
+        code = buy_idx = sell_idx = np.array([], dtype=int)
+        qty = cost = pnl = np.array([], dtype=float)
+        closed = np.array([], dtype=bool)
+
+    shape = (len(tickers), n_days + 1)
+    held, basis = np.zeros(shape), np.zeros(shape)
+    np.add.at(held, (code, buy_idx), qty)
+    np.add.at(held, (code, sell_idx), -qty)
+    np.add.at(basis, (code, buy_idx), cost)
+    np.add.at(basis, (code, sell_idx), -cost)
+    held = np.round(np.cumsum(held[:, :n_days], axis=1), 8)
+    basis = np.cumsum(basis[:, :n_days], axis=1)
+    basis[held <= 0] = 0
+
+    closes, beyond = close_matrix(list(tickers), days, store=store)
+    unpriced = (held > 0) & np.isnan(closes)
+    value = np.where(unpriced, basis, held * np.nan_to_num(closes))
+    incomplete = (held > 0) & (np.isnan(closes) | beyond)
+
+    sold = closed & (sell_idx < n_days)
+    realized = realized_before + np.cumsum(np.bincount(sell_idx[sold], weights=pnl[sold], minlength=n_days))
+
+    return [
+        {
+            'date': d.item(),
+            'market_value': v,
+            'cost_basis': c,
+            'realized_pnl': r,
+            'positions': int(p),
+            'partial': bool(u),
+        }
+        for d, v, c, r, p, u in zip(days, value.sum(axis=0), basis.sum(axis=0), realized,
+                                    (held > 0).sum(axis=0), incomplete.any(axis=0))
+    ]
+
+
+def _dec(value):
+    return Decimal(str(round(float(value), 4)))
+
+
+def update_snapshots(user, until=None, store=None):
+    """
+    Compute and store snapshots for the days after the latest complete one, up to
+    `until` (default yesterday). Partial days are recomputed.
+    """
+    until = until or datetime.date.today() - datetime.timedelta(days=1)
+    first_partial = (DailyPortfolioSnapshot.objects.filter(user=user, partial=True)
+                     .order_by('date').values_list('date', flat=True).first())
+    invalidate_from(user.pk, first_partial)
+    last = DailyPortfolioSnapshot.objects.filter(user=user).order_by('-date').first()
+    if last:
+        start, realized_before = last.date + datetime.timedelta(days=1), float(last.realized_pnl)
+    else:
+        start = Trade.objects.filter(user=user).aggregate(first=Min('buy_date'))['first']
+        realized_before = 0.0
+    if start is None or start > until:
+        return 0
+    rows = [
+        DailyPortfolioSnapshot(user=user, date=row['date'], market_value=_dec(row['market_value']),
+                               cost_basis=_dec(row['cost_basis']), realized_pnl=_dec(row['realized_pnl']),
+                               positions=row['positions'], partial=row['partial'])
+        for row in compute_nav(user, start, until, realized_before=realized_before, store=store)
+    ]
+    DailyPortfolioSnapshot.objects.bulk_create(
+        rows,
+        update_conflicts=True,
+        unique_fields=['user', 'date'],
+        update_fields=['market_value', 'cost_basis', 'realized_pnl', 'positions', 'partial'],
+    )
+    return len(rows)
+
+
+# fields whose change alters holdings, cost or realized P&L
+POSITION_FIELDS = ('ticker', 'quantity', 'buy_price', 'buy_date')
+EXIT_FIELDS = ('is_closed', 'sell_price', 'sell_date')
+
+
+def _earliest(*dates):
+    dates = [datetime.date.fromisoformat(d) if isinstance(d, str) else d for d in dates if d]
+    return min(dates) if dates else None
+
+
+def affected_from(old, new):
+    """
+    First day whose snapshot changes when trade `old` becomes `new` (either may be
+    None for create / delete); None when nothing the NAV depends on changed.
+    """
+    if old is None or new is None:
+        trade = old or new
+        return _earliest(trade.buy_date, trade.sell_date)
+    dates = []
+    if any(getattr(old, f) != getattr(new, f) for f in POSITION_FIELDS):
+        dates += [old.buy_date, new.buy_date]
+    if any(getattr(old, f) != getattr(new, f) for f in EXIT_FIELDS):
+        dates += [old.sell_date, new.sell_date] if (old.sell_date or new.sell_date) else [new.buy_date]
+    return _earliest(*dates)
+
+
+def invalidate_from(user_id, date):
+    """Drop snapshots on/after `date`; the next update_snapshots() recomputes them."""
+    if date is not None:
+        DailyPortfolioSnapshot.objects.filter(user_id=user_id, date__gte=date).delete()
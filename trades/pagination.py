@@ -0,0 +1,151 @@
+# trades/pagination.py
+"""
+Keyset (cursor) pagination.
+
+Instead of OFFSET + COUNT(*), a page is "the next `per_page` rows after this
+sort key": closed trades on (sell_date, id), open trades on (buy_date, id), P&L
+sorts on (pnl, id). The WHERE clause seeks straight to the position through the
+(user, key, id) indexes, so page N costs the same as page 1.
+
+Cursors are signed tokens holding only the sort name, the key values of the
+boundary row and the direction, so they are opaque to the client, can't be
+forged into arbitrary filters, and stay valid when the filters change (the page
+simply continues from the same position). A cursor issued for another sort is
+ignored and paging starts over.
+
+NULL keys sort where the database puts them (connection.features.nulls_order_largest),
+so the seek condition matches the plain ORDER BY and its index.
+"""
+from django.core import signing
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.db.models import Q
+
+SALT = 'trades.pagination'
+
+
+def encode_cursor(sort, values, direction='next'):
+    return signing.dumps({'s': sort, 'k': [None if v is None else str(v) for v in values], 'd': direction},
+                         salt=SALT, compress=True)
+
+
+def decode_cursor(token, sort):
+    """(values as strings, direction) or (None, 'next') for a missing, invalid or other-sort token."""
+    if not token:
+        return None, 'next'
+    try:
+        data = signing.loads(token, salt=SALT)
+    except signing.BadSignature:
+        return None, 'next'
+    if not isinstance(data, dict) or data.get('s') != sort or data.get('d') not in ('next', 'prev'):
+        return None, 'next'
+    return data.get('k'), data['d']
+
+
+def _parse_ordering(ordering):
+    return [(f.lstrip('-'), f.startswith('-')) for f in ordering]
+
+
+def _beyond(field, value, smaller):
+    """Q for rows strictly past `value` in the direction of `smaller` (or larger) values, NULL-aware."""
+    nulls_largest = connection.features.nulls_order_largest
+    if value is None:
+        # NULL is the extreme end: past it lie only the non-NULL values, if any
+        return Q(**{f'{field}__isnull': False}) if smaller == nulls_largest else Q(pk__in=[])
+    q = Q(**{f'{field}__lt' if smaller else f'{field}__gt': value})
+    if smaller != nulls_largest:
+        q |= Q(**{f'{field}__isnull': True})
+    return q
+
+
+def seek(qs, ordering, values, backwards=False):
+    """Rows of `qs` after the key `values` in `ordering` (before it when backwards)."""
+    keys = _parse_ordering(ordering)
+    condition = Q(pk__in=[])
+    equal = Q()
+    for (field, desc), value in zip(keys, values):
+        condition |= equal & _beyond(field, value, smaller=desc != backwards)
+        equal &= Q(**{f'{field}__isnull': True}) if value is None else Q(**{field: value})
+    return qs.filter(condition)
+
+
+def _to_python(qs, field, value):
+    if value is None:
+        return None
+    if field in qs.query.annotations:
+        return value  # converted by the annotation's output_field when the lookup is built
+    return qs.model._meta.get_field(field).to_python(value)
+
+
+def _reverse(ordering):
+    return [f[1:] if f.startswith('-') else '-' + f for f in ordering]
+
+
+class KeysetPage:
+    """One page of rows, plus cursors for its neighbours (None at either end)."""
+
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+
+def keyset_page(qs, ordering, sort, token=None, per_page=10):
+    """
+    One page of `qs` in `ordering` (ending with a unique field such as 'id') starting
+    at cursor `token`. `sort` names the ordering inside the cursor.
+    """
+    keys = _parse_ordering(ordering)
+    raw, direction = decode_cursor(token, sort)
+    values = None
+    if raw is not None and len(raw) == len(keys):
+        try:
+            values = [_to_python(qs, f, v) for (f, _), v in zip(keys, raw)]
+        except ValidationError:
+            values = None
+    backwards = values is not None and direction == 'prev'
+
+    page_qs = qs
+    if values is not None:
+        page_qs = seek(qs, ordering, values, backwards=backwards)
+    page_qs = page_qs.order_by(*(_reverse(ordering) if backwards else ordering))
+    rows = list(page_qs[:per_page + 1])
+    more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+    if not rows and values is not None:
+        # nothing left at this position (e.g. the filters changed): start over
+        return keyset_page(qs, ordering, sort, per_page=per_page)
+
+    def key(obj):
+        return [getattr(obj, f) for f, _ in keys]
+
+    next_cursor = prev_cursor = None
+    if rows:
+        # "more" means another page lies ahead in the direction we read; we came from the other side
+        if more or backwards:
+            next_cursor = encode_cursor(sort, key(rows[-1]), 'next')
+        if (more and backwards) or (values is not None and not backwards):
+            prev_cursor = encode_cursor(sort, key(rows[0]), 'prev')
+    return KeysetPage(rows, next_cursor, prev_cursor)
+
+
+def approximate_count(qs, cap=1000):
+    """(count, exact): counts at most cap + 1 rows, so it stays cheap on any size of result."""
+    n = qs.order_by()[:cap + 1].count()
+    return (min(n, cap), n <= cap)
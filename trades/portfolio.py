@@ -0,0 +1,98 @@
+# trades/portfolio.py
+"""
+Open-position aggregation shared by portfolio_value_api and the live stream.
+
+- load_positions(user): the user's Position rows, i.e. open trades grouped by ticker (no prices)
+- value_positions(positions, quotes): price the groups and build the API payload
+"""
+from .models import Position
+from .quotes import MISSING, STALE
+
+
+def load_positions(user):
+    """
+    The user's open positions from the Position table (one query, one row per ticker;
+    see trades/positions.py). Returns a list of dicts:
+    id (first lot), ticker, quantity, cost, avg_price, buy_date (oldest lot, ISO).
+    """
+    rows = (Position.objects.filter(user=user, lots__gt=0)
+            .values_list('first_trade_id', 'ticker', 'total_qty', 'total_cost', 'avg_price', 'oldest_buy_date'))
+    return [
+        {
+            'id': first_id,
+            'ticker': ticker,
+            'quantity': float(qty),
+            'cost': float(cost),
+            'avg_price': float(avg),
+            # oldest buy date (for “days held” display)
+            'buy_date': oldest.isoformat() if oldest else None,
+        }
+        for first_id, ticker, qty, cost, avg, oldest in rows
+    ]
+
+
+def maybe_round(x):
+    try:
+        return None if x is None else round(float(x), 2)
+    except Exception:
+        return x
+
+
+def value_positions(positions, quotes):
+    """
+    Price aggregated positions with {ticker: Quote} and return the API payload:
+      - positions: list of position dicts (with `stale` / `missing` price flags)
+      - total_value, total_cost, total_unrealized, total_gain, total_gain_pct
+      - partial: True when any position's price is stale or missing
+    """
+    rows = []
+    total_value = 0.0
+    total_cost = 0.0
+    total_unrealized = 0.0
+
+    for pos in positions:
+        total_qty = pos['quantity']
+        total_buy_cost = pos['cost']
+        avg_buy_price = pos['avg_price']
+
+        quote = quotes.get(pos['ticker'])
+        last = quote.price if quote else None
+        market_value = (last * total_qty) if last is not None else 0.0
+        unrealized = (last - avg_buy_price) * total_qty if last is not None else None
+
+        total_value += market_value
+        total_cost += total_buy_cost
+        if unrealized is not None:
+            total_unrealized += unrealized
+
+        pnl_pct = None
+        if unrealized is not None and total_buy_cost:
+            pnl_pct = (unrealized / total_buy_cost) * 100
+
+        rows.append({
+            'id': pos['id'],
+            'ticker': pos['ticker'],
+            'quantity': round(total_qty, 2),
+            'buy_price': round(avg_buy_price, 2),
+            'cost': round(total_buy_cost, 2),
+            'last_price': round(last, 2) if last else None,
+            'market_value': round(market_value, 2),
+            'unrealized_pnl': round(unrealized, 2) if unrealized else None,
+            'pnl_pct': round(pnl_pct, 2) if pnl_pct else None,
+            'buy_date': pos['buy_date'],
+            'stale': bool(quote and quote.status == STALE),
+            'missing': not quote or quote.status == MISSING,
+        })
+
+    total_gain = total_unrealized
+    total_gain_pct = (total_gain / total_cost * 100) if total_cost else None
+
+    return {
+        'positions': rows,
+        'total_value': maybe_round(total_value),
+        'total_cost': maybe_round(total_cost),
+        'total_unrealized': maybe_round(total_unrealized),
+        'total_gain': maybe_round(total_gain),
+        'total_gain_pct': maybe_round(total_gain_pct),
+        'partial': any(p['stale'] or p['missing'] for p in rows),
+    }
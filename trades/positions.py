@@ -0,0 +1,156 @@
+# trades/positions.py
+"""
+Position rows: per (user, ticker) totals of the open lots.
+
+A lot is what an open trade adds to its position: (ticker, quantity, cost,
+buy_date, trade id). Every write that opens, closes, edits or deletes a trade
+applies the difference between the old and the new lot with F() updates in one
+transaction per ticker:
+
+- signals (pre_save / post_save / post_delete on Trade) for single saves
+- insert_trades (CSV import, API bulk create) and the API bulk close for batches
+
+Only removing a lot can move oldest_buy_date / first_trade later; then those two
+are re-read from the ticker's remaining open trades by a subquery UPDATE.
+
+compute_positions() aggregates the same values straight from the trades table;
+`manage.py rebuild_positions` uses it to verify or rebuild the rows.
+"""
+from collections import defaultdict, namedtuple
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, DecimalField, F, FloatField, Min, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce, Least, Upper
+from django.utils import timezone
+
+from .models import Position, Trade
+
+Lot = namedtuple('Lot', ['ticker', 'quantity', 'cost', 'buy_date', 'trade_id'])
+
+
+def lot(trade):
+    """The lot an open trade contributes, or None (closed, or no trade)."""
+    if trade is None or trade.is_closed:
+        return None
+    qty = Decimal(trade.quantity)
+    return Lot(trade.ticker.upper(), qty, qty * Decimal(trade.buy_price), trade.buy_date, trade.pk)
+
+
+def _open_lots(user_id, ticker):
+    return Trade.objects.filter(user_id=user_id, is_closed=False, ticker__iexact=ticker)
+
+
+def _dividend(expression):
+    # SQLite keeps whole-valued decimals as integers and would divide them as integers
+    return Cast(expression, FloatField()) if connection.vendor == 'sqlite' else expression
+
+
+def apply_lots(user_id, added=(), removed=()):
+    """Add / remove lots (None entries are ignored) from the user's Position rows."""
+    changes = defaultdict(lambda: {'qty': Decimal(0), 'cost': Decimal(0), 'lots': 0, 'added': [], 'removed': False})
+    for item in added:
+        if item is not None:
+            c = changes[item.ticker]
+            c['qty'] += item.quantity
+            c['cost'] += item.cost
+            c['lots'] += 1
+            c['added'].append(item)
+    for item in removed:
+        if item is not None:
+            c = changes[item.ticker]
+            c['qty'] -= item.quantity
+            c['cost'] -= item.cost
+            c['lots'] -= 1
+            c['removed'] = True
+
+    for ticker, c in changes.items():
+        if not c['lots'] and not c['qty'] and not c['cost'] and not c['added']:
+            continue
+        with transaction.atomic():
+            if c['added']:
+                Position.objects.get_or_create(user_id=user_id, ticker=ticker)
+            qs = Position.objects.filter(user_id=user_id, ticker=ticker)
+            new_qty = F('total_qty') + c['qty']
+            updates = {
+                'total_qty': new_qty,
+                'total_cost': F('total_cost') + c['cost'],
+                'lots': F('lots') + c['lots'],
+                'avg_price': Case(When(total_qty__gt=-c['qty'], then=_dividend(F('total_cost') + c['cost']) / new_qty),
+                                  default=Value(Decimal(0)), output_field=DecimalField()),
+                'updated_at': timezone.now(),
+            }
+            if c['added']:
+                oldest = min(item.buy_date for item in c['added'])
+                updates['oldest_buy_date'] = Least(Coalesce(F('oldest_buy_date'), Value(oldest)), Value(oldest))
+                first = min((item.trade_id for item in c['added'] if item.trade_id), default=None)
+                if first is not None:
+                    updates['first_trade_id'] = Least(Coalesce(F('first_trade_id'), Value(first)), Value(first))
+            qs.update(**updates)
+            if c['removed']:
+                qs.filter(lots__lte=0).delete()
+                remaining = _open_lots(OuterRef('user_id'), OuterRef('ticker')).order_by()
+                qs.update(
+                    oldest_buy_date=Subquery(remaining.values('user_id').annotate(d=Min('buy_date')).values('d')),
+                    first_trade_id=Subquery(remaining.values('user_id').annotate(i=Min('id')).values('i')),
+                )
+
+
+def compute_positions(trade_model=Trade, user_id=None):
+    """{(user_id, TICKER): field values} aggregated from open trades (one query)."""
+    qs = trade_model.objects.filter(is_closed=False)
+    if user_id is not None:
+        qs = qs.filter(user_id=user_id)
+    rows = (qs.annotate(symbol=Upper('ticker')).values('user_id', 'symbol').order_by()
+            .annotate(qty=Sum('quantity'), cost=Sum(F('quantity') * F('buy_price'), output_field=DecimalField()),
+                      oldest=Min('buy_date'), lots=Count('id'), first=Min('id')))
+    out = {}
+    for row in rows:
+        qty, cost = Decimal(row['qty']), Decimal(row['cost'])
+        out[(row['user_id'], row['symbol'])] = {
+            'total_qty': qty,
+            'total_cost': cost,
+            'avg_price': cost / qty if qty else Decimal(0),
+            'oldest_buy_date': row['oldest'],
+            'lots': row['lots'],
+            'first_trade_id': row['first'],
+        }
+    return out
+
+
+def _close(a, b, places):
+    return abs(Decimal(a) - Decimal(b)) <= Decimal(1).scaleb(-places)
+
+
+def verify_positions(user_id=None):
+    """[(user_id, ticker, {field: (stored, expected)})] for every Position row that disagrees with the trades."""
+    expected = compute_positions(user_id=user_id)
+    stored_qs = Position.objects.all() if user_id is None else Position.objects.filter(user_id=user_id)
+    stored = {(p.user_id, p.ticker): p for p in stored_qs}
+    problems = []
+    for key in sorted(set(expected) | set(stored), key=lambda k: (k[0], k[1])):
+        want, row = expected.get(key), stored.get(key)
+        if want is None or row is None:
+            problems.append((key[0], key[1], {'row': (row is not None, want is not None)}))
+            continue
+        diff = {}
+        for field, value in want.items():
+            have = getattr(row, field)
+            same = _close(have, value, 4) if isinstance(value, Decimal) else have == value
+            if not same:
+                diff[field] = (have, value)
+        if diff:
+            problems.append((key[0], key[1], diff))
+    return problems
+
+
+def rebuild_positions(user_id=None, trade_model=Trade, position_model=Position):
+    """Replace Position rows with values computed from open trades. Returns rows written."""
+    values = compute_positions(trade_model, user_id=user_id)
+    with transaction.atomic():
+        qs = position_model.objects.all() if user_id is None else position_model.objects.filter(user_id=user_id)
+        qs.delete()
+        position_model.objects.bulk_create([
+            position_model(user_id=uid, ticker=ticker, **fields) for (uid, ticker), fields in values.items()
+        ])
+    return len(values)
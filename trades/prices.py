@@ -0,0 +1,112 @@
+# trades/prices.py
+"""
+PriceSnapshot table: the one place web requests read live prices from.
+
+- open_tickers(): distinct (upper-cased) tickers across all open trades
+- refresh_snapshots(): fetch those tickers through the quote cache and upsert snapshots
+- snapshot_quotes(): read snapshots for a set of tickers in one indexed query
+
+`manage.py refresh_prices` runs refresh_snapshots() on a schedule, so the
+number of provider calls depends on the distinct tickers, not on users x polls.
+"""
+import datetime
+
+from django.conf import settings
+from django.db import connection
+from django.db.models.functions import Upper
+from django.utils import timezone
+
+from .models import PriceSnapshot, Trade
+from .quotes import FRESH, MISSING, STALE, Quote, get_quote_cache, get_quotes
+
+
+def open_tickers():
+    """Distinct upper-cased tickers of every open trade (all users)."""
+    qs = (Trade.objects.filter(is_closed=False)
+          .annotate(symbol=Upper('ticker'))
+          .values_list('symbol', flat=True)
+          .distinct())
+    return sorted(qs)
+
+
+SNAPSHOT_FIELDS = ('ticker', 'price', 'source', 'fetched_at', 'updated_at')
+
+
+def save_snapshots(quotes, source):
+    """
+    Upsert fresh quotes ({ticker: Quote}) into PriceSnapshot; returns rows written.
+    A stored row is only replaced by a quote fetched after it, so a slow, older
+    fetch never overwrites a newer price (INSERT ... ON CONFLICT ... WHERE, which
+    bulk_create(update_conflicts=True) can't express).
+    """
+    now = timezone.now()
+    fields = [PriceSnapshot._meta.get_field(name) for name in SNAPSHOT_FIELDS]
+    rows = [
+        [field.get_db_prep_save(value, connection) for field, value in zip(fields, (
+            t,
+            round(q.price, 4),
+            source,
+            datetime.datetime.fromtimestamp(q.fetched_at, tz=datetime.timezone.utc),
+            now,
+        ))]
+        for t, q in quotes.items()
+        if q.status == FRESH and q.price is not None
+    ]
+    if not rows:
+        return 0
+    table = connection.ops.quote_name(PriceSnapshot._meta.db_table)
+    columns = [connection.ops.quote_name(field.column) for field in fields]
+    updates = ', '.join(f"{c} = excluded.{c}" for c in columns[1:])
+    sql = (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('%s' for _ in columns)}) "
+           f"ON CONFLICT ({columns[0]}) DO UPDATE SET {updates} "
+           f"WHERE excluded.{columns[3]} > {table}.{columns[3]}")
+    written = 0
+    with connection.cursor() as cursor:
+        for row in rows:
+            cursor.execute(sql, row)
+            written += cursor.rowcount
+    return written
+
+
+def refresh_snapshots(tickers=None, timeout=None):
+    """
+    Fetch prices for `tickers` (default: all open tickers) and store them.
+    Returns (requested, written).
+    """
+    if tickers is None:
+        tickers = open_tickers()
+    if not tickers:
+        return 0, 0
+    quote_cache = get_quote_cache()
+    quotes = quote_cache.get_quotes(tickers, timeout=timeout)
+    return len(tickers), save_snapshots(quotes, quote_cache.provider.name)
+
+
+def snapshot_quotes(tickers):
+    """
+    Return {ticker: Quote} from PriceSnapshot (one query on the unique ticker index).
+    Snapshots older than PRICE_SNAPSHOT_MAX_AGE seconds are flagged stale.
+    Tickers without a snapshot yet (e.g. bought since the last refresh) come back
+    missing; the refresh worker picks them up from open_tickers() on its next pass.
+    Only with PRICE_SNAPSHOT_FALLBACK on are they fetched live, inside the request.
+    """
+    tickers = list(dict.fromkeys(t.upper() for t in tickers))
+    if not tickers:
+        return {}
+    max_age = getattr(settings, 'PRICE_SNAPSHOT_MAX_AGE', 120)
+    cutoff = timezone.now() - datetime.timedelta(seconds=max_age)
+
+    quotes = {}
+    for snap in PriceSnapshot.objects.filter(ticker__in=tickers):
+        status = FRESH if snap.fetched_at >= cutoff else STALE
+        quotes[snap.ticker] = Quote(float(snap.price), snap.fetched_at.timestamp(), status)
+
+    missing = [t for t in tickers if t not in quotes]
+    if missing and getattr(settings, 'PRICE_SNAPSHOT_FALLBACK', False):
+        live = get_quotes(missing)
+        save_snapshots(live, get_quote_cache().provider.name)
+        quotes.update(live)
+
+    for t in tickers:
+        quotes.setdefault(t, Quote(None, None, MISSING))
+    return quotes
@@ -0,0 +1,379 @@
+# trades/quotes.py
+"""
+Live quote providers and a shared TTL price cache.
+
+- QuoteProvider: minimal interface (get_price / get_prices, get_history for daily bars)
+- YFinanceProvider: live prices from yfinance (optional dependency), with a
+  single multi-symbol download per batch
+- FixtureProvider: deterministic local prices, for tests and offline dev
+- QuoteCache: process-wide dict + Django cache, so each ticker is fetched
+  at most once per TTL window across users (and workers sharing a cache).
+  Misses are fetched concurrently on a bounded thread pool under an overall
+  deadline; anything not back in time is returned as stale or missing.
+
+Configure in settings:
+    QUOTE_PROVIDER = 'trades.quotes.YFinanceProvider'
+    QUOTE_CACHE_TTL = 30        # seconds a price counts as fresh
+    QUOTE_STALE_TTL = 900       # seconds an old price may still be served as stale
+    QUOTE_FETCH_TIMEOUT = 5     # overall deadline per get_quotes() call
+    QUOTE_FETCH_WORKERS = 8     # size of the shared fetch pool
+    QUOTE_BATCH_SIZE = 50       # symbols per multi-symbol download
+    QUOTE_FIXTURE_PRICES = {'AAPL': 190.5}   # FixtureProvider only
+"""
+import datetime
+import threading
+import time
+import zlib
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+# Optional: yfinance for live pricing. If not installed, prices are None.
+try:
+    import yfinance as yf
+except Exception:
+    yf = None
+
+FRESH = 'fresh'
+STALE = 'stale'
+MISSING = 'missing'
+
+# price: float or None; fetched_at: epoch seconds or None; status: FRESH / STALE / MISSING
+Quote = namedtuple('Quote', ['price', 'fetched_at', 'status'])
+
+
+class QuoteProvider:
+    """
+    Base provider. Subclasses implement get_price().
+    Providers that can fetch many symbols in one call set supports_batch = True
+    and override get_prices(); symbols absent from the batch result are retried
+    one by one with get_price().
+    """
+    name = 'base'
+    supports_batch = False
+
+    def get_price(self, ticker):
+        raise NotImplementedError
+
+    def get_prices(self, tickers):
+        return {t: self.get_price(t) for t in tickers}
+
+    def get_history(self, ticker, start, end):
+        """
+        Daily bars for start <= date <= end as a list of
+        (date, open, high, low, close, volume) tuples, oldest first.
+        """
+        raise NotImplementedError
+
+
+class YFinanceProvider(QuoteProvider):
+    name = 'yfinance'
+    supports_batch = yf is not None
+
+    def get_price(self, ticker):
+        if yf is None:
+            return None
+        try:
+            tk = yf.Ticker(ticker)
+            last = None
+            fast = getattr(tk, 'fast_info', None)
+            if fast:
+                last = getattr(fast, 'last_price', None)
+            if not last:
+                hist = tk.history(period='1d', interval='1m')
+                if not hist.empty:
+                    last = float(hist['Close'].iloc[-1])
+            return float(last) if last is not None else None
+        except Exception:
+            return None
+
+    def get_prices(self, tickers):
+        """One multi-symbol 1-minute download for the whole batch."""
+        if yf is None or not tickers:
+            return {}
+        try:
+            data = yf.download(list(tickers), period='1d', interval='1m', group_by='ticker',
+                               auto_adjust=False, progress=False, threads=True,
+                               timeout=getattr(settings, 'QUOTE_FETCH_TIMEOUT', 5))
+        except Exception:
+            return {}
+        if data is None or data.empty:
+            return {}
+
+        prices = {}
+        multi = getattr(data.columns, 'nlevels', 1) > 1
+        for t in tickers:
+            try:
+                closes = (data[t]['Close'] if multi else data['Close']).dropna()
+            except KeyError:
+                continue
+            if not closes.empty:
+                prices[t] = float(closes.iloc[-1])
+        return prices
+
+    def get_history(self, ticker, start, end):
+        if yf is None:
+            return []
+        try:
+            # yfinance's end is exclusive
+            data = yf.download(ticker, start=start, end=end + datetime.timedelta(days=1), interval='1d',
+                               auto_adjust=False, progress=False, threads=False,
+                               timeout=getattr(settings, 'QUOTE_FETCH_TIMEOUT', 5))
+        except Exception:
+            return []
+        if data is None or data.empty:
+            return []
+        if getattr(data.columns, 'nlevels', 1) > 1:
+            data = data.xs(ticker, axis=1, level=-1)
+        data = data.dropna(subset=['Close'])
+        return [
+            (ts.date(), float(o), float(h), float(l), float(c), float(v or 0))
+            for ts, o, h, l, c, v in zip(data.index, data['Open'], data['High'], data['Low'],
+                                         data['Close'], data['Volume'])
+        ]
+
+
+class FixtureProvider(QuoteProvider):
+    """
+    Deterministic prices without network access.
+    Uses settings.QUOTE_FIXTURE_PRICES when the ticker is listed there, otherwise
+    derives a stable price (10.00 .. 1009.99) from the ticker symbol.
+    """
+    name = 'fixture'
+
+    def __init__(self, prices=None):
+        if prices is None:
+            prices = getattr(settings, 'QUOTE_FIXTURE_PRICES', {}) or {}
+        self.prices = {k.upper(): float(v) for k, v in prices.items()}
+
+    def get_price(self, ticker):
+        ticker = ticker.upper()
+        if ticker in self.prices:
+            return self.prices[ticker]
+        return 10 + (zlib.crc32(ticker.encode()) % 100000) / 100.0
+
+    def get_history(self, ticker, start, end):
+        """
+        Weekday bars from a deterministic walk around get_price(). Each bar depends
+        only on (ticker, date), so incremental fetches line up with earlier ones.
+        """
+        days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D') + 1)
+        days = days[np.is_busday(days)]
+        if not len(days):
+            return []
+        seed = zlib.crc32(ticker.upper().encode()) % 1000
+        n = days.astype('int64').astype(float)
+        close = self.get_price(ticker) * (1 + 0.25 * np.sin(n / 45 + seed) + 0.05 * np.sin(n / 3.7 + seed))
+        open_ = close * (1 + 0.01 * np.sin(n * 1.3 + seed))
+        high = np.maximum(open_, close) * 1.01
+        low = np.minimum(open_, close) * 0.99
+        volume = 1e5 * (2 + np.sin(n / 7 + seed))
+        return [
+            (d.item(), o, h, l, c, v)
+            for d, o, h, l, c, v in zip(days, open_.round(4), high.round(4), low.round(4), close.round(4),
+                                        volume.round())
+        ]
+
+
+class QuoteCache:
+    """
+    Two-level TTL cache in front of a provider:
+      1. process-wide dict (no I/O at all on a hit)
+      2. Django cache (shared between workers when a shared backend is configured)
+    Only tickers missing from both levels are sent to the provider, and a ticker
+    already being fetched by another request is waited on rather than fetched twice.
+    Entries are kept for stale_ttl so a slow provider still yields a (stale) price.
+    """
+    key_prefix = 'quote'
+
+    def __init__(self, provider, ttl=30, stale_ttl=900, timeout=5, workers=8, batch_size=50):
+        self.provider = provider
+        self.ttl = ttl
+        self.stale_ttl = max(stale_ttl, ttl)
+        self.timeout = timeout
+        self.batch_size = batch_size
+        self._local = {}  # ticker -> (price, fetched_at)
+        self._inflight = {}  # ticker -> Future resolving to {ticker: price}
+        # re-entrant: a future that is already done runs its callback (_release) inline
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='quotes')
+
+    def _key(self, ticker):
+        return f"{self.key_prefix}:{self.provider.name}:{ticker}"
+
+    def _lookup(self, tickers, now):
+        """Return ({ticker: entry} for fresh hits, {ticker: entry or None} for the rest)."""
+        hits = {}
+        rest = {}
+        for t in tickers:
+            entry = self._local.get(t)
+            if entry is not None and now - entry[1] < self.ttl:
+                hits[t] = entry
+            else:
+                rest[t] = entry
+        if rest:
+            shared = cache.get_many([self._key(t) for t in rest])
+            for t in list(rest):
+                entry = shared.get(self._key(t))
+                if entry is None:
+                    continue
+                if now - entry[1] < self.ttl:
+                    self._local[t] = entry
+                    hits[t] = entry
+                    del rest[t]
+                elif rest[t] is None or entry[1] > rest[t][1]:
+                    rest[t] = entry
+        return hits, rest
+
+    def _store(self, prices, fetched_at):
+        to_share = {}
+        for t, price in prices.items():
+            if price is None:
+                continue
+            entry = (float(price), fetched_at)
+            self._local[t] = entry
+            to_share[self._key(t)] = entry
+        if to_share:
+            cache.set_many(to_share, timeout=self.stale_ttl)
+
+    def _fetch(self, tickers, batch):
+        prices = self.provider.get_prices(tickers) if batch else {tickers[0]: self.provider.get_price(tickers[0])}
+        self._store(prices, time.time())
+        return prices
+
+    def _release(self, tickers, future):
+        with self._lock:
+            for t in tickers:
+                if self._inflight.get(t) is future:
+                    del self._inflight[t]
+
+    def _submit(self, tickers, batch):
+        future = self._executor.submit(self._fetch, tickers, batch)
+        for t in tickers:
+            self._inflight[t] = future
+        future.add_done_callback(lambda f, ts=tuple(tickers): self._release(ts, f))
+        return future
+
+    def _schedule(self, tickers, batch):
+        """Attach to in-flight fetches or start new ones; returns {ticker: Future}."""
+        futures = {}
+        with self._lock:
+            todo = []
+            for t in tickers:
+                if t in self._inflight:
+                    futures[t] = self._inflight[t]
+                else:
+                    todo.append(t)
+            if batch:
+                for i in range(0, len(todo), self.batch_size):
+                    chunk = todo[i:i + self.batch_size]
+                    future = self._submit(chunk, batch=True)
+                    futures.update((t, future) for t in chunk)
+            else:
+                for t in todo:
+                    futures[t] = self._submit([t], batch=False)
+        return futures
+
+    @staticmethod
+    def _collect(futures, results):
+        for t, future in futures.items():
+            if future.done() and not future.cancelled() and future.exception() is None:
+                price = future.result().get(t)
+                if price is not None:
+                    results[t] = price
+
+    def get_quotes(self, tickers, timeout=None):
+        """
+        Return {ticker: Quote} for upper-cased tickers, never waiting longer than
+        timeout seconds (default: QUOTE_FETCH_TIMEOUT) for the provider.
+        """
+        tickers = list(dict.fromkeys(t.upper() for t in tickers))
+        deadline = time.monotonic() + (self.timeout if timeout is None else timeout)
+        hits, rest = self._lookup(tickers, time.time())
+        quotes = {t: Quote(entry[0], entry[1], FRESH) for t, entry in hits.items()}
+        if not rest:
+            return quotes
+
+        fetched = {}
+        futures = self._schedule(list(rest), batch=self.provider.supports_batch)
+        wait(set(futures.values()), timeout=max(0, deadline - time.monotonic()))
+        self._collect(futures, fetched)
+
+        # symbols a batch call came back without: retry them one by one in the pool
+        if self.provider.supports_batch:
+            gaps = [t for t, f in futures.items() if f.done() and t not in fetched]
+            if gaps and time.monotonic() < deadline:
+                retries = self._schedule(gaps, batch=False)
+                wait(set(retries.values()), timeout=max(0, deadline - time.monotonic()))
+                self._collect(retries, fetched)
+
+        now = time.time()
+        for t, old in rest.items():
+            if t in fetched:
+                quotes[t] = Quote(fetched[t], now, FRESH)
+            elif old is not None and now - old[1] < self.stale_ttl:
+                quotes[t] = Quote(old[0], old[1], STALE)
+            else:
+                quotes[t] = Quote(None, None, MISSING)
+        return quotes
+
+    def get_prices(self, tickers, timeout=None):
+        """Return {ticker: price or None}; tickers are upper-cased."""
+        return {t: q.price for t, q in self.get_quotes(tickers, timeout=timeout).items()}
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+
+_quote_cache = None
+_quote_cache_lock = threading.Lock()
+
+
+def get_provider():
+    path = getattr(settings, 'QUOTE_PROVIDER', 'trades.quotes.YFinanceProvider')
+    return import_string(path)()
+
+
+def get_quote_cache():
+    """Process-wide QuoteCache for the configured provider (created lazily)."""
+    global _quote_cache
+    if _quote_cache is None:
+        with _quote_cache_lock:
+            if _quote_cache is None:
+                _quote_cache = QuoteCache(
+                    get_provider(),
+                    ttl=getattr(settings, 'QUOTE_CACHE_TTL', 30),
+                    stale_ttl=getattr(settings, 'QUOTE_STALE_TTL', 900),
+                    timeout=getattr(settings, 'QUOTE_FETCH_TIMEOUT', 5),
+                    workers=getattr(settings, 'QUOTE_FETCH_WORKERS', 8),
+                    batch_size=getattr(settings, 'QUOTE_BATCH_SIZE', 50),
+                )
+    return _quote_cache
+
+
+def reset_quote_cache():
+    """Drop the process-wide cache (e.g. after changing QUOTE_PROVIDER in tests)."""
+    global _quote_cache
+    with _quote_cache_lock:
+        if _quote_cache is not None:
+            _quote_cache._executor.shutdown(wait=False)
+        _quote_cache = None
+
+
+def get_quotes(tickers, timeout=None):
+    """Convenience wrapper: cached Quote objects for tickers, bounded by the fetch deadline."""
+    if not tickers:
+        return {}
+    return get_quote_cache().get_quotes(tickers, timeout=timeout)
+
+
+def get_prices(tickers, timeout=None):
+    """Convenience wrapper: cached last prices for tickers."""
+    if not tickers:
+        return {}
+    return get_quote_cache().get_prices(tickers, timeout=timeout)
@@ -0,0 +1,196 @@
+# trades/rules.py
+"""
+Server-side checks of a user's Rules checklist against their open trades.
+
+compile_rules(content) turns checklist lines into predicates over the computed
+indicators (trades/indicators.py), e.g.
+
+    Above 30w EMA: Yes             -> above_ema30 == True
+    30w EMA rising / not falling   -> ema30_trend in {...}
+    Mansfield: Positive            -> mansfield_rs > 0
+    Volume OK: Yes                 -> volume_ratio >= RULES_VOLUME_MIN_RATIO
+    price_vs_ema30_pct < 15        -> any indicator, compared with a number
+
+Lines that don't match are manual checks and are skipped. The compiled list is
+cached per user, keyed on Rules.updated_at, so a checklist is parsed once per edit.
+
+evaluate(rules, indicators) checks every rule against all of a user's open trades
+with array comparisons; a rule is violated only where the indicator is known.
+violations_by_user() does every user's open book in one pass (two queries).
+Trades are checked against indicators_json['current'] (refreshed by
+`manage.py check_rules`), falling back to the buy-time snapshot.
+"""
+import operator
+import re
+import threading
+from collections import defaultdict, namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import Rules, Trade
+
+Rule = namedtuple('Rule', ['line', 'field', 'op', 'value'])
+
+OPS = {
+    '>': operator.gt, '>=': operator.ge, '<': operator.lt, '<=': operator.le,
+    '=': operator.eq, '==': operator.eq, '!=': operator.ne,
+}
+NUMERIC_FIELDS = ('ema30_slope_pct', 'price_vs_ema30_pct', 'mansfield_rs', 'volume_ratio', 'above_ema30')
+FIELD_ALIASES = {
+    'mansfield': 'mansfield_rs', 'mansfield rs': 'mansfield_rs', 'rs': 'mansfield_rs',
+    'volume': 'volume_ratio', 'volume ratio': 'volume_ratio',
+    'slope': 'ema30_slope_pct', 'ema slope': 'ema30_slope_pct', '30w ema slope': 'ema30_slope_pct',
+    'distance from ema': 'price_vs_ema30_pct', 'price vs ema': 'price_vs_ema30_pct',
+    'extension': 'price_vs_ema30_pct',
+}
+TRENDS = {
+    'rising': {'rising'}, 'up': {'rising'}, 'increasing': {'rising'}, 'turning up': {'rising'},
+    'flat': {'flat'},
+    'not falling': {'rising', 'flat'}, 'not declining': {'rising', 'flat'}, 'not decreasing': {'rising', 'flat'},
+    'falling': {'falling'}, 'down': {'falling'}, 'declining': {'falling'}, 'decreasing': {'falling'},
+}
+
+_PREFIX = re.compile(r'^(\[[ xX]\]|[-*•]|\d{4}-\d{2}-\d{2}\s*[—–-])\s*')
+_EMA = r'30\s*-?\s*w(?:eek)?\s*ema'
+_ABOVE = re.compile(rf'\b(above|below)\s+(?:the\s+)?{_EMA}(?:\s*[:=-]?\s*(yes|no|true|false))?')
+_TREND = re.compile(rf'{_EMA}.*?\b({"|".join(sorted(TRENDS, key=len, reverse=True))})\b')
+_MANSFIELD = re.compile(r'\bmansfield(?:\s*rs)?\s*[:=-]?\s*(positive|negative|above zero|below zero)')
+_VOLUME = re.compile(r'\bvolume(?:\s*ok)?\s*[:=-]?\s*(yes|ok|high|above average|confirmed)\b')
+_COMPARE = re.compile(r'^([a-z0-9_ ]+?)\s*(>=|<=|==|!=|>|<|=)\s*(-?\d+(?:\.\d+)?)\s*%?$')
+
+
+def parse_line(line):
+    """Rule for one checklist line, or None for lines that can't be checked automatically."""
+    text = line.strip()
+    while _PREFIX.match(text):
+        text = _PREFIX.sub('', text, count=1)
+    low = text.lower()
+    if not low:
+        return None
+
+    m = _COMPARE.match(low)
+    if m:
+        field = FIELD_ALIASES.get(m.group(1).strip(), m.group(1).strip().replace(' ', '_'))
+        if field in NUMERIC_FIELDS:
+            return Rule(text, field, m.group(2), float(m.group(3)))
+    m = _ABOVE.search(low)
+    if m:
+        want = m.group(1) == 'above'
+        if m.group(2) in ('no', 'false'):
+            want = not want
+        return Rule(text, 'above_ema30', '==', float(want))
+    m = _TREND.search(low)
+    if m:
+        return Rule(text, 'ema30_trend', 'in', frozenset(TRENDS[m.group(1)]))
+    m = _MANSFIELD.search(low)
+    if m:
+        positive = m.group(1) in ('positive', 'above zero')
+        return Rule(text, 'mansfield_rs', '>' if positive else '<', 0.0)
+    if _VOLUME.search(low):
+        return Rule(text, 'volume_ratio', '>=', float(getattr(settings, 'RULES_VOLUME_MIN_RATIO', 2.0)))
+    return None
+
+
+def compile_rules(content):
+    return [rule for rule in map(parse_line, (content or '').splitlines()) if rule is not None]
+
+
+_compiled = {}  # user_id -> (updated_at, rules)
+_compiled_lock = threading.Lock()
+
+
+def compiled_rules(rules):
+    """Compiled rules for a Rules row, reused until the row's updated_at changes."""
+    stamp = rules.updated_at.isoformat() if rules.updated_at else ''
+    with _compiled_lock:
+        hit = _compiled.get(rules.user_id)
+    if hit and hit[0] == stamp:
+        return hit[1]
+    key = f"rules:{rules.user_id}:{stamp}"
+    compiled = cache.get(key)
+    if compiled is None:
+        compiled = compile_rules(rules.content)
+        cache.set(key, compiled, timeout=None)
+    with _compiled_lock:
+        _compiled[rules.user_id] = (stamp, compiled)
+    return compiled
+
+
+def current_indicators(indicators_json):
+    if not isinstance(indicators_json, dict):
+        return {}
+    return indicators_json.get('current') or indicators_json.get('buy') or {}
+
+
+def _column(indicators, field):
+    if field == 'ema30_trend':
+        return np.array([ind.get(field) for ind in indicators], dtype=object)
+    values = [ind.get(field) for ind in indicators]
+    return np.array([np.nan if v is None else float(v) for v in values], dtype=float)
+
+
+def evaluate(rules, indicators):
+    """
+    (rules x trades) boolean array of violations for a list of indicator dicts.
+    Unknown indicator values never count as violations.
+    """
+    result = np.zeros((len(rules), len(indicators)), dtype=bool)
+    columns = {}
+    for i, rule in enumerate(rules):
+        if rule.field not in columns:
+            columns[rule.field] = _column(indicators, rule.field)
+        col = columns[rule.field]
+        if rule.op == 'in':
+            known = np.array([v is not None for v in col], dtype=bool)
+            ok = np.array([v in rule.value for v in col], dtype=bool)
+        else:
+            known = ~np.isnan(col)
+            with np.errstate(invalid='ignore'):
+                ok = OPS[rule.op](col, rule.value)
+        result[i] = known & ~ok
+    return result
+
+
+def describe(rule, indicators):
+    value = indicators.get(rule.field)
+    return {'rule': rule.line, 'field': rule.field, 'value': value}
+
+
+def violations_by_user(user_ids=None):
+    """
+    {user_id: [{'trade_id', 'ticker', 'violations': [{'rule', 'field', 'value'}]}]} for every
+    user with rules and open trades (or just `user_ids`): one query for rules, one for trades.
+    """
+    rules_qs = Rules.objects.exclude(content='')
+    trades_qs = Trade.objects.filter(is_closed=False)
+    if user_ids is not None:
+        rules_qs = rules_qs.filter(user_id__in=user_ids)
+        trades_qs = trades_qs.filter(user_id__in=user_ids)
+    compiled = {r.user_id: compiled_rules(r) for r in rules_qs.only('user_id', 'content', 'updated_at')}
+    compiled = {uid: rules for uid, rules in compiled.items() if rules}
+    if not compiled:
+        return {}
+
+    books = defaultdict(list)
+    for tid, uid, ticker, data in (trades_qs.filter(user_id__in=list(compiled))
+                                   .order_by('ticker', 'id')
+                                   .values_list('id', 'user_id', 'ticker', 'indicators_json').iterator()):
+        books[uid].append((tid, ticker, current_indicators(data)))
+
+    out = {}
+    for uid, book in books.items():
+        rules = compiled[uid]
+        broken = evaluate(rules, [ind for _, _, ind in book])
+        rows = []
+        for j in np.flatnonzero(broken.any(axis=0)):
+            tid, ticker, ind = book[j]
+            rows.append({'trade_id': tid, 'ticker': ticker,
+                         'violations': [describe(rules[i], ind) for i in np.flatnonzero(broken[:, j])]})
+        out[uid] = rows
+    return out
+
+
+def user_violations(user):
+    return violations_by_user([user.pk]).get(user.pk, [])
@@ -0,0 +1,124 @@
+# trades/search.py
+"""
+Full-text search over trade journals: ticker, indicators_text, buy/sell notes and
+chart captions.
+
+The index is a side table (created by migration 0008) kept in step on save
+(signals call index_trade; the CSV importer calls index_trades after bulk inserts):
+
+- SQLite: FTS5 virtual table `trades_trade_fts` (rowid = trade id), porter stemming,
+  ranked with bm25()
+- PostgreSQL: `trades_trade_search` with a weighted tsvector and a GIN index,
+  ranked with ts_rank()
+- anything else: icontains over the same fields (unindexed, unranked)
+
+search_trade_ids(q, user) returns matching trade ids, best match first, at most
+SEARCH_MAX_RESULTS of them (trade_list tells the user when that cap is reached).
+"""
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+
+from .models import Trade, TradeChart
+
+SQLITE_TABLE = 'trades_trade_fts'
+PG_TABLE = 'trades_trade_search'
+
+
+def _documents(trade_ids):
+    """{trade_id: (user_id, ticker, indicators_text, notes, captions)} in two queries."""
+    docs = {
+        tid: [uid, ticker, indicators or '', f"{buy or ''}\n{sell or ''}", []]
+        for tid, uid, ticker, indicators, buy, sell in Trade.objects.filter(pk__in=trade_ids).values_list(
+            'id', 'user_id', 'ticker', 'indicators_text', 'buy_notes', 'sell_notes')
+    }
+    for tid, caption in TradeChart.objects.filter(trade_id__in=trade_ids).exclude(caption='').values_list(
+            'trade_id', 'caption'):
+        docs[tid][4].append(caption)
+    return {tid: (uid, ticker, ind, notes, "\n".join(caps)) for tid, (uid, ticker, ind, notes, caps) in docs.items()}
+
+
+def index_trades(trade_ids):
+    """(Re)index the given trades; ids that no longer exist are removed from the index."""
+    trade_ids = list(trade_ids)
+    if not trade_ids or connection.vendor not in ('sqlite', 'postgresql'):
+        return
+    docs = _documents(trade_ids)
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for i in range(0, len(trade_ids), 500):
+                chunk = trade_ids[i:i + 500]
+                cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid IN ({','.join('%s' for _ in chunk)})",
+                               chunk)
+            cursor.executemany(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, user_id, ticker, indicators_text, notes, captions) "
+                "VALUES (%s, %s, %s, %s, %s, %s)",
+                [(tid, *doc) for tid, doc in docs.items()],
+            )
+        else:
+            missing = [tid for tid in trade_ids if tid not in docs]
+            if missing:
+                cursor.execute(f"DELETE FROM {PG_TABLE} WHERE trade_id = ANY(%s)", [missing])
+            cursor.executemany(
+                f"INSERT INTO {PG_TABLE} (trade_id, user_id, document) VALUES (%s, %s, "
+                "setweight(to_tsvector('english', %s), 'A') || setweight(to_tsvector('english', %s), 'B') || "
+                "setweight(to_tsvector('english', %s), 'B') || setweight(to_tsvector('english', %s), 'C')) "
+                "ON CONFLICT (trade_id) DO UPDATE SET user_id = EXCLUDED.user_id, document = EXCLUDED.document",
+                [(tid, *doc) for tid, doc in docs.items()],
+            )
+
+
+def index_trade(trade_id):
+    index_trades([trade_id])
+
+
+def unindex_trade(trade_id):
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {SQLITE_TABLE} WHERE rowid = %s", [trade_id])
+    # PostgreSQL: ON DELETE CASCADE
+
+
+def fts5_query(q):
+    """User input -> FTS5 query: every word must match (as a prefix), quotes stripped."""
+    words = re.findall(r'\w+', q, flags=re.UNICODE)
+    return " ".join(f'"{w}"*' for w in words)
+
+
+def search_trade_ids(q, user=None, limit=None):
+    """Trade ids matching `q` (for `user`, or all users), best match first."""
+    limit = limit or getattr(settings, 'SEARCH_MAX_RESULTS', 500)
+    q = (q or '').strip()
+    if not q:
+        return []
+    if connection.vendor == 'sqlite':
+        match = fts5_query(q)
+        if not match:
+            return []
+        sql = f"SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s"
+        params = [match]
+        if user is not None:
+            sql += " AND user_id = %s"
+            params.append(user.pk)
+        sql += f" ORDER BY bm25({SQLITE_TABLE}, 10.0, 2.0, 2.0, 1.0) LIMIT %s"
+    elif connection.vendor == 'postgresql':
+        sql = (f"SELECT trade_id FROM {PG_TABLE}, websearch_to_tsquery('english', %s) query "
+               "WHERE document @@ query")
+        params = [q]
+        if user is not None:
+            sql += " AND user_id = %s"
+            params.append(user.pk)
+        sql += " ORDER BY ts_rank(document, query) DESC LIMIT %s"
+    else:
+        qs = Trade.objects.filter(Q(ticker__icontains=q) | Q(indicators_text__icontains=q) |
+                                  Q(buy_notes__icontains=q) | Q(sell_notes__icontains=q) |
+                                  Q(charts__caption__icontains=q))
+        if user is not None:
+            qs = qs.filter(user=user)
+        return list(qs.order_by('-id').values_list('id', flat=True).distinct()[:limit])
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
@@ -0,0 +1,93 @@
+# trades/serializers.py
+"""
+Serializers for the JSON API (trades/api.py).
+
+Every read serializer honours `?fields=a,b,c` (sparse fieldsets): unrequested
+fields are dropped from the serializer, and the API view also defers their
+columns and skips prefetching charts unless `charts` is asked for.
+"""
+from rest_framework import serializers
+
+from .models import EXIT_REASONS, Trade, TradeChart, UserTradeStats
+
+
+def requested_fields(request):
+    """Set of field names from ?fields=, or None for all fields."""
+    raw = request.query_params.get('fields') if request is not None else None
+    if not raw:
+        return None
+    return {name.strip() for name in raw.split(',') if name.strip()}
+
+
+class SparseFieldsMixin:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        wanted = requested_fields(self.context.get('request'))
+        if wanted:
+            for name in set(self.fields) - wanted:
+                self.fields.pop(name)
+
+
+class TradeChartSerializer(serializers.ModelSerializer):
+    image = serializers.FileField(use_url=True, read_only=True)
+    thumb_url = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = TradeChart
+        fields = ['id', 'image', 'thumb_url', 'caption', 'uploaded_at']
+
+
+class TradeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Trade
+        fields = ['id', 'ticker', 'quantity', 'buy_price', 'buy_date', 'indicators_text', 'indicators_json',
+                  'buy_notes', 'is_closed', 'sell_price', 'sell_date', 'exit_reason', 'sell_notes',
+                  'pnl', 'pnl_pct', 'created_at', 'updated_at']
+        read_only_fields = fields
+
+
+class TradeDetailSerializer(TradeSerializer):
+    """Trade with its charts (the view prefetches them)."""
+    charts = TradeChartSerializer(many=True, read_only=True)
+
+    class Meta(TradeSerializer.Meta):
+        fields = TradeSerializer.Meta.fields + ['charts']
+        read_only_fields = fields
+
+
+class TradeCreateSerializer(serializers.ModelSerializer):
+    """One trade of a bulk create; with sell_price it is created closed (like a CSV import row)."""
+
+    class Meta:
+        model = Trade
+        fields = ['ticker', 'quantity', 'buy_price', 'buy_date', 'indicators_text', 'buy_notes',
+                  'sell_price', 'sell_date', 'exit_reason', 'sell_notes']
+
+    def validate(self, attrs):
+        if attrs.get('sell_price') is not None:
+            attrs['is_closed'] = True
+            if attrs.get('sell_date') and attrs['sell_date'] < attrs['buy_date']:
+                raise serializers.ValidationError({'sell_date': "Sell date is before buy date."})
+        elif attrs.get('sell_date') or attrs.get('exit_reason'):
+            raise serializers.ValidationError({'sell_price': "Required to create a closed trade."})
+        return attrs
+
+
+class TradeCloseSerializer(serializers.Serializer):
+    """One entry of a bulk close: the trade id plus the CloseTradeForm fields."""
+    id = serializers.IntegerField()
+    sell_price = serializers.DecimalField(max_digits=12, decimal_places=4)
+    sell_date = serializers.DateField(required=False, allow_null=True)
+    exit_reason = serializers.ChoiceField(choices=EXIT_REASONS, required=False, allow_null=True, allow_blank=True)
+    sell_notes = serializers.CharField(required=False, allow_blank=True)
+
+
+class UserTradeStatsSerializer(serializers.ModelSerializer):
+    win_rate = serializers.FloatField(read_only=True)
+    avg_win = serializers.FloatField(read_only=True)
+    avg_loss = serializers.FloatField(read_only=True)
+
+    class Meta:
+        model = UserTradeStats
+        fields = ['total_closed', 'wins', 'losses', 'win_rate', 'total_realized', 'avg_win', 'avg_loss',
+                  'updated_at']
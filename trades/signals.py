@@ -0,0 +1,142 @@
+# trades/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from .caching import bump_generation
+from .images import schedule_derivatives
+from .models import Rules, Trade, TradeChart
+from .nav import POSITION_FIELDS, EXIT_FIELDS, affected_from, invalidate_from
+from .positions import apply_lots, lot
+from .search import index_trade, unindex_trade
+from .stats import contribution, record_close, record_delete
+from .storage import release_blob
+
+
+@receiver(post_save, sender=Trade)
+@receiver(post_delete, sender=Trade)
+def notify_trade_change(sender, instance, **kwargs):
+    """Wake this process's live dashboard streams for the trade's owner."""
+    from .streams import get_hub
+    get_hub().trades_changed(instance.user_id)
+
+
+@receiver(post_save, sender=Trade)
+@receiver(post_delete, sender=Trade)
+@receiver(post_save, sender=Rules)
+@receiver(post_delete, sender=Rules)
+def bump_cache_generation(sender, instance, **kwargs):
+    """Make the owner's cached trade_list / reports / positions data unreachable."""
+    bump_generation(instance.user_id)
+    bump_generation(getattr(instance, '_old_owner', None))  # and the previous owner's
+
+
+@receiver(post_save, sender=TradeChart)
+@receiver(post_delete, sender=TradeChart)
+def bump_cache_generation_for_chart(sender, instance, **kwargs):
+    bump_generation(Trade.objects.filter(pk=instance.trade_id).values_list('user_id', flat=True).first())
+
+
+@receiver(post_save, sender=Trade)
+def update_stats_on_save(sender, instance, raw=False, **kwargs):
+    """Keep UserTradeStats in step with every save (views, API, admin, shell): apply the trade's change."""
+    if raw:
+        return
+    old = getattr(instance, '_old_row', None)
+    if old is not None and old.user_id != instance.user_id:
+        record_delete(old)
+        old = None
+    record_close(instance, contribution(old) if old is not None else None)
+
+
+@receiver(post_delete, sender=Trade)
+def update_stats_on_delete(sender, instance, **kwargs):
+    """Keep UserTradeStats in step when a closed trade is deleted (e.g. from the admin)."""
+    record_delete(instance)
+
+
+@receiver(pre_save, sender=Trade)
+def remember_nav_change(sender, instance, raw=False, **kwargs):
+    """Work out which NAV snapshots, Position lot and stats a trade edit changes (one PK lookup per save)."""
+    if raw:
+        return
+    old = None
+    if instance.pk:
+        old = sender.objects.filter(pk=instance.pk).only('user_id', *POSITION_FIELDS, *EXIT_FIELDS).first()
+    # a trade given to another user leaves the old owner's books as if deleted
+    # and enters the new owner's as if created
+    moved = old is not None and old.user_id != instance.user_id
+    instance._old_owner = old.user_id if moved else None
+    instance._old_owner_stale_from = affected_from(old, None) if moved else None
+    instance._nav_stale_from = affected_from(None if moved else old, instance)
+    instance._old_lot = lot(old)
+    instance._old_row = old
+
+
+@receiver(post_save, sender=Trade)
+def update_position_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    before, after = getattr(instance, '_old_lot', None), lot(instance)
+    old_owner = getattr(instance, '_old_owner', None)
+    if old_owner is not None:
+        apply_lots(old_owner, removed=[before])
+        apply_lots(instance.user_id, added=[after])
+    elif before != after:
+        apply_lots(instance.user_id, added=[after], removed=[before])
+
+
+@receiver(post_delete, sender=Trade)
+def update_position_on_delete(sender, instance, **kwargs):
+    apply_lots(instance.user_id, removed=[lot(instance)])
+
+
+@receiver(post_save, sender=Trade)
+def invalidate_nav_on_save(sender, instance, **kwargs):
+    invalidate_from(instance.user_id, getattr(instance, '_nav_stale_from', None))
+    if getattr(instance, '_old_owner', None) is not None:
+        invalidate_from(instance._old_owner, instance._old_owner_stale_from)
+
+
+@receiver(post_delete, sender=Trade)
+def invalidate_nav_on_delete(sender, instance, **kwargs):
+    invalidate_from(instance.user_id, affected_from(instance, None))
+
+
+# Trade fields that feed the full-text index
+SEARCH_FIELDS = {'ticker', 'indicators_text', 'buy_notes', 'sell_notes', 'user'}
+
+
+@receiver(post_save, sender=Trade)
+def index_trade_on_save(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw or (update_fields is not None and not SEARCH_FIELDS & set(update_fields)):
+        return
+    index_trade(instance.pk)
+
+
+@receiver(post_delete, sender=Trade)
+def unindex_trade_on_delete(sender, instance, **kwargs):
+    unindex_trade(instance.pk)
+
+
+@receiver(post_save, sender=TradeChart)
+@receiver(post_delete, sender=TradeChart)
+def reindex_chart_caption(sender, instance, raw=False, **kwargs):
+    """Chart captions are part of their trade's search document."""
+    if not raw:
+        index_trade(instance.trade_id)
+
+
+@receiver(post_save, sender=TradeChart)
+def build_chart_derivatives(sender, instance, created, raw=False, **kwargs):
+    """Resize new chart uploads in the background (thumb + medium, WebP + JPEG)."""
+    if created and not raw and instance.image:
+        schedule_derivatives(instance)
+
+
+@receiver(post_delete, sender=TradeChart)
+def release_chart_blob(sender, instance, **kwargs):
+    """Remove the image (and its derivatives) once the last chart using it is gone."""
+    if instance.image:
+        name, storage = instance.image.name, instance.image.storage
+        transaction.on_commit(lambda: release_blob(name, storage))
@@ -0,0 +1,119 @@
+# trades/stats.py
+"""
+Closed-trade metrics for the reports page.
+
+- aggregate_closed(qs): every metric in one aggregate query (DB-side arithmetic)
+- get_user_stats(user): the materialized UserTradeStats row (built on first use)
+- record_close(trade, previous): apply one trade's change to the row with F() updates
+  (record_closes: many trades of one user in one UPDATE)
+
+The row follows every Trade.save() and delete() through signals (trades/signals.py),
+whatever the caller. Bulk writes that send no signals (bulk_create / bulk_update in
+importers.insert_trades and the API bulk endpoints) apply the change themselves with
+record_closes() or rebuild_user_stats().
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+
+from .models import Trade, UserTradeStats
+
+# realized P&L of a closed trade, stored on the row by Trade.save()
+PNL = F('pnl')
+WIN = Q(sell_price__gt=F('buy_price'))
+LOSS = Q(sell_price__lte=F('buy_price'))
+
+COUNTERS = ('total_closed', 'wins', 'losses')
+TOTALS = ('total_realized', 'win_total', 'loss_total')
+
+
+def aggregate_closed(qs):
+    """Return UserTradeStats field values for a queryset of closed trades (single query)."""
+    agg = qs.aggregate(
+        total_closed=Count('id'),
+        wins=Count('id', filter=WIN),
+        losses=Count('id', filter=LOSS),
+        total_realized=Sum(PNL),
+        win_total=Sum(PNL, filter=WIN),
+        loss_total=Sum(PNL, filter=LOSS),
+    )
+    for key in TOTALS:
+        agg[key] = agg[key] or Decimal('0')
+    return agg
+
+
+def rebuild_user_stats(user):
+    """Recompute a user's stats row from scratch (one aggregate query + upsert)."""
+    values = aggregate_closed(Trade.objects.filter(user=user, is_closed=True))
+    stats, _ = UserTradeStats.objects.update_or_create(user=user, defaults=values)
+    return stats
+
+
+def get_user_stats(user):
+    try:
+        return UserTradeStats.objects.get(user=user)
+    except UserTradeStats.DoesNotExist:
+        return rebuild_user_stats(user)
+
+
+def contribution(trade):
+    """What a single trade adds to its owner's stats row, given its current field values."""
+    values = dict.fromkeys(COUNTERS, 0)
+    values.update(dict.fromkeys(TOTALS, Decimal('0')))
+    if not trade.is_closed:
+        return values
+    values['total_closed'] = 1
+    if trade.sell_price is None:
+        return values
+    pnl, _ = trade.compute_pnl()
+    values['total_realized'] = pnl
+    if Decimal(trade.sell_price) > Decimal(trade.buy_price):
+        values['wins'] = 1
+        values['win_total'] = pnl
+    else:
+        values['losses'] = 1
+        values['loss_total'] = pnl
+    return values
+
+
+def record_close(trade, previous=None):
+    """
+    Apply a saved (closed, re-edited or new) trade to the owner's UserTradeStats row.
+    previous: contribution() of the row before the edit, so re-closing an already
+    closed trade replaces its old numbers instead of counting it twice.
+    Called by the post_save signal, in the transaction that saved the trade.
+    """
+    record_closes([(trade, previous)])
+
+
+def record_closes(changes):
+    """record_close() for many (trade, previous) pairs of one user, as a single UPDATE."""
+    delta = {}
+    for trade, previous in changes:
+        new = contribution(trade)
+        old = previous or contribution(Trade(is_closed=False))
+        for k in new:
+            if new[k] != old[k]:
+                delta[k] = delta.get(k, 0) + new[k] - old[k]
+    delta = {k: v for k, v in delta.items() if v}
+    if not delta:
+        return
+    trade = changes[0][0]
+    with transaction.atomic():
+        updated = UserTradeStats.objects.filter(user_id=trade.user_id).update(
+            **{k: F(k) + v for k, v in delta.items()}
+        )
+        if not updated:
+            # no row yet: build it from the table (already includes these trades)
+            rebuild_user_stats(trade.user)
+
+
+def record_delete(trade):
+    """Remove a deleted trade's numbers from the owner's stats row (if the row exists)."""
+    old = contribution(trade)
+    delta = {k: v for k, v in old.items() if v}
+    if delta:
+        UserTradeStats.objects.filter(user_id=trade.user_id).update(
+            **{k: F(k) - v for k, v in delta.items()}
+        )
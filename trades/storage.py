@@ -0,0 +1,178 @@
+# trades/storage.py
+"""
+Content-addressed storage for chart uploads.
+
+Files are stored under their SHA-256: `trade_charts/ab/ab12…ef.png`. The hash is
+computed while streaming the upload in chunks (constant memory, also for large
+temporary uploads), and a blob that already exists is not written again, so the
+same screenshot attached to several TradeChart rows takes disk space once. New
+blobs are written to a temporary name and hard-linked into place, so two first
+uploads of the same bytes racing each other still end up as one file.
+
+Blobs are shared: delete one only when no TradeChart references it any more
+(release_blob, called after a chart delete commits). An upload that finds its
+blob already stored touches it, and neither release_blob nor the gc_chart_blobs
+command deletes a file modified within BLOB_MIN_AGE, so a concurrent upload
+whose row is not committed yet never loses the blob it is about to point at.
+"""
+import datetime
+import hashlib
+import os
+import re
+from collections import Counter
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from django.utils.deconstruct import deconstructible
+
+# unreferenced files younger than this may belong to an upload whose row isn't committed yet
+BLOB_MIN_AGE = datetime.timedelta(hours=24)
+
+
+def content_hash(content, algorithm='sha256'):
+    digest = hashlib.new(algorithm)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    if hasattr(content, 'seek'):
+        content.seek(0)
+    return digest.hexdigest()
+
+
+BLOB_RE = re.compile(r'(^|/)([0-9a-f]{2})/\2[0-9a-f]{62}\.[A-Za-z0-9]+$')
+
+
+def is_blob(name):
+    return bool(BLOB_RE.search(name))
+
+
+def blob_name(directory, digest, filename):
+    ext = os.path.splitext(filename)[1].lower()
+    return os.path.join(directory, digest[:2], f"{digest}{ext}").replace('\\', '/')
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """FileSystemStorage that names files by content hash and never stores the same bytes twice."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        # upload_to only contributes the top-level directory; the rest of the path is the hash
+        directory = os.path.dirname(name).replace('\\', '/')
+        name = blob_name(directory, content_hash(content), name)
+        if self.exists(name):
+            # restart its age: a release racing with this upload must not delete it
+            os.utime(self.path(name))
+            return name
+        # a concurrent first upload of the same bytes may get there between the check
+        # and the write: write aside, then link into place, which fails if it exists
+        tmp = super()._save(f"{name}.{get_random_string(12)}.tmp", content)
+        try:
+            os.link(self.path(tmp), self.path(name))
+        except FileExistsError:
+            os.utime(self.path(name))
+        finally:
+            os.remove(self.path(tmp))
+        return name
+
+    def save_exact(self, name, content, max_length=None):
+        """Store under `name` as given (for files derived from a blob, e.g. thumbnails)."""
+        return super().save(name, content, max_length=max_length)
+
+
+chart_storage = ContentAddressedStorage()
+
+
+def release_blob(name, storage=None, min_age=BLOB_MIN_AGE):
+    """
+    Delete a chart blob and its derivatives if no TradeChart references it any more
+    and it is older than `min_age` (younger ones are left to collect_garbage).
+    """
+    from .images import delete_derivatives
+    from .models import TradeChart
+
+    storage = storage or chart_storage
+    if not name or TradeChart.objects.filter(image=name).exists():
+        return False
+    if storage.exists(name) and storage.get_modified_time(name) > timezone.now() - min_age:
+        return False
+    delete_derivatives(name, storage=storage)
+    if storage.exists(name):
+        storage.delete(name)
+    return True
+
+
+def walk_files(storage, path):
+    """Yield every file name below `path` in storage (recursively)."""
+    if not storage.exists(path):
+        return
+    dirs, files = storage.listdir(path)
+    for f in files:
+        yield f"{path}/{f}"
+    for d in dirs:
+        yield from walk_files(storage, f"{path}/{d}")
+
+
+def rehash_legacy(storage=None, dry_run=False):
+    """
+    Move charts stored under the old date-based names into content-addressed blobs
+    and repoint their rows. Returns the number of legacy names migrated; the old
+    files become orphans for collect_garbage.
+    """
+    from .models import TradeChart
+
+    storage = storage or chart_storage
+    directory = TradeChart._meta.get_field('image').upload_to.rstrip('/')
+    legacy = (TradeChart.objects.exclude(image='').values_list('image', flat=True).distinct())
+    moved = 0
+    for old in [name for name in legacy if not is_blob(name)]:
+        if not storage.exists(old):
+            continue
+        moved += 1
+        if dry_run:
+            continue
+        with storage.open(old, 'rb') as fh:
+            new = storage.save(f"{directory}/{os.path.basename(old)}", File(fh, old))
+        ready = TradeChart.objects.filter(image=new, derivatives_ready=True).exists()
+        TradeChart.objects.filter(image=old).update(image=new, derivatives_ready=ready)
+    return moved
+
+
+def collect_garbage(storage=None, min_age=BLOB_MIN_AGE, dry_run=False):
+    """
+    Delete files under the chart directory that no TradeChart references (blobs,
+    legacy uploads and their derivatives). Files younger than `min_age` are kept so
+    uploads whose row is not committed yet are safe.
+    Returns a Counter: files, referenced, shared (blobs used by more than one chart),
+    deleted, deleted_bytes, kept_young.
+    """
+    from .images import FORMATS, derivative_name, sizes
+    from .models import TradeChart
+
+    storage = storage or chart_storage
+    directory = TradeChart._meta.get_field('image').upload_to.rstrip('/')
+    refcounts = dict(TradeChart.objects.exclude(image='').values('image')
+                     .annotate(refs=Count('id')).values_list('image', 'refs'))
+    keep = set(refcounts)
+    for name in refcounts:
+        keep.update(derivative_name(name, size, fmt) for size in sizes() for fmt in FORMATS)
+
+    stats = Counter(referenced=len(refcounts), shared=sum(1 for n in refcounts.values() if n > 1))
+    cutoff = timezone.now() - min_age
+    for name in walk_files(storage, directory):
+        stats['files'] += 1
+        if name in keep:
+            continue
+        if storage.get_modified_time(name) > cutoff:
+            stats['kept_young'] += 1
+            continue
+        stats['deleted'] += 1
+        stats['deleted_bytes'] += storage.size(name)
+        if not dry_run:
+            storage.delete(name)
+    return stats
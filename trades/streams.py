@@ -0,0 +1,262 @@
+# trades/streams.py
+"""
+Server-sent events (SSE) stream for the dashboard.
+
+One PriceHub per process polls the PriceSnapshot table (a single query per
+STREAM_POLL_INTERVAL, however many tabs are open) and wakes every connected
+PortfolioStream. A stream only recomputes when one of *its* tickers changed
+price or the user's trades changed, and only sends the positions that differ
+from what the client already has.
+
+Events:
+  - snapshot: full portfolio payload (same shape as portfolio_value_api)
+  - delta: {'positions': [changed/added], 'removed': [tickers], totals...}
+Served only under ASGI (async iterator, no thread per client). Under WSGI an open
+stream would pin a sync worker for the life of the tab, so the view answers 204
+instead and the dashboard falls back to polling.
+"""
+import asyncio
+import datetime
+import json
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import PriceSnapshot, Trade
+from .portfolio import load_positions, value_positions
+from .prices import snapshot_quotes
+from .quotes import FRESH, STALE, Quote
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class PriceHub:
+    """
+    Process-wide price subscription. A daemon thread polls PriceSnapshot for rows
+    written since the last seen updated_at while at least one stream is connected.
+    fetched_at can't be the cursor: an upsert may carry an older quote time than a
+    row already seen. Each poll re-reads POLL_OVERLAP before the cursor so a write
+    committed after a later one is not skipped; re-read rows with an unchanged
+    price are not reported as moves.
+    `version` increases on every change; `_changed` remembers at which version
+    each ticker last changed so subscribers can ask "what changed since N".
+    """
+
+    POLL_OVERLAP = datetime.timedelta(seconds=5)
+
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self.version = 0
+        self._prices = {}  # ticker -> (price, fetched_at)
+        self._changed = {}  # ticker -> version of last price change
+        self._user_versions = {}  # user_id -> version of last trade change
+        self._since = None
+        self._subscribers = 0
+        self._thread = None
+        self._cond = threading.Condition()
+        self._async_waiters = set()  # (loop, asyncio.Event)
+
+    # --- subscription ---
+    def subscribe(self):
+        with self._cond:
+            self._subscribers += 1
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='price-hub', daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    # --- polling thread ---
+    def _run(self):
+        try:
+            while True:
+                with self._cond:
+                    if self._subscribers <= 0:
+                        self._thread = None
+                        return
+                try:
+                    self.poll()
+                except Exception:
+                    pass
+                time.sleep(self.interval)
+        finally:
+            close_old_connections()
+
+    def poll(self):
+        """Load snapshots written since the last poll; notify if any price moved."""
+        close_old_connections()
+        qs = PriceSnapshot.objects.all()
+        if self._since is not None:
+            qs = qs.filter(updated_at__gt=self._since - self.POLL_OVERLAP)
+        moved = []
+        for ticker, price, fetched_at, updated_at in qs.values_list('ticker', 'price', 'fetched_at', 'updated_at'):
+            price = float(price)
+            old = self._prices.get(ticker)
+            self._prices[ticker] = (price, fetched_at)
+            if self._since is None or updated_at > self._since:
+                self._since = updated_at
+            if old is None or old[0] != price:
+                moved.append(ticker)
+        if moved:
+            with self._cond:
+                self.version += 1
+                for t in moved:
+                    self._changed[t] = self.version
+                self._notify()
+
+    def trades_changed(self, user_id):
+        """Called (via signals) when a user's trades change in this process."""
+        with self._cond:
+            self.version += 1
+            self._user_versions[user_id] = self.version
+            self._notify()
+
+    def _notify(self):
+        self._cond.notify_all()
+        for loop, event in list(self._async_waiters):
+            loop.call_soon_threadsafe(event.set)
+
+    # --- reading ---
+    def changes_since(self, version, user_id):
+        """Return (tickers whose price changed after `version`, whether the user's trades did)."""
+        with self._cond:
+            tickers = {t for t, v in self._changed.items() if v > version}
+            return tickers, self._user_versions.get(user_id, 0) > version
+
+    def quotes(self, tickers):
+        """Return ({ticker: Quote} known to the hub, [tickers it has never seen])."""
+        cutoff = timezone.now() - datetime.timedelta(seconds=getattr(settings, 'PRICE_SNAPSHOT_MAX_AGE', 120))
+        quotes, unknown = {}, []
+        for t in tickers:
+            entry = self._prices.get(t)
+            if entry is None:
+                unknown.append(t)
+            else:
+                quotes[t] = Quote(entry[0], entry[1].timestamp(), FRESH if entry[1] >= cutoff else STALE)
+        return quotes, unknown
+
+    # --- waiting ---
+    async def wait_async(self, version, timeout):
+        event = asyncio.Event()
+        waiter = (asyncio.get_running_loop(), event)
+        with self._cond:
+            if self.version != version:
+                return self.version
+            self._async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._cond:
+                self._async_waiters.discard(waiter)
+        return self.version
+
+
+_hub = None
+_hub_lock = threading.Lock()
+
+
+def get_hub():
+    global _hub
+    if _hub is None:
+        with _hub_lock:
+            if _hub is None:
+                _hub = PriceHub(interval=getattr(settings, 'STREAM_POLL_INTERVAL', 2.0))
+    return _hub
+
+
+def trades_fingerprint(user):
+    """Cheap change marker for a user's trades (also catches writes from other processes)."""
+    agg = Trade.objects.filter(user=user).aggregate(n=Count('id'), last=Max('updated_at'))
+    return agg['n'], agg['last']
+
+
+class PortfolioStream:
+    """Per-connection state: the positions last sent to this client."""
+
+    def __init__(self, user, hub=None):
+        self.user = user
+        self.hub = hub or get_hub()
+        self.keepalive = getattr(settings, 'STREAM_KEEPALIVE', 15)
+        self.positions = []
+        self.tickers = set()
+        self.fingerprint = None
+        self.sent = {}  # ticker -> position dict as last sent
+        self.sent_totals = None
+
+    def _reload(self):
+        self.fingerprint = trades_fingerprint(self.user)
+        self.positions = load_positions(self.user)
+        self.tickers = {p['ticker'] for p in self.positions}
+
+    def _payload(self):
+        quotes, unknown = self.hub.quotes(self.tickers)
+        if unknown:
+            quotes.update(snapshot_quotes(unknown))
+        return value_positions(self.positions, quotes)
+
+    def start(self):
+        """Initial full snapshot event."""
+        self._reload()
+        data = self._payload()
+        self.sent = {p['ticker']: p for p in data['positions']}
+        self.sent_totals = {k: v for k, v in data.items() if k != 'positions'}
+        return sse('snapshot', data)
+
+    def step(self, changed_tickers=(), trades_changed=False, recheck=False):
+        """
+        Return a delta event (or None when nothing the client shows has changed).
+        recheck: periodic check for trade writes made by other processes and for
+        prices going stale.
+        """
+        if recheck and not trades_changed:
+            trades_changed = trades_fingerprint(self.user) != self.fingerprint
+        if trades_changed:
+            self._reload()
+        elif not recheck and not (set(changed_tickers) & self.tickers):
+            return None
+
+        data = self._payload()
+        current = {p['ticker']: p for p in data.pop('positions')}
+        changed = [p for t, p in current.items() if self.sent.get(t) != p]
+        removed = [t for t in self.sent if t not in current]
+        if not changed and not removed and data == self.sent_totals:
+            return None
+        self.sent, self.sent_totals = current, data
+        return sse('delta', {'positions': changed, 'removed': removed, **data})
+
+    # --- transports ---
+    async def __aiter__(self):
+        """Async generator (ASGI): waiting clients cost no thread."""
+        self.hub.subscribe()
+        try:
+            version = self.hub.version
+            yield await sync_to_async(self.start)()
+            last_check = time.monotonic()
+            while True:
+                new_version = await self.hub.wait_async(version, self.keepalive)
+                recheck = time.monotonic() - last_check >= self.keepalive
+                tickers, mine = self.hub.changes_since(version, self.user.pk)
+                version = new_version
+                if recheck or mine or (tickers & self.tickers):
+                    event = await sync_to_async(self.step)(tickers, mine, recheck)
+                else:
+                    event = None
+                if recheck:
+                    last_check = time.monotonic()
+                if event:
+                    yield event
+                elif recheck:
+                    yield ': keepalive\n\n'
+        finally:
+            self.hub.unsubscribe()
@@ -1,3 +1,1236 @@
-from django.test import TestCase
+import copy
+import datetime
+import importlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.db import connection, connections, transaction
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.storage import FileSystemStorage
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import caching, exports, images, storage
+from .backends.sqlite3.base import DatabaseWrapper as TunedSQLiteWrapper
+from .analytics import analyze, load_closed
+from .candles import render_trade_chart
+from .history import HistoryStore, load_fixture, sync_history
+from .indicators import indicators_at, indicators_many, week_of
+from .models import ActivityLog, DailyPortfolioSnapshot, Position, PriceSnapshot, Rules, Trade, TradeChart
+from .importers import import_trades, validate_row
+from .nav import update_snapshots
+from .prices import save_snapshots, snapshot_quotes
+from .quotes import FRESH, MISSING, STALE, FixtureProvider, Quote, QuoteCache, reset_quote_cache
+from .rules import compile_rules, violations_by_user
+from .pagination import keyset_page, seek
+from .portfolio import load_positions
+from .positions import rebuild_positions, verify_positions
+from .search import search_trade_ids
+from .stats import aggregate_closed, get_user_stats
+from .streams import PortfolioStream, PriceHub
+from .utils import BackgroundActivityWriter, activity_buffer, log_activity
+
+
+class CountingProvider(FixtureProvider):
+    """FixtureProvider that records every ticker it is asked for."""
+    name = 'counting'
+
+    def __init__(self, prices=None):
+        super().__init__(prices)
+        self.calls = []
+
+    def get_price(self, ticker):
+        self.calls.append(ticker.upper())
+        return super().get_price(ticker)
+
+
+class QuoteCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.provider = CountingProvider(prices={'AAPL': 190.5})
+        self.quotes = QuoteCache(self.provider, ttl=30)
+
+    def tearDown(self):
+        self.quotes._executor.shutdown()
+
+    def test_fetched_once_per_ttl_across_caches(self):
+        first = self.quotes.get_quotes(['aapl'])['AAPL']
+        self.assertEqual((first.price, first.status), (190.5, FRESH))
+        self.assertEqual(self.quotes.get_prices(['AAPL', 'aapl']), {'AAPL': 190.5})
+        # another process's cache finds it in the shared Django cache
+        other = QuoteCache(self.provider, ttl=30)
+        self.assertEqual(other.get_prices(['AAPL']), {'AAPL': 190.5})
+        other._executor.shutdown()
+        self.assertEqual(self.provider.calls, ['AAPL'])
+
+        expired = (190.5, time.time() - 60)
+        self.quotes._local['AAPL'] = expired
+        cache.set(self.quotes._key('AAPL'), expired)
+        self.provider.prices['AAPL'] = 191.0
+        self.assertEqual(self.quotes.get_prices(['AAPL']), {'AAPL': 191.0})
+        self.assertEqual(self.provider.calls, ['AAPL', 'AAPL'])
+
+
+class SlowProvider(FixtureProvider):
+    """Answers only after the fetch deadline has passed."""
+    name = 'slow'
+
+    def get_price(self, ticker):
+        time.sleep(0.3)
+        return super().get_price(ticker)
+
+
+class QuoteDeadlineTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_slow_provider_yields_stale_and_missing(self):
+        quotes = QuoteCache(SlowProvider(), ttl=30, timeout=0.05)
+        quotes._local['OLD'] = (42.0, time.time() - 60)  # expired, but within stale_ttl
+        started = time.monotonic()
+        result = quotes.get_quotes(['OLD', 'NEW'])
+        self.assertLess(time.monotonic() - started, 0.25)
+        self.assertEqual((result['OLD'].price, result['OLD'].status), (42.0, STALE))
+        self.assertEqual((result['NEW'].price, result['NEW'].status), (None, MISSING))
+        quotes._executor.shutdown(wait=False)
+
+    @override_settings(QUOTE_PROVIDER='trades.tests.SlowProvider', QUOTE_FETCH_TIMEOUT=0.05,
+                       PRICE_SNAPSHOT_FALLBACK=True)
+    def test_portfolio_api_flags_partial(self):
+        reset_quote_cache()
+        self.addCleanup(reset_quote_cache)
+        user = get_user_model().objects.create_user('trader', password='pw')
+        for ticker in ('AAPL', 'MSFT'):
+            Trade.objects.create(user=user, ticker=ticker, quantity=1, buy_price=10,
+                                 buy_date=datetime.date(2024, 1, 2))
+        PriceSnapshot.objects.create(ticker='AAPL', price=12, fetched_at=timezone.now() - datetime.timedelta(hours=1))
+        self.client.force_login(user)
+        data = self.client.get(reverse('portfolio_value_api')).json()
+        flags = {p['ticker']: (p['last_price'], p['stale'], p['missing']) for p in data['positions']}
+        # AAPL: old snapshot; MSFT: no snapshot and the live fallback misses the deadline
+        self.assertEqual(flags, {'AAPL': (12.0, True, False), 'MSFT': (None, False, True)})
+        self.assertTrue(data['partial'])
+
+
+
+class PriceSnapshotTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_save_snapshots_upserts_fresh_quotes(self):
+        now = time.time()
+        written = save_snapshots({'AAPL': Quote(100.0, now, FRESH), 'MSFT': Quote(5.0, now, STALE),
+                                  'NONE': Quote(None, None, MISSING)}, 'fixture')
+        self.assertEqual(written, 1)
+        save_snapshots({'AAPL': Quote(101.5, now + 1, FRESH)}, 'fixture')
+        self.assertEqual(list(PriceSnapshot.objects.values_list('ticker', 'price')), [('AAPL', Decimal('101.5'))])
+
+    def test_older_quote_does_not_overwrite_a_newer_one(self):
+        now = time.time()
+        save_snapshots({'AAPL': Quote(101.5, now, FRESH)}, 'fixture')
+        self.assertEqual(save_snapshots({'AAPL': Quote(99.0, now - 10, FRESH), 'MSFT': Quote(5.0, now, FRESH)},
+                                        'fixture'), 1)
+        self.assertEqual(dict(PriceSnapshot.objects.values_list('ticker', 'price')),
+                         {'AAPL': Decimal('101.5'), 'MSFT': Decimal('5')})
+
+    @override_settings(QUOTE_PROVIDER='trades.quotes.FixtureProvider', QUOTE_FIXTURE_PRICES={'NEW': 7},
+                       PRICE_SNAPSHOT_MAX_AGE=120)
+    def test_snapshot_quotes_flags_stale_and_falls_back(self):
+        reset_quote_cache()
+        self.addCleanup(reset_quote_cache)
+        PriceSnapshot.objects.create(ticker='OLD', price=1, fetched_at=timezone.now() - datetime.timedelta(minutes=5))
+        PriceSnapshot.objects.create(ticker='NOW', price=2, fetched_at=timezone.now())
+        with override_settings(PRICE_SNAPSHOT_FALLBACK=False):
+            quotes = snapshot_quotes(['old', 'now', 'new'])
+        self.assertEqual({t: (q.price, q.status) for t, q in quotes.items()},
+                         {'OLD': (1.0, STALE), 'NOW': (2.0, FRESH), 'NEW': (None, MISSING)})
+
+        # with the fallback, a ticker without a snapshot is fetched once and saved for the next reader
+        with override_settings(PRICE_SNAPSHOT_FALLBACK=True):
+            self.assertEqual(snapshot_quotes(['NEW'])['NEW'].price, 7.0)
+        self.assertEqual(PriceSnapshot.objects.get(ticker='NEW').price, Decimal('7'))
+
+
+class PortfolioStreamTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+        for ticker in ('AAPL', 'MSFT'):
+            Trade.objects.create(user=self.user, ticker=ticker, quantity=2, buy_price=10,
+                                 buy_date=datetime.date(2024, 1, 2))
+        self.now = timezone.now()
+        for ticker in ('AAPL', 'MSFT', 'IBM'):
+            PriceSnapshot.objects.create(ticker=ticker, price=10, fetched_at=self.now)
+
+    def move(self, ticker, price, seconds):
+        fetched_at = (self.now + datetime.timedelta(seconds=seconds)).timestamp()
+        save_snapshots({ticker: Quote(price, fetched_at, FRESH)}, source='test')
+
+    def test_snapshot_then_delta_after_a_price_write(self):
+        hub = PriceHub()
+        hub.poll()
+        stream = PortfolioStream(self.user, hub=hub)
+        self.assertTrue(stream.start().startswith('event: snapshot\n'))
+
+        version = hub.version
+        self.move('IBM', 20, seconds=1)
+        hub.poll()
+        tickers, mine = hub.changes_since(version, self.user.pk)
+        self.assertEqual((tickers, mine), ({'IBM'}, False))
+        self.assertIsNone(stream.step(tickers, mine))  # not one of the user's tickers
+
+        version = hub.version
+        self.move('AAPL', 15, seconds=2)
+        hub.poll()
+        event = stream.step(*hub.changes_since(version, self.user.pk))
+        name, data = event.split('\n', 1)
+        self.assertEqual(name, 'event: delta')
+        payload = json.loads(data[len('data: '):])
+        self.assertEqual([(p['ticker'], p['last_price']) for p in payload['positions']], [('AAPL', 15.0)])
+        self.assertEqual((payload['removed'], payload['total_value']), ([], 50.0))
+
+    def test_wsgi_request_gets_no_content_so_the_page_polls(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('portfolio_stream'))
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
+
+    def test_upsert_with_an_older_quote_time_is_seen(self):
+        hub = PriceHub()
+        self.move('AAPL', 12, seconds=60)
+        hub.poll()
+        version = hub.version
+        # another process writes a quote it fetched before the one already seen
+        self.move('MSFT', 11, seconds=30)
+        hub.poll()
+        self.assertEqual(hub.changes_since(version, self.user.pk), ({'MSFT'}, False))
+        version = hub.version
+        hub.poll()  # the overlap re-reads MSFT, but its price didn't move
+        self.assertEqual(hub.version, version)
+
+
+class UserTradeStatsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+        self.trades = [Trade.objects.create(user=self.user, ticker=t, quantity=10, buy_price=100,
+                                            buy_date=datetime.date(2024, 1, 2)) for t in ('AAA', 'BBB', 'CCC')]
+        self.client.force_login(self.user)
+
+    def assertStatsInStep(self, user=None):
+        user = user or self.user
+        stats = get_user_stats(user)
+        expected = aggregate_closed(Trade.objects.filter(user=user, is_closed=True))
+        self.assertEqual({k: getattr(stats, k) for k in expected}, expected)
+        return stats
+
+    def close(self, trade, price):
+        self.client.post(reverse('close_trade', args=[trade.pk]),
+                         {'sell_price': price, 'sell_date': '2024-02-01', 'exit_reason': 'MAN'})
+
+    def test_closes_edits_and_deletes_keep_the_row_in_step(self):
+        self.assertEqual(self.assertStatsInStep().total_closed, 0)
+        self.close(self.trades[0], 120)
+        self.close(self.trades[1], 90)
+        stats = self.assertStatsInStep()
+        self.assertEqual((stats.wins, stats.losses, stats.total_realized), (1, 1, Decimal('100')))
+
+        self.close(self.trades[0], 80)  # re-closing replaces the old numbers
+        self.assertEqual(self.assertStatsInStep().wins, 0)
+
+        trade = Trade.objects.get(pk=self.trades[1].pk)
+        trade.quantity = 20
+        request = RequestFactory().post('/')
+        request.user = self.user
+        admin.site._registry[Trade].save_model(request, trade, None, True)
+        self.assertEqual(self.assertStatsInStep().total_realized, Decimal('-400'))
+
+        trade.delete()
+        stats = self.assertStatsInStep()
+        self.assertEqual((stats.total_closed, stats.losses), (1, 1))
+
+    def test_any_save_and_owner_changes_keep_both_rows_in_step(self):
+        other = get_user_model().objects.create_user('other', password='pw')
+        self.assertStatsInStep(other)
+        # a plain save, as from the shell or a management command
+        trade = self.trades[0]
+        trade.is_closed, trade.sell_price, trade.sell_date = True, 130, datetime.date(2024, 2, 1)
+        trade.save()
+        self.assertEqual(self.assertStatsInStep().total_realized, Decimal('300'))
+
+        trade.user = other
+        request = RequestFactory().post('/')
+        request.user = self.user
+        admin.site._registry[Trade].save_model(request, trade, None, True)
+        self.assertEqual(self.assertStatsInStep().total_closed, 0)
+        self.assertEqual(self.assertStatsInStep(other).total_closed, 1)
+
+
+class TradePnlColumnTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+
+    def make_trade(self, **kwargs):
+        values = dict(user=self.user, ticker='AAPL', quantity=10, buy_price=100, buy_date=datetime.date(2024, 1, 2))
+        values.update(kwargs)
+        return Trade.objects.create(**values)
+
+    def test_open_trade_has_no_pnl(self):
+        trade = self.make_trade()
+        self.assertIsNone(trade.pnl)
+        self.assertIsNone(trade.pnl_pct)
+
+    def test_closing_stores_pnl_and_pct(self):
+        trade = self.make_trade()
+        trade.is_closed = True
+        trade.sell_price = Decimal('112.5')
+        trade.save(update_fields=['is_closed', 'sell_price'])
+        trade.refresh_from_db()
+        self.assertEqual(trade.pnl, Decimal('125.0000'))
+        self.assertEqual(trade.pnl_pct, Decimal('12.5000'))
+        self.assertEqual(float(trade.pnl), trade.realized_pnl())
+
+    def test_sort_by_pnl_in_sql(self):
+        for sell in (90, 130, 110):
+            self.make_trade(is_closed=True, sell_price=sell, sell_date=datetime.date(2024, 2, 1))
+        ordered = Trade.objects.filter(user=self.user, is_closed=True).order_by('-pnl')
+        self.assertEqual([int(t.sell_price) for t in ordered], [130, 110, 90])
+
+    def test_migration_backfill_matches_save(self):
+        migration = importlib.import_module('trades.migrations.0004_trade_pnl_indexes')
+        trade = self.make_trade(quantity=3, buy_price=3, is_closed=True, sell_price=4,
+                                sell_date=datetime.date(2024, 2, 1))
+        Trade.objects.filter(pk=trade.pk).update(pnl=None, pnl_pct=None)
+        migration.backfill_pnl(django_apps, None)
+        stored = Trade.objects.values_list('pnl', 'pnl_pct').get(pk=trade.pk)
+        self.assertEqual(stored, trade.compute_pnl())
+        self.assertEqual(stored, (Decimal('3.0000'), Decimal('33.3333')))
+
+
+class TradeQueryPlanTests(TestCase):
+    """The trade_list / reports / export query shapes must be served by the composite indexes."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+
+    def assertUsesIndex(self, qs, index_name):
+        if connection.vendor not in ('sqlite', 'postgresql'):
+            self.skipTest('EXPLAIN output checked for SQLite and Postgres only')
+        plan = qs.explain()
+        self.assertIn(index_name, plan, plan)
+
+    def test_open_positions(self):
+        qs = Trade.objects.filter(user=self.user, is_closed=False).order_by('-buy_date')
+        self.assertUsesIndex(qs, 'trade_open_buy_idx')
+
+    def test_closed_by_sell_date(self):
+        qs = Trade.objects.filter(user=self.user, is_closed=True, sell_date__gte='2024-01-01').order_by('-sell_date')
+        self.assertUsesIndex(qs, 'trade_closed_sell_idx')
+
+    def test_closed_by_exit_reason(self):
+        qs = Trade.objects.filter(user=self.user, is_closed=True, exit_reason='SL').order_by('-sell_date')
+        self.assertUsesIndex(qs, 'trade_closed_exit_idx')
+
+    def test_closed_by_pnl(self):
+        qs = Trade.objects.filter(user=self.user, is_closed=True).order_by('-pnl')
+        self.assertUsesIndex(qs, 'trade_closed_pnl_idx')
+
+    def test_closed_keyset_seek(self):
+        qs = Trade.objects.filter(user=self.user, is_closed=True)
+        ordering = ('-sell_date', '-id')
+        qs = seek(qs, ordering, [datetime.date(2024, 3, 1), 50]).order_by(*ordering)
+        self.assertUsesIndex(qs[:11], 'trade_closed_sell_idx')
+
+
+class ClosedTradeExportTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+        self.client.force_login(self.user)
+        for i in range(5):
+            trade = Trade.objects.create(user=self.user, ticker=f'T{i}', quantity=1, buy_price=10,
+                                         buy_date=datetime.date(2024, 1, 2), is_closed=True, sell_price=12,
+                                         sell_date=datetime.date(2024, 2, i + 1))
+            TradeChart.objects.create(trade=trade, image=f'trade_charts/t{i}.png')
+
+    def test_csv_streams_with_constant_queries(self):
+        # session + user, trades chunk, charts prefetch for the chunk
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('export_closed_csv'))
+            body = b''.join(response.streaming_content).decode()
+        lines = body.strip().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertTrue(lines[1].startswith(str(Trade.objects.order_by('-sell_date').first().id)))
+        self.assertIn('trade_charts/t4.png', lines[1])
+
+    @skipIf(exports.pa is None, 'pyarrow not installed')
+    def test_parquet_roundtrip(self):
+        response = self.client.get(reverse('export_closed_parquet'))
+        table = exports.pq.read_table(io.BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(table.num_rows, 5)
+        self.assertEqual(table.column('pnl').to_pylist(), [2.0] * 5)
+
+
+class AdminCsvExportTests(TestCase):
+    def setUp(self):
+        self.admin = get_user_model().objects.create_superuser('admin', password='pw')
+        self.client.force_login(self.admin)
+        for i in range(5):
+            owner = get_user_model().objects.create_user(f'user{i}', password='pw')
+            Trade.objects.create(user=owner, ticker=f'T{i}', quantity=1, buy_price=10,
+                                 buy_date=datetime.date(2024, 1, 2))
+
+    def test_export_selects_users_in_the_same_query(self):
+        url = reverse('admin:trades_trade_changelist')
+        data = {'action': 'export_as_csv', 'select_across': 1, 'index': 0,
+                '_selected_action': list(Trade.objects.values_list('pk', flat=True))}
+        response = self.client.post(url, data)
+        with self.assertNumQueries(1):
+            body = b''.join(response.streaming_content).decode()
+        lines = body.strip().splitlines()
+        self.assertEqual(len(lines), 6)
+        self.assertIn('user3', body)
+
+
+class ActivityLogBufferTests(TransactionTestCase):
+    # TransactionTestCase: entries are dispatched by on_commit callbacks
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+
+    def test_entries_are_written_in_one_insert(self):
+        with CaptureQueriesContext(connection) as ctx:
+            with activity_buffer():
+                for i in range(10):
+                    log_activity(self.user, f"event {i}")
+        inserts = [q for q in ctx.captured_queries if q['sql'].startswith('INSERT')]
+        self.assertEqual(len(inserts), 1)
+        self.assertEqual(ActivityLog.objects.count(), 10)
+
+    def test_rolled_back_entries_are_discarded(self):
+        with activity_buffer():
+            try:
+                with transaction.atomic():
+                    log_activity(self.user, "never happened")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            log_activity(self.user, "kept")
+        self.assertEqual(list(ActivityLog.objects.values_list('action', flat=True)), ['kept'])
+
+    def test_background_writer_flushes_on_close(self):
+        writer = BackgroundActivityWriter(flush_interval=60)
+        writer.write([ActivityLog(action=f"e{i}") for i in range(3)])
+        writer.close()
+        self.assertEqual(ActivityLog.objects.count(), 3)
+        self.assertEqual(writer.stats['written'], 3)
+        self.assertEqual(writer.stats['dropped'], 0)
+
+    def test_stats_add_up_under_concurrent_writers(self):
+        writer = BackgroundActivityWriter(maxsize=10, flush_interval=60)
+        threads = [threading.Thread(target=writer.write, args=([ActivityLog(action="e") for _ in range(200)],))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.close()
+        stats = writer.stats_snapshot()
+        self.assertEqual(stats['enqueued'] + stats['dropped'], 1600)
+        self.assertEqual(stats['written'], stats['enqueued'])
+
+
+class BulkImportTests(TestCase):
+    CSV = (
+        "Symbol,Qty,Buy Price,Buy Date,Sell Price,Sell Date,Exit Reason\n"
+        "AAPL,10,100,2024-01-02,,,\n"
+        "MSFT,5,200,2024-01-02,220,2024-03-01,RES\n"
+        "BAD,abc,1,2024-01-02,,,\n"
+        "TSLA,1,100,2024-02-01,90,2024-01-01,SL\n"
+    )
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+
+    def test_import_creates_open_and_closed_trades_and_reports_errors(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            result = import_trades(self.user, io.BytesIO(self.CSV.encode()))
+        self.assertEqual((result.open_created, result.closed_created, result.error_count), (1, 1, 2))
+        self.assertEqual([line for line, _ in result.errors], [4, 5])
+        self.assertIn('quantity', result.errors[0][1])
+        self.assertIn('sell_date', result.errors[1][1])
+
+        msft = Trade.objects.get(ticker='MSFT')
+        self.assertTrue(msft.is_closed)
+        self.assertEqual(msft.pnl, Decimal('100.0000'))
+        self.assertEqual(self.user.trade_stats.total_closed, 1)
+        self.assertEqual(ActivityLog.objects.filter(user=self.user).count(), 1)
+
+    def test_dry_run_writes_nothing(self):
+        result = import_trades(self.user, io.BytesIO(self.CSV.encode()), dry_run=True)
+        self.assertEqual(result.created, 2)
+        self.assertFalse(Trade.objects.exists())
+
+    def test_sell_fields_follow_close_trade_rules(self):
+        row = {'ticker': 'AAPL', 'quantity': '1', 'buy_price': '10', 'buy_date': '2024-01-02'}
+        values, errors = validate_row({**row, 'sell_price': '12'})
+        self.assertEqual((errors, values['sell_date']), ({}, datetime.date.today()))
+        for extra in ({'sell_date': '2024-02-01'}, {'exit_reason': 'RES'}):
+            _, errors = validate_row({**row, **extra})
+            self.assertIn('sell_price', errors)
+
+    @override_settings(IMPORT_MAX_UPLOAD_BYTES=64)
+    def test_large_uploads_are_sent_to_the_management_command(self):
+        self.client.force_login(self.user)
+        upload = SimpleUploadedFile('trades.csv', self.CSV.encode(), content_type='text/csv')
+        response = self.client.post(reverse('import_trades'), {'file': upload})
+        self.assertContains(response, "manage.py import_trades")
+        self.assertFalse(Trade.objects.exists())
+
+
+class ChartDerivativeTests(TestCase):
+    def setUp(self):
+        from PIL import Image
+
+        self.media = tempfile.TemporaryDirectory()
+        self.storage = FileSystemStorage(location=self.media.name, base_url='/media/')
+        buf = io.BytesIO()
+        Image.new('RGB', (2000, 1000), 'white').save(buf, 'PNG')
+        self.name = self.storage.save('trade_charts/chart.png', ContentFile(buf.getvalue()))
+
+    def tearDown(self):
+        self.media.cleanup()
+
+    def test_generates_each_size_and_format(self):
+        from PIL import Image
+
+        written = images.generate_derivatives(self.name, storage=self.storage, size_map={'thumb': 320, 'medium': 1024})
+        self.assertEqual(len(written), 4)
+        with self.storage.open('trade_charts/chart.thumb.webp') as fh:
+            self.assertEqual(Image.open(fh).size, (320, 160))
+        with self.storage.open('trade_charts/chart.medium.jpg') as fh:
+            self.assertEqual(Image.open(fh).size, (1024, 512))
+
+        images.delete_derivatives(self.name, storage=self.storage)
+        self.assertFalse(self.storage.exists('trade_charts/chart.thumb.webp'))
+        self.assertTrue(self.storage.exists(self.name))
+
+
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        from PIL import Image
+
+        self.media = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media.name, CHART_DERIVATIVES_ASYNC=False)
+        self.settings_override.enable()
+        user = get_user_model().objects.create_user('trader', password='pw')
+        self.trade = Trade.objects.create(user=user, ticker='AAPL', quantity=1, buy_price=1,
+                                          buy_date=datetime.date(2024, 1, 2))
+        buf = io.BytesIO()
+        Image.new('RGB', (400, 200), 'white').save(buf, 'PNG')
+        self.png = buf.getvalue()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.media.cleanup()
+
+    def add_chart(self, filename):
+        return TradeChart.objects.create(trade=self.trade, image=ContentFile(self.png, name=filename))
+
+    def test_identical_uploads_share_one_blob_until_last_reference_goes(self):
+        first, second = self.add_chart('buy.png'), self.add_chart('sell.png')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertTrue(storage.is_blob(first.image.name))
+        self.assertTrue(second.derivatives_ready)
+        self.assertEqual(len(list(storage.walk_files(storage.chart_storage, 'trade_charts'))), 5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(storage.chart_storage.exists(second.image.name))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        # unreferenced but young: left for the garbage collector
+        self.assertTrue(storage.chart_storage.exists(second.image.name))
+        storage.collect_garbage(min_age=datetime.timedelta(0))
+        self.assertEqual(list(storage.walk_files(storage.chart_storage, 'trade_charts')), [])
+
+    def test_reupload_protects_an_old_blob_from_a_racing_release(self):
+        old = self.add_chart('buy.png')
+        name = old.image.name
+        week_ago = time.time() - 7 * 24 * 3600
+        os.utime(storage.chart_storage.path(name), (week_ago, week_ago))
+        old.delete()  # its release runs only on commit, below
+        # the same bytes are uploaded again; the new row isn't committed yet
+        self.assertEqual(storage.chart_storage.save('trade_charts/again.png', ContentFile(self.png)), name)
+        self.assertFalse(storage.release_blob(name))
+        self.assertTrue(storage.chart_storage.exists(name))
+
+    def test_concurrent_first_uploads_store_one_blob(self):
+        first = storage.chart_storage.save('trade_charts/buy.png', ContentFile(self.png))
+        # the second upload checked before the first one had written the blob
+        exists = storage.chart_storage.exists
+        racing = mock.Mock(side_effect=lambda name: racing.call_count > 1 and exists(name))
+        with mock.patch.object(storage.chart_storage, 'exists', racing):
+            second = storage.chart_storage.save('trade_charts/sell.png', ContentFile(self.png))
+        self.assertEqual(second, first)
+        self.assertEqual(list(storage.walk_files(storage.chart_storage, 'trade_charts')), [first])
+
+    def test_garbage_collection_removes_only_unreferenced_files(self):
+        chart = self.add_chart('buy.png')
+        orphan = storage.chart_storage.save('trade_charts/other.png', ContentFile(b'not referenced'))
+        stats = storage.collect_garbage(min_age=datetime.timedelta(0))
+        self.assertEqual((stats['deleted'], stats['referenced']), (1, 1))
+        self.assertFalse(storage.chart_storage.exists(orphan))
+        self.assertTrue(storage.chart_storage.exists(chart.image.name))
+
+
+class PriceHistoryStoreTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(root=self.dir.name)
+        self.provider = FixtureProvider(prices={'AAPL': 100})
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_sync_appends_only_missing_bars(self):
+        with override_settings(PRICE_HISTORY_START='2024-01-01'):
+            first = sync_history(['AAPL'], store=self.store, provider=self.provider, until=datetime.date(2024, 1, 31))
+            again = sync_history(['AAPL'], store=self.store, provider=self.provider, until=datetime.date(2024, 1, 31))
+            more = sync_history(['AAPL'], store=self.store, provider=self.provider, until=datetime.date(2024, 2, 9))
+        self.assertEqual((first['AAPL'], again['AAPL'], more['AAPL']), (23, 0, 7))
+        self.assertEqual(self.store.last_date('AAPL'), datetime.date(2024, 2, 9))
+
+        bars = self.store.read('AAPL', datetime.date(2024, 1, 29), datetime.date(2024, 2, 2))
+        self.assertEqual([d.item() for d in bars['date']],
+                         [datetime.date(2024, 1, d) for d in (29, 30, 31)] + [datetime.date(2024, 2, d) for d in (1, 2)])
+        whole = self.provider.get_history('AAPL', datetime.date(2024, 1, 1), datetime.date(2024, 2, 9))
+        self.assertEqual(list(self.store.read('AAPL')['close']), [bar[4] for bar in whole])
+
+    def test_default_sync_stops_before_today_and_torn_records_are_skipped(self):
+        yesterday = datetime.date.today() - datetime.timedelta(days=1)
+        with override_settings(PRICE_HISTORY_START=(yesterday - datetime.timedelta(days=6)).isoformat()):
+            sync_history(['AAPL'], store=self.store, provider=self.provider)
+        self.assertLessEqual(self.store.last_date('AAPL'), yesterday)
+
+        count = len(self.store.read('AAPL'))
+        with open(self.store.path('AAPL'), 'ab') as fh:
+            fh.write(b'\0' * 10)  # interrupted append
+        self.assertEqual(len(self.store.read('AAPL')), count)
+        self.store.append('AAPL', [(datetime.date.today() + datetime.timedelta(days=1), 1, 1, 1, 5, 0)])
+        self.assertEqual(list(self.store.read('AAPL')['close'][-1:]), [5])
+        self.assertEqual(os.path.getsize(self.store.path('AAPL')) % self.store.bars('AAPL').itemsize, 0)
+
+    def test_fixture_loader(self):
+        path = f"{self.dir.name}/bars.csv"
+        with open(path, 'w') as fh:
+            fh.write("ticker,date,open,high,low,close,volume\n"
+                     "msft,2024-01-03,10,11,9,10.5,1000\n"
+                     "MSFT,2024-01-02,9,10,8,9.5,900\n")
+        self.assertEqual(load_fixture(path, store=self.store), {'MSFT': 2})
+        self.assertEqual(list(self.store.read('MSFT')['close']), [9.5, 10.5])
+        self.assertEqual(load_fixture(path, store=self.store), {'MSFT': 0})
+
+
+class CandlestickRenderTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(PRICE_HISTORY_DIR=f"{self.dir.name}/history",
+                                                   CHART_RENDER_DIR=f"{self.dir.name}/renders")
+        self.settings_override.enable()
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+        self.client.force_login(self.user)
+        self.trade = Trade.objects.create(user=self.user, ticker='aapl', quantity=1, buy_price=100,
+                                          buy_date=datetime.date(2024, 3, 1), is_closed=True, sell_price=110,
+                                          sell_date=datetime.date(2024, 4, 30))
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.dir.cleanup()
+
+    def test_no_history_is_404(self):
+        response = self.client.get(reverse('trade_candles', args=[self.trade.id]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_renders_once_then_serves_cached_png(self):
+        sync_history(['AAPL'], store=HistoryStore(), provider=FixtureProvider(), until=datetime.date(2024, 5, 31))
+        response = self.client.get(reverse('trade_candles', args=[self.trade.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content)[:8], b'\x89PNG\r\n\x1a\n')
+
+        path = render_trade_chart(self.trade)
+        mtime = datetime.datetime.fromtimestamp(os.path.getmtime(path))
+        self.assertEqual(render_trade_chart(self.trade), path)
+        self.assertEqual(datetime.datetime.fromtimestamp(os.path.getmtime(path)), mtime)
+
+    def test_rerenders_when_history_catches_up(self):
+        store = HistoryStore()
+        sync_history(['AAPL'], store=store, provider=FixtureProvider(), until=datetime.date(2024, 4, 15))
+        partial = render_trade_chart(self.trade)
+        sync_history(['AAPL'], store=store, provider=FixtureProvider(), until=datetime.date(2024, 5, 31))
+        full = render_trade_chart(self.trade)
+        self.assertNotEqual(full, partial)
+        self.assertTrue(os.path.exists(full))
+
+
+class AnalyticsTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+        # P&L: +100 (Jan 10), -50 (Jan 20), -80 (Feb 1), +200 (Feb 1)
+        for sell, sell_date, reason in ((110, (1, 10), 'RES'), (95, (1, 20), 'SL'),
+                                        (92, (2, 1), 'SL'), (120, (2, 1), 'MAN')):
+            Trade.objects.create(user=self.user, ticker='AAPL', quantity=10, buy_price=100,
+                                 buy_date=datetime.date(2024, 1, 2), is_closed=True, sell_price=sell,
+                                 sell_date=datetime.date(2024, *sell_date), exit_reason=reason)
+
+    def test_metrics(self):
+        with self.assertNumQueries(1):
+            columns = load_closed(self.user)
+        result = analyze(columns, risk_pct=10)
+        self.assertEqual((result['count'], result['wins'], result['losses']), (4, 2, 2))
+        self.assertEqual(result['total'], 170.0)
+        self.assertEqual(result['expectancy'], 42.5)
+        self.assertEqual(result['profit_factor'], round(300 / 130, 2))
+        self.assertEqual(result['equity_curve'], [['2024-01-10', 100.0], ['2024-01-20', 50.0], ['2024-02-01', 170.0]])
+        self.assertEqual(result['max_drawdown']['amount'], 50.0)
+        self.assertEqual(result['max_drawdown']['pct'], 50.0)
+        self.assertEqual(result['r_multiples']['mean'], round((1 - 0.5 - 0.8 + 2) / 4, 2))
+        sl = next(row for row in result['by_exit_reason'] if row['exit_reason'] == 'SL')
+        self.assertEqual((sl['count'], sl['total'], sl['win_rate']), (2, -130.0, 0.0))
+
+    def test_reports_page_loads_analytics_on_demand(self):
+        # no sell_date (counts as sold on the buy date) and no exit reason (code 0)
+        Trade.objects.create(user=self.user, ticker='MSFT', quantity=1, buy_price=10,
+                             buy_date=datetime.date(2024, 3, 1), is_closed=True, sell_price=12)
+        columns = load_closed(self.user)
+        self.assertEqual(sorted(zip(columns['exit_code'].tolist(), columns['sell_date'].astype(str))),
+                         [(0, '2024-03-01'), (1, '2024-01-20'), (1, '2024-02-01'), (2, '2024-01-10'), (5, '2024-02-01')])
+        self.client.force_login(self.user)
+        page = self.client.get(reverse('reports'))
+        self.assertNotIn('analytics', page.context)
+        self.assertContains(page, reverse('reports_analytics'))
+        panel = self.client.get(reverse('reports_analytics'))
+        self.assertContains(panel, 'Profit Factor')
+        self.assertEqual(panel.context['analytics']['count'], 5)
+
+    def test_api_and_empty_history(self):
+        self.client.force_login(get_user_model().objects.create_user('empty', password='pw'))
+        data = self.client.get(reverse('analytics_api')).json()
+        self.assertEqual(data['count'], 0)
+        self.assertIsNone(data['expectancy'])
+        self.assertEqual(data['equity_curve'], [])
+
+
+class NavSnapshotTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.store = HistoryStore(root=self.dir.name)
+        self.store.append('AAPL', [(datetime.date(2024, 1, d), 1, 1, 1, close, 0)
+                                   for d, close in ((1, 100), (2, 110), (3, 120), (4, 130), (5, 140))])
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+        self.trade = Trade.objects.create(user=self.user, ticker='aapl', quantity=10, buy_price=100,
+                                          buy_date=datetime.date(2024, 1, 2))
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def series(self):
+        return [(s.date.day, float(s.market_value), float(s.realized_pnl))
+                for s in DailyPortfolioSnapshot.objects.filter(user=self.user)]
+
+    def test_incremental_snapshots_and_invalidation(self):
+        self.assertEqual(update_snapshots(self.user, until=datetime.date(2024, 1, 3), store=self.store), 2)
+        self.assertEqual(update_snapshots(self.user, until=datetime.date(2024, 1, 3), store=self.store), 0)
+        # Jan 6/7 is a weekend: only Jan 4 and 5 are added, carrying the last close
+        self.assertEqual(update_snapshots(self.user, until=datetime.date(2024, 1, 7), store=self.store), 2)
+        self.assertEqual(self.series(), [(2, 1100, 0), (3, 1200, 0), (4, 1300, 0), (5, 1400, 0)])
+
+        self.trade.is_closed, self.trade.sell_price, self.trade.sell_date = True, 125, datetime.date(2024, 1, 4)
+        self.trade.save()
+        self.assertEqual([day for day, _, _ in self.series()], [2, 3])
+        update_snapshots(self.user, until=datetime.date(2024, 1, 7), store=self.store)
+        self.assertEqual(self.series(), [(2, 1100, 0), (3, 1200, 0), (4, 0, 250), (5, 0, 250)])
+
+    def test_partial_days_are_recomputed_when_history_arrives(self):
+        Trade.objects.create(user=self.user, ticker='MSFT', quantity=1, buy_price=50,
+                             buy_date=datetime.date(2024, 1, 3))
+        self.store.append('MSFT', [(datetime.date(2024, 1, 3), 1, 1, 1, 60, 0)])
+        update_snapshots(self.user, until=datetime.date(2024, 1, 5), store=self.store)
+        # Jan 4/5: MSFT's history stops at Jan 3, so its close is carried forward and the days are partial
+        self.assertEqual([(s.date.day, s.partial) for s in DailyPortfolioSnapshot.objects.filter(user=self.user)],
+                         [(2, False), (3, False), (4, True), (5, True)])
+
+        self.store.append('MSFT', [(datetime.date(2024, 1, 4), 1, 1, 1, 70, 0),
+                                   (datetime.date(2024, 1, 5), 1, 1, 1, 80, 0)])
+        self.assertEqual(update_snapshots(self.user, until=datetime.date(2024, 1, 5), store=self.store), 2)
+        self.assertEqual([(day, value) for day, value, _ in self.series()],
+                         [(2, 1100), (3, 1260), (4, 1370), (5, 1480)])
+        self.assertFalse(DailyPortfolioSnapshot.objects.filter(user=self.user, partial=True).exists())
+
+    def test_range_api(self):
+        self.client.force_login(self.user)
+        update_snapshots(self.user, until=datetime.date(2024, 1, 5), store=self.store)
+        data = self.client.get(reverse('portfolio_nav_api'), {'start': '2024-01-03', 'end': '2024-01-04'}).json()
+        self.assertEqual([(p['date'], p['value'], p['unrealized']) for p in data['points']],
+                         [('2024-01-03', 1200.0, 200.0), ('2024-01-04', 1300.0, 300.0)])
+
+
+class IndicatorTests(TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(PRICE_HISTORY_DIR=self.dir.name, INDICATOR_BENCHMARK='BENCH')
+        self.settings_override.enable()
+        self.store = HistoryStore()
+        days = [d for d in (datetime.date(2022, 1, 3) + datetime.timedelta(days=i) for i in range(800))
+                if d.weekday() < 5]
+        # steadily rising stock at exactly twice the benchmark; volume triples in the last week
+        stock = [(d, 0, 0, 0, 10 + i * 0.1, 3000 if d >= datetime.date(2024, 3, 4) else 1000) for i, d in enumerate(days)]
+        bench = [(d, 0, 0, 0, (10 + i * 0.1) / 2, 0) for i, d in enumerate(days)]
+        self.store.append('ACME', stock)
+        self.store.append('BENCH', bench)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.dir.cleanup()
+
+    def test_weekly_indicators(self):
+        values = indicators_at('acme', datetime.date(2024, 3, 9))  # Saturday: week ending Fri Mar 8
+        self.assertEqual(values['week_end'], '2024-03-08')
+        self.assertEqual(values['ema30_trend'], 'rising')
+        self.assertTrue(values['above_ema30'])
+        self.assertEqual(values['mansfield_rs'], 0.0)
+        self.assertEqual(values['volume_ratio'], 3.0)
+        # mid-week dates use the previous complete week (no look-ahead)
+        self.assertEqual(indicators_at('ACME', datetime.date(2024, 3, 7))['week_end'], '2024-03-01')
+
+    def test_incomplete_weeks(self):
+        # a Friday that is today is still trading: use the week before
+        self.assertEqual(str(week_of(datetime.date(2024, 3, 8), today=datetime.date(2024, 3, 8))), '2024-03-01')
+        self.assertEqual(str(week_of(datetime.date(2024, 3, 8), today=datetime.date(2024, 3, 9))), '2024-03-08')
+
+        # the history stops mid-week: the value is cached with a TTL only
+        self.store.append('PART', [(datetime.date(2024, 3, d), 0, 0, 0, 10, 0) for d in (4, 5, 6)])
+        with mock.patch('trades.indicators.cache.set_many') as set_many:
+            self.assertEqual(indicators_at('PART', datetime.date(2024, 3, 9))['week_end'], '2024-03-08')
+        self.assertEqual(set_many.call_args.kwargs['timeout'], 900)
+
+    def test_same_week_shares_one_result(self):
+        many = indicators_many([('ACME', datetime.date(2024, 1, 15)), ('acme', datetime.date(2024, 1, 17))])
+        first, second = many.values()
+        self.assertIs(first, second)
+
+    def test_add_trade_snapshots_buy_indicators(self):
+        user = get_user_model().objects.create_user('trader', password='pw')
+        self.client.force_login(user)
+        self.client.post(reverse('add_trade'), {'ticker': 'ACME', 'quantity': 1, 'buy_price': 80,
+                                                'buy_date': '2024-03-11'})
+        trade = Trade.objects.get(user=user)
+        self.assertEqual(trade.indicators_json['buy']['week_end'], '2024-03-08')
+
+
+class RulesEvaluationTests(TestCase):
+    CHECKLIST = (
+        "[x] Above 30w EMA: Yes\n"
+        "2025-09-06 — 30w EMA not falling\n"
+        "Mansfield: Positive\n"
+        "price_vs_ema30_pct < 15\n"
+        "Sector looks strong\n"
+    )
+
+    def test_compile(self):
+        rules = compile_rules(self.CHECKLIST)
+        self.assertEqual([(r.field, r.op) for r in rules],
+                         [('above_ema30', '=='), ('ema30_trend', 'in'), ('mansfield_rs', '>'),
+                          ('price_vs_ema30_pct', '<')])
+        self.assertEqual(rules[1].value, {'rising', 'flat'})
+
+    def test_violations_for_all_users_in_one_pass(self):
+        user = get_user_model().objects.create_user('trader', password='pw')
+        Rules.objects.create(user=user, content=self.CHECKLIST)
+        healthy = {'above_ema30': True, 'ema30_trend': 'rising', 'mansfield_rs': 3.1, 'price_vs_ema30_pct': 8}
+        broken = {'above_ema30': False, 'ema30_trend': 'falling', 'mansfield_rs': None, 'price_vs_ema30_pct': 22}
+        for ticker, ind in (('GOOD', healthy), ('BAD', broken)):
+            Trade.objects.create(user=user, ticker=ticker, quantity=1, buy_price=1, buy_date=datetime.date(2024, 1, 2),
+                                 indicators_json={'buy': healthy, 'current': ind})
+        with self.assertNumQueries(2):
+            results = violations_by_user()
+        [row] = results[user.pk]
+        self.assertEqual(row['ticker'], 'BAD')
+        # mansfield_rs is unknown, so that rule is not counted as broken
+        self.assertEqual([v['field'] for v in row['violations']],
+                         ['above_ema30', 'ema30_trend', 'price_vs_ema30_pct'])
+
+        self.client.force_login(user)
+        self.assertContains(self.client.get(reverse('dashboard')), 'Rule Violations')
+
+
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+        self.other = get_user_model().objects.create_user('other', password='pw')
+
+    def _trade(self, user, ticker, **kwargs):
+        return Trade.objects.create(user=user, ticker=ticker, quantity=1, buy_price=10, sell_price=12,
+                                    buy_date=datetime.date(2024, 1, 2), sell_date=datetime.date(2024, 2, 1),
+                                    is_closed=True, **kwargs)
+
+    def test_index_follows_saves_and_results_are_ranked(self):
+        weak = self._trade(self.user, 'AAA', buy_notes="breakout on earnings")
+        strong = self._trade(self.user, 'BBB', buy_notes="clean breakout", sell_notes="breakout failed, volume dried up")
+        self._trade(self.other, 'CCC', buy_notes="breakout")
+        self.assertEqual(search_trade_ids('breakout', user=self.user), [strong.pk, weak.pk])
+        # prefix + stemming, every word must match
+        self.assertEqual(search_trade_ids('break vol', user=self.user), [strong.pk])
+
+        weak.sell_notes = "sector weakness"
+        weak.save()
+        self.assertEqual(search_trade_ids('weak', user=self.user), [weak.pk])
+        TradeChart.objects.create(trade=strong, caption="cup with handle")
+        self.assertEqual(search_trade_ids('handle', user=self.user), [strong.pk])
+        strong.delete()
+        self.assertEqual(search_trade_ids('breakout', user=self.user), [weak.pk])
+
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('trade_list'), {'text': 'sector'})
+        self.assertEqual([t.pk for t in response.context['closed_trades']], [weak.pk])
+
+    def test_capped_results_are_announced(self):
+        for ticker in ('AAA', 'BBB'):
+            self._trade(self.user, ticker, buy_notes="breakout")
+        self.client.force_login(self.user)
+        with override_settings(SEARCH_MAX_RESULTS=1):
+            response = self.client.get(reverse('trade_list'), {'text': 'breakout'})
+        self.assertTrue(response.context['search_capped'])
+        self.assertContains(response, "Only the 1 best matches")
+        cache.clear()
+        self.assertFalse(self.client.get(reverse('trade_list'), {'text': 'breakout'}).context['search_capped'])
+
+    @skipIf(connection.vendor != 'sqlite', "FTS5 backfill")
+    def test_migration_backfills_the_index(self):
+        migration = importlib.import_module('trades.migrations.0008_trade_search_index')
+        trade = self._trade(self.user, 'AAA', sell_notes="gap down")
+        TradeChart.objects.create(trade=trade, caption="wedge")
+        with connection.cursor() as cursor:
+            # the SQLite schema editor refuses to open inside the test transaction
+            editor = mock.Mock(connection=connection, execute=cursor.execute)
+            migration.drop_search_index(None, editor)
+            migration.create_search_index(None, editor)
+        self.assertEqual(search_trade_ids('gap wedge', user=self.user), [trade.pk])
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+        day = datetime.date(2024, 1, 1)
+        # pairs of trades share a sell date; one closed trade has none
+        for i in range(7):
+            Trade.objects.create(user=self.user, ticker=f"T{i}", quantity=1, buy_price=10, sell_price=11,
+                                 buy_date=day, sell_date=day + datetime.timedelta(days=i // 2) if i else None,
+                                 is_closed=True)
+        self.qs = Trade.objects.filter(user=self.user, is_closed=True)
+        self.ordering = ('-sell_date', '-id')
+        self.expected = list(self.qs.order_by(*self.ordering))
+
+    def test_walks_forward_and_back_without_gaps(self):
+        seen, token, pages = [], None, []
+        while True:
+            with self.assertNumQueries(1):
+                page = keyset_page(self.qs, self.ordering, 'sell_date', token, per_page=3)
+            pages.append(page)
+            seen += list(page)
+            if not page.has_next:
+                break
+            token = page.next_cursor
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(p) for p in pages], [3, 3, 1])
+        self.assertFalse(pages[0].has_previous)
+
+        back = keyset_page(self.qs, self.ordering, 'sell_date', pages[2].prev_cursor, per_page=3)
+        self.assertEqual(list(back), list(pages[1]))
+        first = keyset_page(self.qs, self.ordering, 'sell_date', back.prev_cursor, per_page=3)
+        self.assertEqual(list(first), list(pages[0]))
+        self.assertFalse(first.has_previous)
+
+    def test_foreign_or_tampered_cursors_start_over(self):
+        token = keyset_page(self.qs, self.ordering, 'sell_date', per_page=3).next_cursor
+        for bad in (token[:-2] + 'xx', token):
+            page = keyset_page(self.qs, ('pnl', 'id'), 'pnl', bad, per_page=3)
+            self.assertFalse(page.has_previous)
+
+    def test_trade_list_cursor_links(self):
+        for i in range(5):
+            Trade.objects.create(user=self.user, ticker=f"U{i}", quantity=1, buy_price=10, sell_price=11,
+                                 buy_date=datetime.date(2023, 1, 2), sell_date=datetime.date(2023, 6, 1),
+                                 is_closed=True)
+        expected = list(self.qs.order_by(*self.ordering))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('trade_list'), {'count': '1'})
+        self.assertEqual(response.context['closed_count'], (12, True))
+        self.assertIsNone(response.context['closed_prev_url'])
+        response = self.client.get(reverse('trade_list') + response.context['closed_next_url'])
+        self.assertEqual(list(response.context['closed_trades']), expected[10:])
+        self.assertIsNone(response.context['closed_next_url'])
+
+
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        caching.reset_stats()
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+        self.trade = Trade.objects.create(user=self.user, ticker='AAA', quantity=1, buy_price=10, sell_price=12,
+                                          buy_date=datetime.date(2024, 1, 2), sell_date=datetime.date(2024, 2, 1),
+                                          is_closed=True)
+        self.client.force_login(self.user)
+
+    def test_trade_list_and_reports_are_served_until_a_write(self):
+        for name in ('trade_list', 'reports'):
+            self.client.get(reverse(name))
+            with CaptureQueriesContext(connection) as warm:
+                self.client.get(reverse(name))
+            # only the ETag aggregate touches the trades table
+            trade_queries = [q for q in warm.captured_queries
+                             if 'trades_trade' in q['sql'] and 'COUNT(' not in q['sql']]
+            self.assertEqual(trade_queries, [], name)
+        self.assertEqual(caching.cache_stats()['trade_list'], {'hit': 1, 'miss': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Trade.objects.create(user=self.user, ticker='BBB', quantity=1, buy_price=10,
+                                 buy_date=datetime.date(2024, 3, 1))
+        response = self.client.get(reverse('trade_list'))
+        self.assertEqual([t.ticker for t in response.context['open_trades']], ['BBB'])
+        self.assertEqual(caching.cache_stats()['trade_list'], {'hit': 1, 'miss': 2})
+
+    def test_write_in_another_worker_invalidates(self):
+        self.client.get(reverse('trade_list'))
+        # another process with its own LocMemCache adds a trade
+        with mock.patch('trades.caching.cache', LocMemCache('other-worker', {})):
+            with self.captureOnCommitCallbacks(execute=True):
+                Trade.objects.create(user=self.user, ticker='BBB', quantity=1, buy_price=10,
+                                     buy_date=datetime.date(2024, 3, 1))
+        response = self.client.get(reverse('trade_list'))
+        self.assertEqual([t.ticker for t in response.context['open_trades']], ['BBB'])
+
+    def test_generation_is_per_user(self):
+        other = get_user_model().objects.create_user('other', password='pw')
+        before = caching.generation(other.pk)
+        self.trade.save()
+        self.assertEqual(caching.generation(other.pk), before)
+        mine = caching.generation(self.user.pk)
+        Rules.objects.create(user=self.user, content="Mansfield: Positive")
+        self.assertGreater(caching.generation(self.user.pk), mine)
+
+
+@override_settings(PRICE_SNAPSHOT_FALLBACK=False)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+        Trade.objects.create(user=self.user, ticker='AAA', quantity=1, buy_price=10,
+                             buy_date=datetime.date(2024, 1, 2))
+        self.client.force_login(self.user)
+
+    def test_unchanged_polls_get_304(self):
+        for name in ('portfolio_value_api', 'reports'):
+            first = self.client.get(reverse(name))
+            self.assertEqual(first.status_code, 200)
+            etag = first['ETag']
+            with CaptureQueriesContext(connection) as ctx:
+                again = self.client.get(reverse(name), HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(again.status_code, 304, name)
+            self.assertEqual(again.content, b'')
+            # session + user lookups, then the ETag aggregates only
+            self.assertLessEqual(len(ctx.captured_queries), 4, name)
+
+        etag = self.client.get(reverse('portfolio_value_api'))['ETag']
+        Trade.objects.create(user=self.user, ticker='BBB', quantity=1, buy_price=10,
+                             buy_date=datetime.date(2024, 1, 3))
+        changed = self.client.get(reverse('portfolio_value_api'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], etag)
+
+
+class RestApiTests(TestCase):
+    def setUp(self):
+        from rest_framework.authtoken.models import Token
+        from rest_framework.test import APIClient
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+        self.client = APIClient(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}")
+
+    def make_trades(self, n, start=0):
+        for i in range(start, start + n):
+            trade = Trade.objects.create(user=self.user, ticker=f"T{i}", quantity=1, buy_price=10,
+                                         buy_date=datetime.date(2024, 1, 1) + datetime.timedelta(days=i),
+                                         buy_notes="x" * 200)
+            TradeChart.objects.create(trade=trade, image=f"trade_charts/{i}.png", caption=f"chart {i}")
+
+    def test_list_has_fixed_query_count(self):
+        url = '/api/v1/trades/?status=open&page_size=5'
+        self.make_trades(2)
+        # token lookup (with user), page, charts prefetch
+        with self.assertNumQueries(3):
+            first = self.client.get(url).json()
+        self.make_trades(10, start=2)
+        with self.assertNumQueries(3):
+            page = self.client.get(url).json()
+        self.assertEqual([t['ticker'] for t in page['results']], ['T11', 'T10', 'T9', 'T8', 'T7'])
+        self.assertEqual(len(page['results'][0]['charts']), 1)
+        self.assertIsNone(page['previous'])
+        with self.assertNumQueries(3):
+            page = self.client.get(page['next']).json()
+        self.assertEqual(page['results'][0]['ticker'], 'T6')
+        self.assertEqual(len(first['results']), 2)
+
+    def test_sparse_fields_skip_charts_and_gzip(self):
+        self.make_trades(3)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/trades/?fields=id,ticker,pnl')
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'ticker', 'pnl'})
+        response = self.client.get('/api/v1/trades/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_bulk_create_is_all_or_nothing(self):
+        rows = [
+            {'ticker': 'AAA', 'quantity': '2', 'buy_price': '10', 'buy_date': '2024-01-02'},
+            {'ticker': 'BBB', 'quantity': '1', 'buy_price': '20', 'buy_date': '2024-01-02',
+             'sell_price': '25', 'sell_date': '2024-02-01', 'exit_reason': 'RES'},
+        ]
+        bad = rows + [{'ticker': 'CCC', 'quantity': 'x', 'buy_price': '1', 'buy_date': '2024-01-02'}]
+        response = self.client.post('/api/v1/trades/bulk/', bad, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][:2], [{}, {}])
+        self.assertFalse(Trade.objects.exists())
+
+        response = self.client.post('/api/v1/trades/bulk/', rows, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.user.trade_stats.total_closed, 1)
+        self.assertEqual(Trade.objects.get(ticker='BBB').pnl, Decimal('5.0000'))
+
+    def test_bulk_close(self):
+        self.make_trades(3)
+        ids = list(Trade.objects.order_by('id').values_list('id', flat=True))
+        response = self.client.post('/api/v1/trades/bulk-close/', [
+            {'id': ids[0], 'sell_price': '12', 'sell_date': '2024-03-01', 'exit_reason': 'SL'},
+            {'id': ids[1], 'sell_price': '8', 'sell_date': '2023-01-01'},
+        ], format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Trade.objects.filter(is_closed=True).exists())
+
+        response = self.client.post('/api/v1/trades/bulk-close/', [
+            {'id': ids[0], 'sell_price': '12', 'sell_date': '2024-03-01', 'exit_reason': 'SL'},
+            {'id': ids[1], 'sell_price': '8', 'sell_date': '2024-03-01', 'sell_notes': 'gap down'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual([t['pnl'] for t in response.json()], ['2.0000', '-2.0000'])
+        stats = self.client.get('/api/v1/stats/').json()
+        self.assertEqual((stats['total_closed'], stats['wins'], stats['losses']), (2, 1, 1))
+        self.assertEqual(search_trade_ids('gap', user=self.user), [ids[1]])
+
+
+class PositionTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('trader', password='pw')
+
+    def buy(self, ticker, qty, price, day):
+        return Trade.objects.create(user=self.user, ticker=ticker, quantity=qty, buy_price=price,
+                                    buy_date=datetime.date(2024, 1, day))
+
+    def test_rows_follow_every_trade_write(self):
+        first = self.buy('aapl', 10, 100, 5)
+        second = self.buy('AAPL', 30, 120, 2)
+        self.buy('MSFT', 1, 300, 3)
+        row = Position.objects.get(user=self.user, ticker='AAPL')
+        self.assertEqual((row.total_qty, row.lots, row.oldest_buy_date), (Decimal('40'), 2, datetime.date(2024, 1, 2)))
+        self.assertEqual(row.avg_price, Decimal('115'))
+        self.assertEqual(row.first_trade_id, first.pk)
+
+        second.is_closed, second.sell_price, second.sell_date = True, 130, datetime.date(2024, 2, 1)
+        second.save()
+        row.refresh_from_db()
+        self.assertEqual((row.total_qty, row.lots, row.oldest_buy_date), (Decimal('10'), 1, datetime.date(2024, 1, 5)))
+
+        first.quantity = 5
+        first.save()
+        self.assertEqual(verify_positions(), [])
+        first.delete()
+        self.assertFalse(Position.objects.filter(ticker='AAPL').exists())
+
+        import_trades(self.user, io.BytesIO(b"ticker,quantity,buy_price,buy_date\nMSFT,3,310,2024-01-04\n"))
+        self.assertEqual(verify_positions(), [])
+        with self.assertNumQueries(1):
+            [msft] = load_positions(self.user)
+        self.assertEqual((msft['ticker'], msft['quantity'], msft['buy_date']), ('MSFT', 4.0, '2024-01-03'))
+
+    def test_verify_and_rebuild(self):
+        self.buy('AAA', 2, 10, 2)
+        Position.objects.filter(ticker='AAA').update(total_qty=7)
+        [(_, ticker, diff)] = verify_positions()
+        self.assertEqual((ticker, list(diff)), ('AAA', ['total_qty']))
+        rebuild_positions()
+        self.assertEqual(verify_positions(), [])
+
+
+    def test_changing_owner_moves_the_lot(self):
+        other = get_user_model().objects.create_user('other', password='pw')
+        trade = self.buy('AAPL', 10, 100, 5)
+        self.buy('AAPL', 5, 90, 6)
+        trade.user = other
+        trade.save()
+        self.assertEqual(verify_positions(), [])
+        mine, theirs = (Position.objects.get(user=u, ticker='AAPL') for u in (self.user, other))
+        self.assertEqual((mine.total_qty, theirs.total_qty), (Decimal('5'), Decimal('10')))
+
+    def test_add_trade_rolls_back_with_its_position_update(self):
+        self.client.force_login(self.user)
+        data = {'ticker': 'AAPL', 'quantity': 1, 'buy_price': 10, 'buy_date': '2024-01-02'}
+        with mock.patch('trades.signals.apply_lots', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse('add_trade'), data)
+        self.assertFalse(Trade.objects.exists())
+
+class TunedSQLiteTests(TestCase):
+    def test_pragmas_and_immediate_transactions(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            params = copy.deepcopy(connections.settings['default'])
+            params.update(ENGINE='trades.backends.sqlite3', NAME=os.path.join(tmp, 'tuned.sqlite3'))
+            tuned = TunedSQLiteWrapper(params, alias='tuned')
+            try:
+                with tuned.cursor() as cursor:
+                    cursor.execute("PRAGMA journal_mode")
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+                    cursor.execute("PRAGMA synchronous")
+                    self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+                    cursor.execute("PRAGMA busy_timeout")
+                    self.assertEqual(cursor.fetchone()[0], 5000)
+                # a transaction holds the write lock from its start, before any write
+                tuned._start_transaction_under_autocommit()
+                other = sqlite3.connect(params['NAME'], timeout=0, isolation_level=None)
+                with self.assertRaises(sqlite3.OperationalError):
+                    other.execute("BEGIN IMMEDIATE")
+                other.close()
+            finally:
+                tuned.close()
+
+    @override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234})
+    def test_settings_override_single_pragmas(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            params = copy.deepcopy(connections.settings['default'])
+            params.update(ENGINE='trades.backends.sqlite3', NAME=os.path.join(tmp, 'tuned.sqlite3'))
+            tuned = TunedSQLiteWrapper(params, alias='tuned')
+            try:
+                with tuned.cursor() as cursor:
+                    cursor.execute("PRAGMA busy_timeout")
+                    self.assertEqual(cursor.fetchone()[0], 1234)
+                    cursor.execute("PRAGMA journal_mode")
+                    self.assertEqual(cursor.fetchone()[0], 'wal')
+            finally:
+                tuned.close()
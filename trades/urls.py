@@ -5,17 +5,24 @@ from django.contrib.auth import views as auth_views
 
 urlpatterns = [
     path('add/', views.add_trade, name='add_trade'),
+    path('import/', views.import_trades_view, name='import_trades'),
     path('<int:trade_id>/close/', views.close_trade, name='close_trade'),
     path('<int:trade_id>/', views.trade_detail, name='trade_detail'),
+    path('<int:trade_id>/candles.png', views.trade_candles, name='trade_candles'),
     path('', views.trade_list, name='trade_list'),
 
     # dashboard + API
     path('dashboard/', views.dashboard, name='dashboard'),
     path('api/portfolio/value/', views.portfolio_value_api, name='portfolio_value_api'),
+    path('api/portfolio/stream/', views.portfolio_stream, name='portfolio_stream'),
+    path('api/portfolio/nav/', views.portfolio_nav_api, name='portfolio_nav_api'),
 
     # reports
     path('reports/', views.reports, name='reports'),
+    path('reports/analytics/', views.reports_analytics, name='reports_analytics'),
+    path('api/analytics/', views.analytics_api, name='analytics_api'),
     path('reports/export/csv/', views.export_closed_csv, name='export_closed_csv'),
+    path('reports/export/parquet/', views.export_closed_parquet, name='export_closed_parquet'),
 
     # rules
     path('rules/', views.rules_page, name='rules_page'),
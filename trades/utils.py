@@ -1,10 +1,36 @@
 # trades/utils.py
+"""
+Activity logging.
+
+log_activity() no longer INSERTs on every call. Entries are collected per
+request by ActivityLogMiddleware (or any `with activity_buffer():` block) and
+written with one bulk_create when the request finishes. Entries logged inside
+a transaction only reach the buffer once it commits.
+
+settings.ACTIVITY_LOG_MODE picks the writer:
+  - 'sync' (default): bulk_create in the request thread
+  - 'background': hand batches to a daemon thread via a bounded queue; on a full
+    queue entries are dropped (ACTIVITY_LOG_OVERFLOW='drop') or the caller waits up
+    to ACTIVITY_LOG_BLOCK_TIMEOUT seconds ('block'). The queue is flushed at exit.
+"""
+import atexit
+import contextlib
+import contextvars
+import queue
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
 from .models import ActivityLog
 
+_buffer = contextvars.ContextVar('activity_log_buffer', default=None)
+
 
 def log_activity(user, action, target=None, details=None):
     """
-    Create an ActivityLog entry.
+    Record an ActivityLog entry (written in bulk, see module docstring).
     - user: User object or None
     - action: short string summary e.g. "Added trade"
     - target: optional model instance (will store model name and pk)
@@ -20,10 +46,163 @@ def log_activity(user, action, target=None, details=None):
             target_type = str(type(target))
             target_id = str(target)
 
-    ActivityLog.objects.create(
+    entry = ActivityLog(
         user=getattr(user, 'pk', None) and user or None,
         action=action[:200],
         target_type=target_type,
         target_id=str(target_id) if target_id is not None else None,
         details=(details or '')[:2000]
     )
+    # runs immediately outside a transaction, after COMMIT inside one
+    transaction.on_commit(lambda: _dispatch(entry))
+
+
+def _dispatch(entry):
+    entries = _buffer.get()
+    if entries is not None:
+        entries.append(entry)
+    else:
+        get_writer().write([entry])
+
+
+@contextlib.contextmanager
+def activity_buffer():
+    """Collect log_activity() calls made inside the block and write them in one batch on exit."""
+    entries = []
+    token = _buffer.set(entries)
+    try:
+        yield entries
+    finally:
+        _buffer.reset(token)
+        if entries:
+            get_writer().write(entries)
+
+
+class ActivityLogMiddleware:
+    """Buffer a request's activity log entries and flush them once the response is built."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with activity_buffer():
+            return self.get_response(request)
+
+
+class WriterStats:
+    """stats Counter shared by request threads and the writer thread, so updates take a lock."""
+
+    def __init__(self):
+        self.stats = Counter()
+        self._stats_lock = threading.Lock()
+
+    def count(self, **deltas):
+        with self._stats_lock:
+            self.stats.update(deltas)
+
+    def stats_snapshot(self):
+        with self._stats_lock:
+            return dict(self.stats)
+
+
+class SyncActivityWriter(WriterStats):
+    def write(self, entries):
+        ActivityLog.objects.bulk_create(entries)
+        self.count(written=len(entries), flushes=1)
+
+
+class BackgroundActivityWriter(WriterStats):
+    """
+    Daemon thread that drains a bounded queue and bulk-inserts up to batch_size
+    entries at a time (or whatever arrived within flush_interval seconds).
+    stats: enqueued, written, flushes, dropped, blocked, failed.
+    """
+    _stop = object()
+
+    def __init__(self, maxsize=10000, batch_size=500, flush_interval=1.0, overflow='drop', block_timeout=0.5):
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.block_timeout = block_timeout
+        super().__init__()
+        self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, entries):
+        for entry in entries:
+            try:
+                self.queue.put_nowait(entry)
+            except queue.Full:
+                if self.overflow != 'block':
+                    self.count(dropped=1)
+                    continue
+                self.count(blocked=1)
+                try:
+                    self.queue.put(entry, timeout=self.block_timeout)
+                except queue.Full:
+                    self.count(dropped=1)
+                    continue
+            self.count(enqueued=1)
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        try:
+            ActivityLog.objects.bulk_create(batch)
+            self.count(written=len(batch), flushes=1)
+        except Exception:
+            self.count(failed=len(batch))
+            close_old_connections()
+
+    def _run(self):
+        batch = []
+        while True:
+            try:
+                item = self.queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self._flush(batch)
+                batch = []
+                continue
+            if item is self._stop:
+                self._flush(batch)
+                close_old_connections()
+                return
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+
+    def close(self, timeout=5.0):
+        """Flush everything queued so far and stop the thread (also runs at interpreter exit)."""
+        if self._thread.is_alive():
+            self.queue.put(self._stop)
+            self._thread.join(timeout)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                if getattr(settings, 'ACTIVITY_LOG_MODE', 'sync') == 'background':
+                    _writer = BackgroundActivityWriter(
+                        maxsize=getattr(settings, 'ACTIVITY_LOG_QUEUE_SIZE', 10000),
+                        batch_size=getattr(settings, 'ACTIVITY_LOG_BATCH_SIZE', 500),
+                        flush_interval=getattr(settings, 'ACTIVITY_LOG_FLUSH_INTERVAL', 1.0),
+                        overflow=getattr(settings, 'ACTIVITY_LOG_OVERFLOW', 'drop'),
+                        block_timeout=getattr(settings, 'ACTIVITY_LOG_BLOCK_TIMEOUT', 0.5),
+                    )
+                else:
+                    _writer = SyncActivityWriter()
+    return _writer
+
+
+def activity_log_stats():
+    """Counters of the active writer (written, flushes, and for background mode enqueued/dropped/blocked/failed)."""
+    return get_writer().stats_snapshot()
@@ -3,28 +3,43 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
-from django.db.models import F
-from .forms import TradeForm, ChartUploadForm, CloseTradeForm
-import csv
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse, Http404
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from .forms import TradeForm, ChartUploadForm, CloseTradeForm, ImportTradesForm
 import datetime
+import tempfile
+from concurrent.futures import TimeoutError as FutureTimeout
 # trades/views.py (replace the existing trade_list view)
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from django.db.models import Q
+from django.conf import settings
+from django.db.models import Case, IntegerField, Q, When
 from django.shortcuts import render
 from .models import Trade
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 import math
 from .utils import log_activity
+from .prices import snapshot_quotes
+from .portfolio import load_positions, maybe_round, value_positions
+from .streams import PortfolioStream
+from .stats import get_user_stats
+from .exports import closed_trade_rows, stream_csv, write_parquet, pa as parquet_pa
+from .importers import import_trades
+from .analytics import analyze, load_closed, svg_points
+from .candles import render_trade_chart
+from .history import get_store
+from .indicators import snapshot_indicators
+from .rules import user_violations
+from .nav import update_snapshots
+from .search import search_trade_ids
+from .pagination import approximate_count, keyset_page
+from .caching import bump_generation, cached_for_user
+from .etags import portfolio_etag, reports_etag
+from .models import DailyPortfolioSnapshot
 from django.contrib.auth.decorators import login_required
 
-# Optional: yfinance for live pricing. If not installed, the API will return last_price = None.
-try:
-    import yfinance as yf
-except Exception:
-    yf = None
-
 from .models import Trade, TradeChart, Rules
 from .forms import TradeForm, ChartUploadForm
 
@@ -37,13 +52,17 @@ def add_trade(request):
         if form.is_valid():
             trade = form.save(commit=False)
             trade.user = request.user
-            trade.save()
+            # the row and its Position update (post_save) commit together
+            with transaction.atomic():
+                trade.save()
+            snapshot_indicators(trade, 'buy')
             log_activity(request.user, f"Added trade {trade.ticker}", target=trade,
                          details=f"qty={trade.quantity} buy={trade.buy_price}")
             # handle multiple file uploads named 'charts'
             for f in request.FILES.getlist('charts'):
                 TradeChart.objects.create(trade=trade, image=f)
                 log_activity(request.user, f"Uploaded chart for {trade.ticker}", target=trade, details=f.name)
+            bump_generation(request.user.pk)
             messages.success(request, f"Trade for {trade.ticker} added.")
             return redirect('trade_detail', trade.id)
         else:
@@ -76,7 +95,24 @@ def trade_detail(request, trade_id):
             chart.save()
             messages.success(request, "Chart uploaded.")
             return redirect('trade_detail', trade.id)
-    return render(request, 'trades/trade_detail.html', {'trade': trade, 'chart_form': chart_form})
+    has_history = get_store().last_date(trade.ticker.upper()) is not None
+    return render(request, 'trades/trade_detail.html',
+                  {'trade': trade, 'chart_form': chart_form, 'has_history': has_history})
+
+
+@login_required
+def trade_candles(request, trade_id):
+    """Candlestick PNG for the trade with entry/exit markers (rendered once, then served from the render cache)."""
+    trade = get_object_or_404(Trade, id=trade_id, user=request.user)
+    try:
+        path = render_trade_chart(trade)
+    except FutureTimeout:
+        return HttpResponse("Chart is still rendering, try again shortly.", status=503, content_type='text/plain')
+    if path is None:
+        raise Http404("No local price history for this ticker.")
+    response = FileResponse(open(path, 'rb'), content_type='image/png')
+    patch_cache_control(response, private=True, max_age=3600)
+    return response
 
 
 @login_required
@@ -92,13 +128,17 @@ def close_trade(request, trade_id):
             # if sell_date not provided, set today
             if not trade.sell_date:
                 trade.sell_date = datetime.date.today()
-            trade.save()
+            # UserTradeStats follows in post_save (trades/signals.py), in the same transaction
+            with transaction.atomic():
+                trade.save()
+            snapshot_indicators(trade, 'sell')
             log_activity(request.user, f"Closed trade {trade.ticker}", target=trade,
                          details=f"sell={trade.sell_price} exit={trade.exit_reason}")
             # upload sell charts (input name: 'sell_charts')
             for f in request.FILES.getlist('sell_charts'):
                 TradeChart.objects.create(trade=trade, image=f, caption="Sell chart")
 
+            bump_generation(request.user.pk)
             messages.success(request, f"Trade {trade.ticker} closed.")
             return redirect('trade_detail', trade.id)
         else:
@@ -110,68 +150,129 @@ def close_trade(request, trade_id):
     return render(request, 'trades/close_trade.html', {'trade': trade, 'form': form})
 
 
+# closed-trade orderings offered on trade_list ('' = default)
+CLOSED_SORTS = {
+    '': ('-sell_date', '-id'),
+    'pnl': ('pnl', 'id'),
+    '-pnl': ('-pnl', '-id'),
+}
+OPEN_ORDERING = ('-buy_date', '-id')
+OPEN_PER_PAGE = 20
+
+
 @login_required
 def trade_list(request):
     """
     List trades:
-      - open_trades: all open positions (no pagination)
-      - closed_trades: filtered + paginated
+      - open_trades: open positions, newest buy first (cursor-paginated)
+      - closed_trades: filtered + cursor-paginated
     Filters via GET params:
       - q: ticker (substring, case-insensitive)
+      - text: full-text search over notes, indicator text and chart captions
+        (ranked; best match first unless another sort is chosen)
       - start_date: ISO date (YYYY-MM-DD) for sell_date >= start_date
       - end_date: ISO date for sell_date <= end_date
       - exit_reason: exact exit reason code (SL, RES, EMA, SECT, MAN)
-      - page: page number for pagination
+      - sort: '' (newest sell first), 'pnl' or '-pnl' (stored realized P&L)
+      - cursor / open_cursor: opaque page tokens for closed / open trades; they
+        keep their position when the filters change
+      - count: if set, show an approximate number of matching closed trades
     """
     user = request.user
-    open_trades = Trade.objects.filter(user=user, is_closed=False).order_by('-buy_date')
-
-    # Base closed queryset
-    closed_qs = Trade.objects.filter(user=user, is_closed=True).order_by('-sell_date')
 
     # Apply filters
     q = request.GET.get('q', '').strip()
     start_date = request.GET.get('start_date', '').strip()
     end_date = request.GET.get('end_date', '').strip()
     exit_reason = request.GET.get('exit_reason', '').strip()
+    text = request.GET.get('text', '').strip()
+    sort = request.GET.get('sort', '').strip()
+    if sort not in CLOSED_SORTS:
+        sort = ''
 
-    if q:
-        closed_qs = closed_qs.filter(ticker__icontains=q)
-
-    if exit_reason:
-        closed_qs = closed_qs.filter(exit_reason=exit_reason)
-
-    # date filtering (sell_date)
-    if start_date:
-        try:
-            closed_qs = closed_qs.filter(sell_date__gte=start_date)
-        except Exception:
-            pass
-    if end_date:
-        try:
-            closed_qs = closed_qs.filter(sell_date__lte=end_date)
-        except Exception:
-            pass
-
-    # Pagination for closed trades
-    page = request.GET.get('page', 1)
-    per_page = 10  # change as you like
-    paginator = Paginator(closed_qs, per_page)
-    try:
-        closed_page = paginator.page(page)
-    except PageNotAnInteger:
-        closed_page = paginator.page(1)
-    except EmptyPage:
-        closed_page = paginator.page(paginator.num_pages)
+    def load():
+        open_trades = Trade.objects.filter(user=user, is_closed=False)
+
+        # Base closed queryset
+        closed_qs = Trade.objects.filter(user=user, is_closed=True)
+
+        if q:
+            closed_qs = closed_qs.filter(ticker__icontains=q)
+
+        ranked, search_limit = [], getattr(settings, 'SEARCH_MAX_RESULTS', 500)
+        if text:
+            ranked = search_trade_ids(text, user=user, limit=search_limit)
+            closed_qs = closed_qs.filter(pk__in=ranked)
+
+        if exit_reason:
+            closed_qs = closed_qs.filter(exit_reason=exit_reason)
+
+        # date filtering (sell_date)
+        if start_date:
+            try:
+                closed_qs = closed_qs.filter(sell_date__gte=start_date)
+            except Exception:
+                pass
+        if end_date:
+            try:
+                closed_qs = closed_qs.filter(sell_date__lte=end_date)
+            except Exception:
+                pass
+
+        # Sorting (each option is backed by a (user, is_closed, ..., id) index)
+        closed_sort = sort
+        if ranked and not sort:
+            # relevance: position in the ranked id list (at most SEARCH_MAX_RESULTS rows)
+            closed_qs = closed_qs.annotate(rank=Case(*[When(pk=pk, then=i) for i, pk in enumerate(ranked)],
+                                                     output_field=IntegerField()))
+            closed_sort, ordering = 'rank', ('rank', 'id')
+        else:
+            ordering = CLOSED_SORTS[sort]
+
+        # Keyset pagination: cursors seek through the index instead of COUNT + OFFSET
+        per_page = 10  # change as you like
+        closed_count = None
+        if request.GET.get('count'):
+            closed_count = approximate_count(closed_qs, cap=getattr(settings, 'TRADE_LIST_COUNT_CAP', 1000))
+        return {
+            'closed': keyset_page(closed_qs, ordering, closed_sort or 'sell_date', request.GET.get('cursor'),
+                                  per_page),
+            'open': keyset_page(open_trades, OPEN_ORDERING, 'buy_date', request.GET.get('open_cursor'),
+                                OPEN_PER_PAGE),
+            'count': closed_count,
+            # only the best SEARCH_MAX_RESULTS matches are listed: say so
+            'search_capped': len(ranked) >= search_limit,
+        }
+
+    # cached per user until their trades change (trades/caching.py)
+    data = cached_for_user(user.pk, 'trade_list', load, sorted(request.GET.lists()))
+    open_page, closed_page, closed_count = data['open'], data['closed'], data['count']
+
+    def page_url(**params):
+        query = request.GET.copy()
+        for name, value in params.items():
+            query.pop(name, None)
+            if value:
+                query[name] = value
+        return '?' + query.urlencode()
 
     context = {
-        'open_trades': open_trades,
-        'closed_trades': closed_page,  # this is a Page object
-        'paginator': paginator,
+        'open_trades': open_page,
+        'open_prev_url': page_url(open_cursor=open_page.prev_cursor) if open_page.has_previous else None,
+        'open_next_url': page_url(open_cursor=open_page.next_cursor) if open_page.has_next else None,
+        'closed_trades': closed_page,  # a KeysetPage
+        'closed_prev_url': page_url(cursor=closed_page.prev_cursor) if closed_page.has_previous else None,
+        'closed_next_url': page_url(cursor=closed_page.next_cursor) if closed_page.has_next else None,
+        'closed_count': closed_count,  # (n, exact) when ?count=1
+        'search_capped': data['search_capped'],
+        'search_limit': getattr(settings, 'SEARCH_MAX_RESULTS', 500),
+        'count_url': page_url(count='1'),
         'filter_q': q,
+        'filter_text': text,
         'filter_start_date': start_date,
         'filter_end_date': end_date,
         'filter_exit_reason': exit_reason,
+        'filter_sort': sort,
     }
     return render(request, 'trades/trade_list.html', context)
 
@@ -184,109 +285,91 @@ def dashboard(request):
     # For simplicity: do not call yfinance here; frontend can call the API endpoint to update.
     return render(request, 'trades/dashboard.html', {
         'open_trades': open_trades,
+        # open trades breaking a rule from the user's checklist (see trades/rules.py)
+        'rule_violations': user_violations(request.user),
     })
 
 
 @login_required
+@condition(etag_func=portfolio_etag)
 def portfolio_value_api(request):
     """
     Returns JSON with:
       - positions: list of tickers aggregated by average buy price
       - total_value, total_cost, total_unrealized, total_gain, total_gain_pct
+      - partial: True when any position's price is stale or missing
+    Each position carries `stale` (snapshot older than PRICE_SNAPSHOT_MAX_AGE) and
+    `missing` (no price at all) flags.
     """
-    trades = Trade.objects.filter(user=request.user, is_closed=False)
+    # the trade aggregation is cached until the user's trades change; prices are not
+    positions = cached_for_user(request.user.pk, 'positions', lambda: load_positions(request.user))
 
-    # Group open trades by ticker (case-insensitive)
-    from collections import defaultdict
-    ticker_groups = defaultdict(list)
-    for tr in trades:
-        ticker_groups[tr.ticker.upper()].append(tr)
+    # Last prices come from PriceSnapshot (kept fresh by `manage.py refresh_prices`),
+    # read in one indexed query; old snapshots are flagged stale
+    quotes = snapshot_quotes([p['ticker'] for p in positions])
 
-    tickers = list(ticker_groups.keys())
+    data = value_positions(positions, quotes)
+    response = JsonResponse(data)
+    # revalidate every poll: an unchanged portfolio is answered 304 from the ETag alone
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
 
-    # Fetch last prices
-    prices = {}
-    if 'yf' in globals() and yf and tickers:
-        for t in tickers:
-            try:
-                tk = yf.Ticker(t)
-                last = None
-                fast = getattr(tk, 'fast_info', None)
-                if fast:
-                    last = getattr(fast, 'last_price', None)
-                if not last:
-                    hist = tk.history(period='1d', interval='1m', progress=False)
-                    if not hist.empty:
-                        last = float(hist['Close'].iloc[-1])
-                prices[t] = float(last) if last is not None else None
-            except Exception:
-                prices[t] = None
-    else:
-        for t in tickers:
-            prices[t] = None
-
-    positions = []
-    total_value = 0.0
-    total_cost = 0.0
-    total_unrealized = 0.0
-
-    # --- aggregate by ticker ---
-    for ticker, group in ticker_groups.items():
-        total_qty = sum(float(t.quantity) for t in group)
-        total_buy_cost = sum(float(t.quantity) * float(t.buy_price) for t in group)
-        avg_buy_price = total_buy_cost / total_qty if total_qty else 0
-
-        last = prices.get(ticker, None)
-        market_value = (last * total_qty) if last is not None else 0.0
-        unrealized = (last - avg_buy_price) * total_qty if last is not None else None
-
-        total_value += market_value
-        total_cost += total_buy_cost
-        if unrealized is not None:
-            total_unrealized += unrealized
-
-        pnl_pct = None
-        if unrealized is not None and total_buy_cost:
-            pnl_pct = (unrealized / total_buy_cost) * 100
-
-        # oldest buy date (for “days held” display)
-        buy_dates = [t.buy_date for t in group if t.buy_date]
-        oldest_buy = min(buy_dates).isoformat() if buy_dates else None
-
-        positions.append({
-            'id': group[0].id,
-            'ticker': ticker,
-            'quantity': round(total_qty, 2),
-            'buy_price': round(avg_buy_price, 2),
-            'cost': round(total_buy_cost, 2),
-            'last_price': round(last, 2) if last else None,
-            'market_value': round(market_value, 2),
-            'unrealized_pnl': round(unrealized, 2) if unrealized else None,
-            'pnl_pct': round(pnl_pct, 2) if pnl_pct else None,
-            'buy_date': oldest_buy,
-        })
-
-    total_gain = total_unrealized
-    total_gain_pct = (total_gain / total_cost * 100) if total_cost else None
-
-    def maybe_round(x):
-        try:
-            return None if x is None else round(float(x), 2)
-        except Exception:
-            return x
-
-    data = {
-        'positions': positions,
-        'total_value': maybe_round(total_value),
-        'total_cost': maybe_round(total_cost),
-        'total_unrealized': maybe_round(total_unrealized),
-        'total_gain': maybe_round(total_gain),
-        'total_gain_pct': maybe_round(total_gain_pct),
-    }
 
-    return JsonResponse(data)
+def _parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+@login_required
+def portfolio_nav_api(request):
+    """
+    Daily portfolio value series for charting: ?start=YYYY-MM-DD&end=YYYY-MM-DD (both optional).
+    Snapshots for days since the last stored one are computed first (usually none or one).
+    Each point: date, value (market value), cost, unrealized, realized (cumulative), total_pnl, partial.
+    """
+    update_snapshots(request.user)
+    qs = DailyPortfolioSnapshot.objects.filter(user=request.user)
+    start, end = _parse_date(request.GET.get('start')), _parse_date(request.GET.get('end'))
+    if start:
+        qs = qs.filter(date__gte=start)
+    if end:
+        qs = qs.filter(date__lte=end)
+    points = [
+        {
+            'date': date.isoformat(),
+            'value': maybe_round(float(value)),
+            'cost': maybe_round(float(cost)),
+            'unrealized': maybe_round(float(value - cost)),
+            'realized': maybe_round(float(realized)),
+            'total_pnl': maybe_round(float(value - cost + realized)),
+            'partial': partial,
+        }
+        for date, value, cost, realized, partial in qs.order_by('date').values_list(
+            'date', 'market_value', 'cost_basis', 'realized_pnl', 'partial').iterator()
+    ]
+    return JsonResponse({'points': points, 'partial': any(p['partial'] for p in points)})
+
 
 @login_required
+def portfolio_stream(request):
+    """
+    Server-sent events for the dashboard: a `snapshot` event with the same payload as
+    portfolio_value_api, then `delta` events only when one of the user's tickers moves
+    or their trades change. ASGI only: under WSGI each open tab would hold a worker
+    thread, so answer 204, which makes EventSource give up and the page poll instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    stream = PortfolioStream(request.user)
+    response = StreamingHttpResponse(stream.__aiter__(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # disable proxy buffering (nginx)
+    return response
+
+@login_required
+@condition(etag_func=reports_etag)
 def reports(request):
     """
     Reports page showing closed trades and numeric success metrics:
@@ -299,98 +382,98 @@ def reports(request):
     - avg_loss (float or None) -- average realized P&L among losing trades (negative number)
     """
     user = request.user
-    closed = Trade.objects.filter(user=user, is_closed=True).order_by('-sell_date')
-
-    total_closed = closed.count()
-    # winners / losers by realized P&L (sell_price > buy_price)
-    wins_qs = closed.filter(sell_price__gt=F('buy_price'))
-    losses_qs = closed.filter(sell_price__lte=F('buy_price'))
-
-    wins = wins_qs.count()
-    losses = losses_qs.count()
-    win_rate = (wins / total_closed * 100) if total_closed else None
-
-    # total realized P&L across all closed trades (use model helper)
-    total_realized = 0.0
-    realized_list = []
-    for t in closed:
-        pnl = t.realized_pnl()
-        if pnl is None:
-            pnl = 0.0
-        try:
-            pnl = float(pnl)
-        except Exception:
-            pnl = 0.0
-        realized_list.append(pnl)
-        total_realized += pnl
-
-    # average win: mean of realized p&l for winning trades
-    avg_win = None
-    if wins > 0:
-        total_win_pnl = 0.0
-        for t in wins_qs:
-            p = t.realized_pnl() or 0.0
-            try:
-                total_win_pnl += float(p)
-            except Exception:
-                pass
-        avg_win = total_win_pnl / wins if wins else None
-
-    # average loss: mean of realized p&l for losing trades (will be negative or zero)
-    avg_loss = None
-    if losses > 0:
-        total_loss_pnl = 0.0
-        for t in losses_qs:
-            p = t.realized_pnl() or 0.0
-            try:
-                total_loss_pnl += float(p)
-            except Exception:
-                pass
-        avg_loss = total_loss_pnl / losses if losses else None
 
-    context = {
-        'closed_trades': closed,
-        'total_closed': total_closed,
-        'wins': wins,
-        'losses': losses,
-        'win_rate': win_rate,
-        'total_realized': total_realized,
-        'avg_win': avg_win,
-        'avg_loss': avg_loss,
-    }
-    return render(request, 'trades/reports.html', context)
+    def load():
+        closed = list(Trade.objects.filter(user=user, is_closed=True).order_by('-sell_date'))
+
+        # summary cards come from the materialized UserTradeStats row (O(1));
+        # it is built with a single aggregate query the first time
+        stats = get_user_stats(user)
+        return {
+            'closed_trades': closed,
+            'total_closed': stats.total_closed,
+            'wins': stats.wins,
+            'losses': stats.losses,
+            'win_rate': stats.win_rate(),
+            'total_realized': float(stats.total_realized),
+            'avg_win': stats.avg_win(),
+            'avg_loss': stats.avg_loss(),
+        }
+
+    # cached per user until their trades change (trades/caching.py)
+    context = cached_for_user(user.pk, 'reports', load)
+    response = render(request, 'trades/reports.html', context)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+@login_required
+def reports_analytics(request):
+    """Analytics panel of the reports page (HTML fragment, fetched when the panel is opened)."""
+    analytics = analyze(load_closed(request.user))
+    return render(request, 'trades/reports_analytics.html', {
+        'analytics': analytics,
+        'equity_points': svg_points(v for _, v in analytics['equity_curve']),
+    })
+
+
+@login_required
+def analytics_api(request):
+    """
+    JSON analytics over the user's closed trades: equity curve, max drawdown,
+    expectancy, profit factor, Sharpe, R-multiples, holding periods and a
+    per-exit-reason breakdown (see trades/analytics.py).
+    """
+    return JsonResponse(analyze(load_closed(request.user)))
 
 
 @login_required
 def export_closed_csv(request):
-    """Export closed trades as CSV download."""
-    closed = Trade.objects.filter(user=request.user, is_closed=True).order_by('-sell_date')
-    response = HttpResponse(content_type='text/csv')
+    """Export closed trades as CSV download (streamed; constant memory for any history size)."""
+    response = StreamingHttpResponse(stream_csv(closed_trade_rows(request.user)), content_type='text/csv')
     response['Content-Disposition'] = 'attachment; filename=closed_trades.csv'
-    writer = csv.writer(response)
-    writer.writerow(
-        ['id', 'ticker', 'quantity', 'buy_price', 'buy_date', 'sell_price', 'sell_date', 'pnl', 'exit_reason',
-         'indicators_text', 'charts'])
-
-    for t in closed:
-        charts = ";".join([c.image.name for c in t.charts.all()])
-        pnl = t.realized_pnl() or 0
-        writer.writerow([
-            t.id,
-            t.ticker,
-            str(t.quantity),
-            str(t.buy_price),
-            t.buy_date.isoformat() if t.buy_date else '',
-            str(t.sell_price) if t.sell_price else '',
-            t.sell_date.isoformat() if t.sell_date else '',
-            str(pnl),
-            t.exit_reason or '',
-            (t.indicators_text or '').replace('\n', ' | '),
-            charts
-        ])
     return response
 
 
+@login_required
+def export_closed_parquet(request):
+    """
+    Export closed trades as a Parquet file (for pandas / notebooks).
+    Written chunk by chunk to a temporary file on disk, then streamed back.
+    """
+    if parquet_pa is None:
+        messages.error(request, "Parquet export needs the pyarrow package (pip install pyarrow).")
+        return redirect('reports')
+    tmp = tempfile.TemporaryFile()
+    write_parquet(closed_trade_rows(request.user), tmp)
+    tmp.seek(0)
+    return FileResponse(tmp, as_attachment=True, filename='closed_trades.parquet',
+                        content_type='application/vnd.apache.parquet')
+
+
+@login_required
+def import_trades_view(request):
+    """Upload a broker CSV and bulk-import its rows as open / closed trades."""
+    result = None
+    if request.method == 'POST':
+        form = ImportTradesForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            dry_run = form.cleaned_data['dry_run']
+            result = import_trades(request.user, upload, dry_run=dry_run, source=upload.name)
+            if dry_run:
+                messages.info(request, f"Validated {result.rows} rows: {result.error_count} with errors.")
+            elif result.created:
+                messages.success(request, f"Imported {result.created} trades.")
+            if result.error_count:
+                messages.warning(request, f"{result.error_count} rows were skipped — see the errors below.")
+        else:
+            messages.error(request, "Please fix the errors below.")
+    else:
+        form = ImportTradesForm()
+    return render(request, 'trades/import_trades.html', {'form': form, 'result': result})
+
+
 @login_required
 def rules_page(request):
     """